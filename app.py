@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, make_response, send_file
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, make_response, send_file, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -9,7 +9,6 @@ import click
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
-from functools import lru_cache
 import re
 from urllib.parse import quote, unquote
 from flask.cli import with_appcontext
@@ -45,12 +44,19 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 import subprocess
 from datetime import datetime
 
+from config import Config
 from models import (
     db, User, AuditLog, Patient, Note, Ward, 
     Settings, get_notes_enabled, get_timeout_enabled, get_timeout_minutes,
-    CareNote, RecentlyViewedPatient, NoteTemplate, TemplateCategory  # Add these missing imports
+    CareNote, RecentlyViewedPatient, NoteTemplate, TemplateCategory,  # Add these missing imports
+    attached_patient, attached_ward
 )
 from utils.logger import setup_logger
+from utils.import_journal import DONE, import_progress
+from utils.ingest_daemon import OnDemandImporter, pending_ward_pdfs, start_ingest_thread
+from utils.sqlite_tuning import ATTACHED_BINDS, BIND_PRAGMAS
+from utils.ward_import import ward_display_name
+from utils.ward_pdf_parser import list_ward_pdfs, ward_number_for, ward_pdf_path
 import traceback
 
 app = Flask(__name__)
@@ -69,10 +75,17 @@ app.config['SQLALCHEMY_BINDS'] = {
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Replace the SQLALCHEMY_ENGINE_OPTIONS configuration
+# No pool_size: SQLite connections are opened per checkout, so a pdf_parsed.db
+# swapped in by `reset_and_initialize.py --refresh` is used from the next request on.
+# No pool_pre_ping either: a fresh connection to a local file never needs it
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,
     'connect_args': {'check_same_thread': False}
 }
+# WAL, synchronous=NORMAL, mmap, cache, busy_timeout on every connection (see utils/sqlite_tuning.py)
+app.config['SQLITE_TUNING'] = os.environ.get('SQLITE_TUNING', '1') == '1'
+app.config['SQLITE_PRAGMAS'] = BIND_PRAGMAS
+# Databases attached to users.db connections for cross-database joins (pdf_parsed.patient, pdf_parsed.ward, audit.audit_log)
+app.config['SQLITE_ATTACH'] = ATTACHED_BINDS
 
 # Fix app configuration for sessions
 # Place this near the top of your file where other app.config settings are
@@ -80,6 +93,14 @@ app.config['SESSION_COOKIE_SECURE'] = False  # Temporarily disable for local tes
 app.config['SESSION_TYPE'] = 'filesystem'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=12)
 
+# Import ward PDFs dropped into PDF_DIRECTORY in a background thread (see utils/ingest_daemon.py)
+app.config['PDF_DIRECTORY'] = Config.PDF_DIRECTORY
+app.config['INGEST_DAEMON'] = os.environ.get('INGEST_DAEMON') == '1'
+# Import a ward PDF that has not been ingested yet when its ward or a patient is first opened
+app.config['LAZY_WARD_IMPORT'] = os.environ.get('LAZY_WARD_IMPORT', '1') == '1'
+# Milliseconds those background imports may hold the SQLite write lock per transaction (0 = unthrottled)
+app.config['IMPORT_WRITE_BUDGET_MS'] = int(os.environ.get('IMPORT_WRITE_BUDGET_MS', '50'))
+
 # Initialize extensions
 db.init_app(app)
 
@@ -149,17 +170,43 @@ def log_access(action, patient_id=None):
 # Dictionary to store ward data
 wards_data = {}
 
-# Flag to indicate if data is being loaded
-is_loading_data = False
+# Imports ward PDFs that a page needs but that have not been ingested yet
+ward_loader = OnDemandImporter(app, write_budget_ms=app.config['IMPORT_WRITE_BUDGET_MS'])
+
+@app.before_first_request
+def start_ward_pdf_watcher():
+    """Watch PDF_DIRECTORY in a background thread (INGEST_DAEMON=1)
+
+    Started by the first request, so it runs under gunicorn and `flask run`
+    as well as `python app.py`, and never in the reloader's parent process,
+    which serves no requests. Only one process on the machine watches.
+    """
+    if app.config['INGEST_DAEMON']:
+        start_ingest_thread(app, app.config['PDF_DIRECTORY'], write_budget_ms=app.config['IMPORT_WRITE_BUDGET_MS'],
+                            lock_path=Config.INGEST_LOCK_PATH)
 
-# Remove extract_patient_info function - data should come from database
-# Also remove process_patient_data since it was only used by extract_patient_info
-# Keep other functions intact
+def is_loading_data():
+    """True while ward PDFs are being imported on demand"""
+    return ward_loader.is_loading
 
-@lru_cache(maxsize=2)
 def process_ward_pdf(pdf_filename):
-    """Deprecated: Data should come from database initialization"""
-    return {}
+    """Queue a ward PDF for a background import; True while it is loading, False if it failed"""
+    return bool(ward_loader.request([pdf_filename]))
+
+def lazy_import_response(pdf_files, ward_nums, what):
+    """Start importing pdf_files that were never ingested and return the loading page
+
+    Returns None when lazy imports are off or nothing is left to import
+    (including files that failed), so the caller serves the database as is.
+    """
+    if not app.config['LAZY_WARD_IMPORT']:
+        return None
+    pending = pending_ward_pdfs(pdf_files)
+    if not pending or not any([process_ward_pdf(pdf_file) for pdf_file in pending]):
+        return None
+    response = make_response(render_template('loading.html', what=what, ward_nums=ward_nums), 202)
+    response.headers['Retry-After'] = '2'
+    return response
 
 # Replace PDF-based ward metadata loading with database-only version
 def get_ward_metadata():
@@ -410,10 +457,58 @@ def index():
     for ward_num, count in ward_patients:
         patient_counts[ward_num] = count
     
+    # Wards whose PDF has not been ingested yet; they are imported when first opened
+    pending_wards = []
+    if app.config['LAZY_WARD_IMPORT']:
+        known = {ward.ward_number for ward in wards}
+        pending_wards = [{'ward_number': ward_num, 'display_name': ward_display_name(ward_num)}
+                         for ward_num in map(ward_number_for, pending_ward_pdfs(list_ward_pdfs(app.config['PDF_DIRECTORY'])))
+                         if ward_num not in known]
+    
     return render_template('index.html', 
                            wards=wards, 
                            show_all=show_all,
-                           patient_counts=patient_counts)
+                           patient_counts=patient_counts,
+                           pending_wards=pending_wards,
+                           import_progress=get_import_progress())
+
+def get_import_progress():
+    """Progress of the latest ward PDF import, keyed by ward number, in import order"""
+    try:
+        entries = import_progress()
+    except Exception:
+        # No import has created the journal yet
+        db.session.rollback()
+        return {}
+    return {ward_number_for(entry.pdf_file): {
+        'pdf_file': entry.pdf_file,
+        'status': entry.status,
+        'patients_done': entry.patients_done or 0,
+        'error': entry.error,
+        'updated_at': entry.updated_at.strftime('%Y-%m-%d %H:%M:%S') if entry.updated_at else None
+    } for entry in entries}
+
+@app.route('/import_progress')
+@login_required
+def import_progress_status():
+    """Per-ward progress of the latest ward PDF import, busiest wards first"""
+    progress = get_import_progress()
+    return jsonify({
+        'complete': all(ward['status'] == DONE for ward in progress.values()),
+        'wards': [dict(ward=ward_num, **ward) for ward_num, ward in progress.items()]
+    })
+
+@app.route('/loading_status')
+@login_required
+def loading_status():
+    """Whether the wards given as ?ward= are still being imported on demand (polled by the loading page)"""
+    ward_nums = request.args.getlist('ward')
+    pdf_files = [ward_pdf_path(ward_num, app.config['PDF_DIRECTORY']) for ward_num in ward_nums]
+    progress = get_import_progress()
+    return jsonify({
+        'loading': ward_loader.is_queued([pdf_file for pdf_file in pdf_files if pdf_file]),
+        'patients_done': sum(progress[ward_num]['patients_done'] for ward_num in ward_nums if ward_num in progress)
+    })
 
 @app.route('/profile', methods=['GET', 'POST'])
 @login_required
@@ -443,6 +538,12 @@ def ward(ward_num):
     # URL decode the ward_num to handle special characters
     ward_num = unquote(ward_num)
     
+    # Import the ward in the background if its PDF has not been ingested yet
+    pdf_file = ward_pdf_path(ward_num, app.config['PDF_DIRECTORY'])
+    loading = lazy_import_response([pdf_file] if pdf_file else [], [ward_num], f"Ward {ward_num}")
+    if loading:
+        return loading
+    
     # Get ward from database
     ward = Ward.query.filter_by(ward_number=ward_num).first_or_404()
     
@@ -571,7 +672,15 @@ def search_wards():
 @login_required
 def patient(patient_id):
     # Get patient from database
-    patient = Patient.query.filter_by(hospital_id=patient_id, is_active=True).first_or_404()
+    patient = Patient.query.filter_by(hospital_id=patient_id, is_active=True).first()
+    if not patient:
+        # The patient may be in a ward whose PDF has not been ingested yet
+        pdf_files = list_ward_pdfs(app.config['PDF_DIRECTORY'])
+        loading = lazy_import_response(pdf_files, [ward_number_for(pdf_file) for pdf_file in pdf_files],
+                                       f"patient {patient_id}")
+        if loading:
+            return loading
+        abort(404)
     log_access('view_patient', patient_id)
     
     # Record recently viewed
@@ -804,26 +913,34 @@ def add_care_note(patient_id):
         flash('Error adding note. Please try again.', 'note-error')
         return redirect(url_for('patient', patient_id=patient_id))
 
+def care_notes_with_names():
+    """Query of (CareNote, patient name, ward name, username) rows
+
+    The patient's and ward's current names come from the attached pdf_parsed
+    database in the same statement, falling back to the name stored with
+    the note and the ward number.
+    """
+    return db.session.query(
+        CareNote,
+        db.func.coalesce(attached_patient.c.name, CareNote.patient_name, 'Unknown').label('patient_name'),
+        db.func.coalesce(attached_ward.c.display_name, CareNote.ward_id, 'Unknown').label('ward_name'),
+        User.username
+    ).outerjoin(User, CareNote.user_id == User.id)\
+     .outerjoin(attached_patient, attached_patient.c.hospital_id == CareNote.patient_id)\
+     .outerjoin(attached_ward, attached_ward.c.ward_number == CareNote.ward_id)
+
 @app.route('/my_shift_notes')
 @login_required
 def my_shift_notes():
     show_all = request.args.get('show_all') == '1'
-    query = CareNote.query.filter_by(user_id=current_user.id)
+    query = care_notes_with_names().filter(CareNote.user_id == current_user.id)
     if not show_all:
         # Only apply time filter if not showing all
         cutoff = datetime.utcnow() - timedelta(hours=12)
         query = query.filter(CareNote.timestamp >= cutoff)
-    notes = query.order_by(CareNote.timestamp.desc()).all()
     # Prepare notes with names
     notes_with_names = []
-    # Pre-load ward display names for efficiency
-    ward_display_names = {ward_id: info.get("display_name", ward_id) 
-                         for ward_id, info in wards_data.items()}
-    for note in notes:
-        # Get ward name from our preloaded display names
-        ward_name = ward_display_names.get(note.ward_id, note.ward_id)
-        # Use stored patient name
-        patient_name = note.patient_name or "Unknown"
+    for note, patient_name, ward_name, _ in query.order_by(CareNote.timestamp.desc()).all():
         notes_with_names.append({
             **note.to_dict(),
             'patient_name': patient_name,
@@ -848,9 +965,7 @@ def admin_notes():
     page = request.args.get('page', 1, type=int)
     
     # Build query with filters; add filter to only include manually added notes (is_pdf_note False)
-    query = db.session.query(CareNote, User.username).outerjoin(
-        User, CareNote.user_id == User.id
-    ).filter(CareNote.is_pdf_note == False)
+    query = care_notes_with_names().filter(CareNote.is_pdf_note == False)
     
     # Track whether any filters are applied
     filters_applied = False
@@ -858,14 +973,7 @@ def admin_notes():
     # Apply user filter by username
     if username:
         filters_applied = True
-        # Get all users matching the username pattern
-        matching_users = User.query.filter(User.username.like(f'%{username}%')).all()
-        filtered_user_ids = [u.id for u in matching_users]
-        if filtered_user_ids:
-            query = query.filter(CareNote.user_id.in_(filtered_user_ids))
-        else:
-            # No matching users, return empty result
-            query = query.filter(CareNote.id < 0)
+        query = query.filter(User.username.like(f'%{username}%'))
     
     # Apply date filters
     if date_from:
@@ -896,13 +1004,6 @@ def admin_notes():
         page=page, per_page=50, error_out=False
     )
     
-    users_map = {}
-    # Get all users from the notes for batch processing
-    user_ids = list(set(note.user_id for note in CareNote.query.with_entities(CareNote.user_id).distinct()))
-    if user_ids:
-        users = User.query.filter(User.id.in_(user_ids)).all()
-        users_map = {user.id: user.username for user in users}
-    
     # Get ward display names for dropdown
     wards_list = get_ward_metadata()
     available_wards = {ward.ward_number: {'display_name': ward.display_name} for ward in wards_list}
@@ -914,7 +1015,8 @@ def admin_notes():
     ))
     
     # Get all available usernames for the filter dropdown from notes
-    available_usernames = sorted([users_map.get(uid) for uid in user_ids if uid in users_map])
+    available_usernames = [username for username, in db.session.query(User.username).filter(
+        db.exists().where(CareNote.user_id == User.id)).order_by(User.username)]
     
     # Preserve the exact ward_id from request parameters
     selected_ward = request.args.get('ward', '')
@@ -929,28 +1031,14 @@ def admin_notes():
     
     # Process notes for display
     notes = []
-    for note_tuple in paginated_notes.items:
-        # The note is the first element in the tuple
-        note = note_tuple[0]  # This is the CareNote object
-        username_display = note_tuple[1] or "Unknown"  # This is the User.username value
-        
-        # Get ward name efficiently using our preloaded display names
-        ward_info = available_wards.get(note.ward_id)
-        if isinstance(ward_info, dict) and 'display_name' in ward_info:
-            ward_name = ward_info['display_name']
-        else:
-            ward_name = note.ward_id or "Unknown"
-        
-        # Use stored patient name
-        patient_name = note.patient_name or "Unknown"
-        
+    for note, patient_name, ward_name, note_username in paginated_notes.items:
         notes.append({
             'timestamp': note.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
             'patient_id': note.patient_id,
             'patient_name': patient_name,
             'note': note.note,
             'ward': ward_name,
-            'username': username_display,
+            'username': note_username or "Unknown",
             'staff_name': note.staff_name
         })
     
@@ -985,16 +1073,11 @@ def export_notes(format):
     date_to = request.args.get('date_to', '')
     
     # Start building the query with is_pdf_note=False filter to exclude PDF imported notes
-    query = CareNote.query.filter(CareNote.is_pdf_note == False)
+    query = care_notes_with_names().filter(CareNote.is_pdf_note == False)
     
     # Apply username filter
     if username:
-        matching_users = User.query.filter(User.username.like(f'%{username}%')).all()
-        filtered_user_ids = [u.id for u in matching_users]
-        if filtered_user_ids:
-            query = query.filter(CareNote.user_id.in_(filtered_user_ids))
-        else:
-            query = query.filter(CareNote.id < 0)  # Empty result if no matching users
+        query = query.filter(User.username.like(f'%{username}%'))
     
     # Apply date filters
     if date_from:
@@ -1015,30 +1098,19 @@ def export_notes(format):
     if ward_id and ward_id.strip():
         query = query.filter(CareNote.ward_id == ward_id)
     
-    # Get the filtered notes
+    # Get the filtered notes with their patient, ward and user names
     notes = query.order_by(CareNote.timestamp.desc()).all()
     
-    # Pre-load all users for efficiency
-    user_ids = list(set(note.user_id for note in notes))
-    users = User.query.filter(User.id.in_(user_ids)).all()
-    users_map = {user.id: user.username for user in users}
-    
-    # Pre-load ward display names
-    ward_display_names = {ward_id: info.get("display_name", ward_id) 
-                          for ward_id, info in wards_data.items()}
-    
     # Process notes efficiently
     export_data = []
-    for note in notes:
-        ward_name = ward_display_names.get(note.ward_id, "Unknown")
-        username = users_map.get(note.user_id, "Unknown")
+    for note, patient_name, ward_name, note_username in notes:
         export_data.append({
             'timestamp': note.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
             'patient_id': note.patient_id,
-            'patient_name': note.patient_name or "Unknown",
+            'patient_name': patient_name,
             'note': note.note,
             'ward': ward_name,
-            'username': username
+            'username': note_username or "Unknown"
         })
     
     if format == 'excel':
@@ -1250,6 +1322,7 @@ def init_db_command():
 
 app.cli.add_command(init_db_command)
 
+app.config['LOG_DIR'] = Config.LOG_DIR
 setup_logger(app)
 
 @app.errorhandler(500)
@@ -0,0 +1,137 @@
+"""Adversarial benchmark for the care note splitter.
+
+Builds synthetic care-notes pages of growing size in shapes that are hard for
+the old lazy ``.+?`` / lookahead pattern, and times the old pattern against
+utils.ward_pdf_parser.parse_care_notes. Time per character should stay flat
+as pages grow for the new splitter. On every page where no old match spans a
+timestamp, the two must return the same notes.
+
+Shapes:
+    long_note       one timestamp and a single very long multi-paragraph note
+    no_credential   staff names without ", RN" and no commas anywhere
+    near_timestamps notes full of digits, dashes and colons that almost form timestamps
+    many_notes      ordinary pages with many generate_long_care_note() entries
+
+Usage:
+    python benchmarks/benchmark_care_note_splitter.py [--max-kb 512]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+# Add parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_long_stay_ward import generate_long_care_note, staff_names
+from utils.ward_pdf_parser import parse_care_notes
+
+# The pattern parse_pdf_content used before the anchor splitter
+OLD_CARE_NOTE_PATTERN = re.compile(
+    r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2})\s+([^,]+(?:, [A-Z]+)?)\s+(.+?)(?=(?:\d{4}-\d{2}-\d{2} \d{2}:\d{2})|$)",
+    re.DOTALL
+)
+
+# A page whose new time per character grows beyond this over the smallest page fails
+MAX_GROWTH = 4.0
+
+def old_parse_care_notes(text):
+    """The care note loop of the old parse_pdf_content"""
+    notes = []
+    for match in OLD_CARE_NOTE_PATTERN.finditer(text):
+        date = match.group(1).strip()
+        staff = match.group(2).strip()
+        note = match.group(3).strip()
+        if date and staff and note:
+            notes.append({"date": date, "staff": staff, "note": note})
+    return notes
+
+def fill(size, make_chunk):
+    """Concatenate chunks from make_chunk() until the text reaches size characters"""
+    chunks = []
+    length = 0
+    while length < size:
+        chunk = make_chunk()
+        chunks.append(chunk)
+        length += len(chunk)
+    return ''.join(chunks)[:size]
+
+def long_note(size):
+    body = fill(size, lambda: generate_long_care_note() + "\n\n")
+    return f"2026-01-01 08:00\n{random.choice(staff_names)}\n{body}"
+
+def no_credential(size):
+    def chunk():
+        name = random.choice(staff_names).split(',')[0]
+        return f"2026-01-01 08:00\n{name}\n" + generate_long_care_note().replace(',', '') + "\n"
+    return fill(size, chunk)
+
+def near_timestamps(size):
+    def chunk():
+        return (f"2026-01-{random.randint(10, 28)} 0{random.randint(0, 9)}:1 "
+                f"dose at 12:30 and 2026-01 {random.randint(1000, 9999)}-12-3 14:5 ")
+    return f"2026-01-01 08:00\n{random.choice(staff_names)}\n" + fill(size, chunk)
+
+def many_notes(size):
+    def chunk():
+        return f"2026-01-01 08:00\n{random.choice(staff_names)}\n{generate_long_care_note()}\n"
+    return fill(size, chunk)
+
+SHAPES = [long_note, no_credential, near_timestamps, many_notes]
+
+def time_per_char(parse, text, min_seconds=0.2):
+    """Return seconds per character of parse(text), repeated for a stable reading"""
+    runs = 0
+    started = time.perf_counter()
+    while True:
+        parse(text)
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return elapsed / runs / len(text)
+
+def old_match_spans_timestamp(text):
+    """True if an old match swallows a timestamp, where the splitter deliberately differs"""
+    anchors = [m.start() for m in re.finditer(r"(?=\d{4}-\d{2}-\d{2} \d{2}:\d{2})", text)]
+    return any(m.start() < a < m.end() for m in OLD_CARE_NOTE_PATTERN.finditer(text) for a in anchors)
+
+def main():
+    parser = argparse.ArgumentParser(description="Adversarial benchmark for the care note splitter")
+    parser.add_argument('--max-kb', type=int, default=512, help='largest page size in KB')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    sizes = []
+    size = 2 * 1024
+    while size <= args.max_kb * 1024:
+        sizes.append(size)
+        size *= 4
+
+    failed = False
+    print(f"{'shape':<17}{'page KB':>8}{'old ns/char':>13}{'new ns/char':>13}{'speedup':>9}  parity")
+    for shape in SHAPES:
+        smallest = None
+        for size in sizes:
+            text = shape(size)
+            old = time_per_char(old_parse_care_notes, text) * 1e9
+            new = time_per_char(parse_care_notes, text) * 1e9
+            smallest = smallest or new
+            if old_parse_care_notes(text) == parse_care_notes(text):
+                parity = "same"
+            elif old_match_spans_timestamp(text):
+                parity = "differs (old match spans a timestamp)"
+            else:
+                parity = "MISMATCH"
+                failed = True
+            if new > smallest * MAX_GROWTH:
+                parity += f"  NOT LINEAR ({new / smallest:.1f}x)"
+                failed = True
+            print(f"{shape.__name__:<17}{size // 1024:>8}{old:>13.1f}{new:>13.1f}{old / new:>8.1f}x  {parity}")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Time golden corpus imports and gate on throughput against baseline.json.
+
+Imports benchmarks/golden_corpus/ --repeat times as
+migrations/test_golden_corpus.py does (scratch databases, page text cache
+off) and compares the best notes/s with baseline.json. The parity check
+against manifest.json lives in migrations/test_golden_corpus.py; this
+script only refuses to time a corpus that fails it.
+
+Exits with status 1 if any ward differs from the manifest, or if
+throughput is more than --max-regression below the baseline. The baseline
+is machine-specific: record it with --update-baseline on the machine that
+runs the gate.
+
+Usage:
+    python benchmarks/benchmark_golden_corpus.py [--repeat 5] [--jobs 1] [--max-regression 0.2]
+    python benchmarks/benchmark_golden_corpus.py --update-baseline
+    python benchmarks/benchmark_golden_corpus.py --regenerate   # rebuild the PDFs and manifest.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+
+# Add parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Log to a scratch directory, not the app's logs/app.log
+os.environ.setdefault('LOG_DIR', os.path.join(tempfile.gettempdir(), 'ward_benchmark_logs'))
+
+from PyPDF2 import PdfReader
+
+from generate_long_stay_ward import create_ward_pdf, ward_names
+from migrations.test_golden_corpus import (CORPUS_DIR, MANIFEST_FILE, check_parity, corpus_changes, corpus_files,
+                                           load_json, run_import)
+from utils.pdf_manifest import hash_file
+
+BASELINE_FILE = 'baseline.json'
+
+# generate_long_stay_ward.py arguments the corpus is built from
+CORPUS_SPEC = {
+    'wards': 4,
+    'special_wards': 2,
+    'patients': 12,
+    'days': (1, 14),
+    'notes_per_day': (1, 3),
+    'seed': 2024,
+    'end_date': '2025-01-01',
+}
+
+def write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def regenerate(corpus_dir, jobs):
+    """Rebuild the corpus PDFs from CORPUS_SPEC and write manifest.json
+
+    Counts come from the generator; the content digests from importing the
+    new files, which must agree with those counts.
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    for pdf_file in corpus_files(corpus_dir):
+        os.remove(pdf_file)
+    end_date = datetime.strptime(CORPUS_SPEC['end_date'], '%Y-%m-%d')
+    expected = {}
+    names = ward_names(CORPUS_SPEC['wards'], CORPUS_SPEC['special_wards'])
+    for name in names:
+        pdf_file = os.path.join(corpus_dir, f"ward_{name}_records.pdf")
+        patients, notes = create_ward_pdf(pdf_file, name, CORPUS_SPEC['seed'], CORPUS_SPEC['patients'],
+                                          CORPUS_SPEC['days'], CORPUS_SPEC['notes_per_day'], end_date)
+        expected[os.path.basename(pdf_file)] = {'ward': name, 'patients': patients, 'notes': notes}
+
+    _, failed, wards = run_import(corpus_files(corpus_dir), jobs)
+    files = {}
+    for file_name, entry in expected.items():
+        imported = wards.get(entry['ward'], {})
+        if failed or (imported.get('patients'), imported.get('notes')) != (entry['patients'], entry['notes']):
+            sys.exit(f"{file_name}: imported {imported.get('patients')} patients / {imported.get('notes')} notes, "
+                     f"generated {entry['patients']} / {entry['notes']}; fix the importer before regenerating")
+        files[file_name] = dict(entry, sha256=hash_file(os.path.join(corpus_dir, file_name)),
+                                content_sha256=imported['content_sha256'])
+    write_json(os.path.join(corpus_dir, MANIFEST_FILE), {'spec': CORPUS_SPEC, 'files': files})
+    print(f"Regenerated {len(files)} ward PDFs and {MANIFEST_FILE} in {corpus_dir}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='golden corpus directory')
+    parser.add_argument('--repeat', type=int, default=5, help='imports to run; the fastest is reported')
+    parser.add_argument('--jobs', type=int, default=1, help='parser processes, as for initialize_database.py')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='fail if notes/s is more than this fraction below the baseline')
+    parser.add_argument('--update-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--regenerate', action='store_true', help='rebuild the corpus PDFs and manifest')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    if args.regenerate:
+        regenerate(args.corpus, args.jobs)
+        return 0
+
+    manifest = load_json(os.path.join(args.corpus, MANIFEST_FILE))
+    pdf_files = corpus_files(args.corpus)
+    if manifest is None or not pdf_files:
+        print(f"No golden corpus in {args.corpus}; build it with --regenerate")
+        return 1
+    changes = corpus_changes(args.corpus, manifest)
+    if changes:
+        print(f"Corpus does not match {MANIFEST_FILE}: {', '.join(changes)}")
+        return 1
+
+    pages = sum(len(PdfReader(pdf_file).pages) for pdf_file in pdf_files)
+    notes = sum(entry['notes'] for entry in manifest['files'].values())
+    runs = []
+    for _ in range(args.repeat):
+        elapsed, failed, wards = run_import(pdf_files, args.jobs)
+        runs.append(elapsed)
+    best = min(runs)
+    throughput = {'notes_per_second': notes / best, 'pages_per_second': pages / best}
+
+    print(f"{len(pdf_files)} ward PDFs, {pages} pages, {notes} notes, best of {args.repeat} with {args.jobs} job(s)")
+    print(f"{'import s':>10}{'pages/s':>10}{'notes/s':>10}")
+    print(f"{best:>10.3f}{throughput['pages_per_second']:>10.0f}{throughput['notes_per_second']:>10.0f}")
+
+    problems = [f"{os.path.basename(pdf_file)}: import failed" for pdf_file in failed]
+    problems += check_parity(manifest, wards)
+    if problems:
+        print("\nPARITY FAILED:\n  " + "\n  ".join(problems))
+        return 1
+    print(f"Parity OK: all {len(manifest['files'])} wards match {MANIFEST_FILE}")
+
+    baseline_path = os.path.join(args.corpus, BASELINE_FILE)
+    if args.update_baseline:
+        write_json(baseline_path, {
+            'notes_per_second': round(throughput['notes_per_second'], 1),
+            'pages_per_second': round(throughput['pages_per_second'], 1),
+            'jobs': args.jobs,
+            'recorded_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+            'machine': f"{platform.machine()} {platform.python_implementation()} {platform.python_version()}",
+        })
+        print(f"Baseline updated in {baseline_path}")
+        return 0
+
+    baseline = load_json(baseline_path)
+    if baseline is None:
+        print(f"No {BASELINE_FILE} yet; record one with --update-baseline")
+        return 0
+    if baseline.get('jobs') != args.jobs:
+        print(f"Note: the baseline was recorded with {baseline.get('jobs')} job(s)")
+    ratio = throughput['notes_per_second'] / baseline['notes_per_second']
+    print(f"Baseline {baseline['notes_per_second']:.0f} notes/s ({baseline['recorded_at']}): {ratio:.2f}x")
+    if ratio < 1 - args.max_regression:
+        print(f"THROUGHPUT REGRESSION: more than {args.max_regression:.0%} below the baseline")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
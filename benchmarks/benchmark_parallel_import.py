@@ -0,0 +1,96 @@
+"""Check that --jobs N parses typical (small) ward PDFs close to N times faster.
+
+Generates --wards ward PDFs of --patients patients with
+generate_long_stay_ward.py into a scratch directory, parses them with
+utils.parallel_import.iter_parsed_ward_pdfs once with one job and once with
+--jobs (the page text cache off, no database writes), and compares the
+wall-clock times. Both runs must yield the same patients in the same order.
+
+Exits with status 1 if the parallel run is less than --min-efficiency times
+min(jobs, CPU cores) faster than the serial one, or if the runs differ.
+The speedup is not checked on a single core.
+
+Usage:
+    python benchmarks/benchmark_parallel_import.py [--wards 8] [--patients 24] [--jobs 8] [--min-efficiency 0.6]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# Add parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from generate_long_stay_ward import DEFAULT_END_DATE, create_ward_pdf, ward_names
+from utils.parallel_import import iter_parsed_ward_pdfs, resolve_jobs
+from utils.ward_pdf_parser import iter_pdf_patients
+
+def generate_wards(directory, wards, patients, jobs):
+    """Write the benchmark's ward PDFs; returns their paths"""
+    end_date = datetime.strptime(DEFAULT_END_DATE, '%Y-%m-%d')
+    names = ward_names(wards, 0)
+    pdf_files = [os.path.join(directory, f"ward_{name}_records.pdf") for name in names]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(create_ward_pdf, pdf_file, name, 0, patients, (1, 30), (1, 3), end_date)
+                   for pdf_file, name in zip(pdf_files, names)]
+        for future in futures:
+            future.result()
+    return pdf_files
+
+def timed_parse(pdf_files, jobs):
+    """Parse pdf_files with jobs workers; returns (seconds, digest of the patients in order)"""
+    digest = hashlib.sha256()
+    started = time.perf_counter()
+    for pdf_file, patient_records, error in iter_parsed_ward_pdfs(pdf_files, iter_pdf_patients, jobs):
+        if error:
+            sys.exit(f"{pdf_file}: {error}")
+        for patient_id, record in patient_records:
+            digest.update(f"{os.path.basename(pdf_file)}|{patient_id}|{len(record['care_notes'])}\n".encode('utf-8'))
+    return time.perf_counter() - started, digest.hexdigest()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wards', type=int, default=8, help='ward PDFs to parse')
+    parser.add_argument('--patients', type=int, default=24, help='patients per ward')
+    parser.add_argument('--jobs', type=int, default=8, help='parser processes for the parallel run (0 = one per CPU core)')
+    parser.add_argument('--min-efficiency', type=float, default=0.6,
+                        help='fail if the speedup is below this fraction of min(jobs, CPU cores)')
+    args = parser.parse_args()
+    jobs = resolve_jobs(args.jobs)
+    cores = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as scratch:
+        pdf_files = generate_wards(scratch, args.wards, args.patients, min(jobs, cores))
+        live_cache_mb = Config.PAGE_TEXT_CACHE_MAX_MB
+        Config.PAGE_TEXT_CACHE_MAX_MB = 0  # Measure text extraction in both runs
+        try:
+            serial, serial_digest = timed_parse(pdf_files, 1)
+            parallel, parallel_digest = timed_parse(pdf_files, jobs)
+        finally:
+            Config.PAGE_TEXT_CACHE_MAX_MB = live_cache_mb
+
+    speedup = serial / parallel
+    expected = args.min_efficiency * min(jobs, cores)
+    print(f"{args.wards} wards x {args.patients} patients, {cores} CPU core(s)")
+    print(f"{'jobs':>6}{'parse s':>10}")
+    print(f"{1:>6}{serial:>10.2f}")
+    print(f"{jobs:>6}{parallel:>10.2f}")
+    if parallel_digest != serial_digest:
+        print("PARITY FAILED: the parallel run yielded different patients")
+        return 1
+    if min(jobs, cores) < 2:
+        print(f"Speedup {speedup:.2f}x, not checked with only one core to parse on")
+        return 0
+    print(f"Speedup {speedup:.2f}x (at least {expected:.2f}x required)")
+    if speedup < expected:
+        print("SCALING REGRESSION: --jobs is not parallelising the parse")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Benchmark the shared ward PDF parser against the parsers it replaced.
+
+Reports pages/sec for utils.ward_pdf_parser.parse_pdf_content and for the
+legacy implementations in benchmarks/legacy_parsers.py on the same files,
+and checks that the new parser returns the same patients and notes as the
+old initialize_database.parse_pdf_content.
+
+By default page text is extracted once up front and fed to every parser,
+so only parsing is timed. --end-to-end times the legacy parsers with
+PdfReader.extract_text() and the new parser with a warm page text cache,
+which is what a re-run of the importers sees.
+
+Usage (from the directory holding the ward PDFs):
+    python benchmarks/benchmark_pdf_parsers.py [--repeat N] [--end-to-end] [ward_X_records.pdf ...]
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader
+
+import utils.ward_pdf_parser as ward_pdf_parser
+from benchmarks import legacy_parsers
+from utils.page_text_cache import CachedPageTexts
+
+class PreloadedPage:
+    """Stands in for a PyPDF2 page whose text was extracted up front"""
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        return self.text
+
+class PreloadedReader:
+    """Stands in for PdfReader in the legacy parsers"""
+    texts = {}
+
+    def __init__(self, pdf_path):
+        self.pages = [PreloadedPage(text) for text in self.texts[pdf_path]]
+
+class PreloadedPageTexts:
+    """Stands in for CachedPageTexts in the shared parser"""
+    texts = {}
+
+    def __init__(self, pdf_path):
+        self.pages = self.texts[pdf_path]
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __getitem__(self, page_idx):
+        return self.pages[page_idx]
+
+    @property
+    def reader(self):
+        raise RuntimeError("page text is preloaded")
+
+    def close(self):
+        pass
+
+IMPLEMENTATIONS = [
+    ('ward_pdf_parser.parse_pdf_content', ward_pdf_parser.parse_pdf_content),
+    ('legacy parse_pdf_content', legacy_parsers.parse_pdf_content),
+    ('legacy extract_patient_info', legacy_parsers.extract_patient_info),
+    ('legacy extract_notes_from_pdf', legacy_parsers.extract_notes_from_pdf),
+]
+
+def time_parser(parse, pdf_files, repeat):
+    """Return the best wall-clock time of ``repeat`` passes over pdf_files"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for pdf_file in pdf_files:
+            parse(pdf_file)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def strip_new_keys(patients):
+    """Drop the keys the shared parser adds so its output compares with the legacy one"""
+    return {
+        patient_id: {key: value for key, value in record.items() if key not in ('section_hash', 'unchanged')}
+        for patient_id, record in patients.items()
+    }
+
+def check_parity(pdf_files):
+    """Return the files on which the shared and legacy parsers disagree"""
+    return [
+        pdf_file for pdf_file in pdf_files
+        if strip_new_keys(ward_pdf_parser.parse_pdf_content(pdf_file)) != legacy_parsers.parse_pdf_content(pdf_file)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ward PDF parsers in pages/sec")
+    parser.add_argument('pdf_files', nargs='*', help='ward PDFs (default: ward_*_records.pdf here)')
+    parser.add_argument('--repeat', type=int, default=3, help='passes per parser; the best is reported')
+    parser.add_argument('--end-to-end', action='store_true',
+                        help='include text extraction (legacy) and the warm page text cache (new)')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # The legacy parsers log every page
+    pdf_files = args.pdf_files or sorted(glob.glob('ward_*_records.pdf'))
+    if not pdf_files:
+        print("No ward PDFs found")
+        return 1
+
+    print(f"Extracting text from {len(pdf_files)} file(s)...")
+    texts = {pdf_file: [page.extract_text() for page in PdfReader(pdf_file).pages] for pdf_file in pdf_files}
+    total_pages = sum(len(pages) for pages in texts.values())
+
+    if args.end_to_end:
+        # Warm a private page text cache so the shared parser never decodes a page
+        cache_dir = tempfile.mkdtemp()
+        ward_pdf_parser.CachedPageTexts = lambda pdf_path: CachedPageTexts(
+            pdf_path, cache_path=os.path.join(cache_dir, 'page_text_cache.db'))
+        for pdf_file in pdf_files:
+            ward_pdf_parser.parse_pdf_content(pdf_file)
+        mode = "end to end"
+    else:
+        PreloadedReader.texts = PreloadedPageTexts.texts = texts
+        legacy_parsers.PdfReader = PreloadedReader
+        ward_pdf_parser.CachedPageTexts = PreloadedPageTexts
+        mode = "parse only"
+
+    mismatched = check_parity(pdf_files)
+
+    print(f"\n{total_pages} pages, best of {args.repeat}, {mode}")
+    print(f"{'parser':<36}{'seconds':>10}{'pages/s':>12}{'speedup':>10}")
+    baseline = None
+    results = []
+    for name, parse in IMPLEMENTATIONS:
+        elapsed = time_parser(parse, pdf_files, args.repeat)
+        results.append((name, elapsed))
+        if name == 'legacy parse_pdf_content':
+            baseline = elapsed
+    for name, elapsed in results:
+        print(f"{name:<36}{elapsed:>10.3f}{total_pages / elapsed:>12.0f}{baseline / elapsed:>9.2f}x")
+
+    if mismatched:
+        print(f"\nPARITY FAILED on {len(mismatched)} file(s): {', '.join(mismatched)}")
+        return 1
+    print("\nParity OK: shared parser output matches legacy parse_pdf_content")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Compare read and write concurrency with SQLite's defaults and the tuned PRAGMAs.
+
+For each mode a scratch set of databases is filled by load_synthetic_data.py,
+then reader threads open a patient's care notes (as the patient page does)
+while writer threads add a care note and an audit log entry (as add_note
+and log_access do), each on a new connection per operation like the app's
+NullPool checkouts. "default" leaves SQLite's rollback journal and
+defaults; "tuned" applies utils/sqlite_tuning.py. The live databases are
+not touched.
+
+Usage:
+    python benchmarks/benchmark_sqlite_concurrency.py [--seconds 10] [--readers 4] [--writers 2]
+        [--patients 5000] [--notes 200000]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Add parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Log to a scratch directory, not the app's logs/app.log
+os.environ.setdefault('LOG_DIR', os.path.join(tempfile.gettempdir(), 'ward_benchmark_logs'))
+
+from sqlalchemy.exc import OperationalError
+
+from app import app, db
+from load_synthetic_data import load_synthetic_data, synthetic_databases
+from models import AuditLog, CareNote
+
+READ_NOTES = db.text("SELECT id, note, timestamp, staff_name FROM care_note "
+                     "WHERE patient_id = :patient_id ORDER BY timestamp DESC")
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def reader(engine, patient_ids, stop_event, latencies, errors, seed):
+    rng = random.Random(seed)
+    while not stop_event.is_set():
+        started = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(READ_NOTES, {'patient_id': rng.choice(patient_ids)}).fetchall()
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors.append(time.perf_counter() - started)
+
+def writer(users_engine, audit_engine, patient_ids, stop_event, latencies, errors, seed):
+    rng = random.Random(seed)
+    while not stop_event.is_set():
+        patient_id = rng.choice(patient_ids)
+        started = time.perf_counter()
+        try:
+            with users_engine.begin() as conn:
+                conn.execute(CareNote.__table__.insert(), {
+                    'patient_id': patient_id, 'user_id': 1, 'note': 'Benchmark note', 'ward_id': None,
+                    'timestamp': datetime.utcnow(), 'is_pdf_note': False,
+                })
+            with audit_engine.begin() as conn:
+                conn.execute(AuditLog.__table__.insert(), {
+                    'user_id': 1, 'username': 'admin', 'action': 'add_note', 'patient_id': patient_id,
+                    'timestamp': datetime.utcnow(),
+                })
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors.append(time.perf_counter() - started)
+
+def run_mode(tuned, args):
+    """Load scratch databases with tuning on or off and run the workload; returns the result row"""
+    app.config['SQLITE_TUNING'] = tuned
+    with tempfile.TemporaryDirectory() as scratch:
+        load_synthetic_data(scratch, wards=50, patients=args.patients, notes=args.notes, users=10,
+                            audit_entries=args.patients, seed=args.seed)
+        with synthetic_databases(scratch):
+            users_engine, audit_engine = db.get_engine(app), db.get_engine(app, bind='audit')
+            with db.get_engine(app, bind='pdf_parsed').connect() as conn:
+                patient_ids = [row[0] for row in conn.execute(db.text("SELECT hospital_id FROM patient"))]
+            with users_engine.connect() as conn:
+                journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+
+            stop_event = threading.Event()
+            reads, read_errors, writes, write_errors = [], [], [], []
+            threads = [threading.Thread(target=reader, args=(users_engine, patient_ids, stop_event, reads,
+                                                              read_errors, args.seed + i))
+                       for i in range(args.readers)]
+            threads += [threading.Thread(target=writer, args=(users_engine, audit_engine, patient_ids, stop_event,
+                                                              writes, write_errors, args.seed + 100 + i))
+                        for i in range(args.writers)]
+            for thread in threads:
+                thread.start()
+            time.sleep(args.seconds)
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+            users_engine.dispose()
+            audit_engine.dispose()
+    return {
+        'mode': f"{'tuned' if tuned else 'default'} ({journal_mode})",
+        'reads/s': len(reads) / args.seconds,
+        'read p50': percentile(reads, 0.5),
+        'read p99': percentile(reads, 0.99),
+        'writes/s': len(writes) / args.seconds,
+        'write p50': percentile(writes, 0.5),
+        'write p99': percentile(writes, 0.99),
+        'locked': len(read_errors) + len(write_errors),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10, help='length of each run')
+    parser.add_argument('--readers', type=int, default=4, help='threads opening patients')
+    parser.add_argument('--writers', type=int, default=2, help='threads adding notes and audit entries')
+    parser.add_argument('--patients', type=int, default=5000, help='synthetic patients to load')
+    parser.add_argument('--notes', type=int, default=200000, help='synthetic care notes to load')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    live_tuning = app.config.get('SQLITE_TUNING', True)
+    rows = []
+    try:
+        for tuned in (False, True):
+            print(f"Running {'tuned' if tuned else 'default'} for {args.seconds:g} s...")
+            rows.append(run_mode(tuned, args))
+    finally:
+        app.config['SQLITE_TUNING'] = live_tuning
+
+    print(f"\n{args.readers} reader(s), {args.writers} writer(s), {args.notes} notes")
+    print(f"{'mode':<18}{'reads/s':>9}{'p50 ms':>8}{'p99 ms':>8}{'writes/s':>10}{'p50 ms':>8}{'p99 ms':>8}{'locked':>8}")
+    for row in rows:
+        print(f"{row['mode']:<18}{row['reads/s']:>9.0f}{row['read p50'] * 1000:>8.1f}{row['read p99'] * 1000:>8.1f}"
+              f"{row['writes/s']:>10.0f}{row['write p50'] * 1000:>8.1f}{row['write p99'] * 1000:>8.1f}"
+              f"{row['locked']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark the page text extractors and check they parse to the same records.
+
+Times every extractor in utils/text_extractors.py over all pages of the
+given ward PDFs (opening the file included, no page text cache), then
+checks parity against PyPDF2: page by page on the extracted text, and on
+the patients and notes utils.ward_pdf_parser.parse_pdf_content returns.
+Exits with status 1 if any extractor disagrees with PyPDF2.
+
+Usage (from the directory holding the ward PDFs):
+    python benchmarks/benchmark_text_extractors.py [--repeat N] [ward_X_records.pdf ...]
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+
+# Add parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader
+
+import utils.ward_pdf_parser as ward_pdf_parser
+from utils.page_text_cache import CachedPageTexts
+from utils.text_extractors import EXTRACTORS, PyPDF2Extractor, get_extractor
+
+def extract_all(name, pdf_files):
+    """Return ({pdf_file: [page text]}, seconds, fallback pages) for one extractor"""
+    extractor = get_extractor(name)
+    texts = {}
+    started = time.perf_counter()
+    for pdf_file in pdf_files:
+        reader = PdfReader(pdf_file)
+        texts[pdf_file] = [extractor.page_text(reader, page_idx) for page_idx in range(len(reader.pages))]
+    return texts, time.perf_counter() - started, getattr(extractor, 'fallback_pages', 0)
+
+def parse_with(name, pdf_file):
+    """parse_pdf_content on pdf_file with page text from one extractor and no cache"""
+    original = ward_pdf_parser.CachedPageTexts
+    ward_pdf_parser.CachedPageTexts = lambda pdf_path: CachedPageTexts(pdf_path, max_mb=0, extractor=get_extractor(name))
+    try:
+        return ward_pdf_parser.parse_pdf_content(pdf_file)
+    finally:
+        ward_pdf_parser.CachedPageTexts = original
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF page text extractors in pages/sec")
+    parser.add_argument('pdf_files', nargs='*', help='ward PDFs (default: ward_*_records.pdf here)')
+    parser.add_argument('--repeat', type=int, default=3, help='passes per extractor; the best is reported')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    pdf_files = args.pdf_files or sorted(glob.glob('ward_*_records.pdf'))
+    if not pdf_files:
+        print("No ward PDFs found")
+        return 1
+
+    results = {}
+    for name in EXTRACTORS:
+        best = None
+        for _ in range(args.repeat):
+            texts, elapsed, fallback_pages = extract_all(name, pdf_files)
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (texts, best, fallback_pages)
+
+    reference_texts, baseline, _ = results[PyPDF2Extractor.name]
+    total_pages = sum(len(pages) for pages in reference_texts.values())
+    print(f"{total_pages} pages in {len(pdf_files)} file(s), best of {args.repeat}")
+    print(f"{'extractor':<14}{'seconds':>10}{'pages/s':>10}{'speedup':>10}{'fallback':>10}{'same text':>11}")
+
+    failed = []
+    reference_records = {pdf_file: parse_with(PyPDF2Extractor.name, pdf_file) for pdf_file in pdf_files}
+    for name, (texts, elapsed, fallback_pages) in results.items():
+        same_pages = sum(
+            text == reference
+            for pdf_file in pdf_files for text, reference in zip(texts[pdf_file], reference_texts[pdf_file])
+        )
+        print(f"{name:<14}{elapsed:>10.3f}{total_pages / elapsed:>10.0f}{baseline / elapsed:>9.2f}x"
+              f"{fallback_pages:>10}{same_pages:>6}/{total_pages}")
+        if name != PyPDF2Extractor.name:
+            mismatched = [pdf_file for pdf_file in pdf_files if parse_with(name, pdf_file) != reference_records[pdf_file]]
+            if mismatched:
+                failed.append(f"{name} on {', '.join(mismatched)}")
+
+    if failed:
+        print(f"\nPARITY FAILED: parsed records differ from PyPDF2 for {'; '.join(failed)}")
+        return 1
+    print("\nParity OK: every extractor parses to the same patients and notes as PyPDF2")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
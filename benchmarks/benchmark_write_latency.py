@@ -0,0 +1,112 @@
+"""Measure how long the app's writes wait for the SQLite lock during an import.
+
+Imports the ward PDFs into scratch databases while a probe thread plays the
+app: every --probe-interval ms it takes the users.db write lock (BEGIN
+IMMEDIATE, as add_care_note and log_access effectively do) and records how
+long that took, or that it failed with "database is locked". The import is
+run unthrottled and with each --budget so the latency spikes can be
+compared. A first untimed import fills the page text cache so every mode
+parses at the same speed. The live databases are not touched.
+
+Usage (from the directory holding the ward PDFs):
+    python benchmarks/benchmark_write_latency.py [--budget 50] [--probe-interval 20] [ward_X_records.pdf ...]
+"""
+import argparse
+import glob
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Log to a scratch directory, not the app's logs/app.log
+os.environ.setdefault('LOG_DIR', os.path.join(tempfile.gettempdir(), 'ward_benchmark_logs'))
+
+from app import app, db
+from load_synthetic_data import synthetic_databases
+from utils.pdf_manifest import ensure_manifest_table
+from utils.ward_import import import_ward_pdfs
+
+# Seconds a probe waits for the lock before counting as "database is locked" (pysqlite's default)
+PROBE_LOCK_TIMEOUT = 5.0
+
+def probe_writes(db_path, interval, stop_event, latencies, errors):
+    """Take and release the write lock of db_path every interval seconds until stop_event is set"""
+    conn = sqlite3.connect(db_path, timeout=PROBE_LOCK_TIMEOUT, isolation_level=None)
+    try:
+        while not stop_event.is_set():
+            started = time.perf_counter()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("COMMIT")
+                latencies.append(time.perf_counter() - started)
+            except sqlite3.OperationalError:
+                errors.append(time.perf_counter() - started)
+            stop_event.wait(interval)
+    finally:
+        conn.close()
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def run_import(pdf_files, write_budget_ms, probe_interval):
+    """Import pdf_files into fresh scratch databases while probing; returns the result row"""
+    with tempfile.TemporaryDirectory() as scratch:
+        users_db = os.path.join(scratch, 'users.db')
+        latencies, errors = [], []
+        stop_event = threading.Event()
+        try:
+            with synthetic_databases(scratch):
+                db.create_all()
+                ensure_manifest_table(db.get_engine(app, bind='pdf_parsed'))
+                prober = threading.Thread(target=probe_writes,
+                                          args=(users_db, probe_interval / 1000, stop_event, latencies, errors))
+                prober.start()
+                started = time.perf_counter()
+                import_ward_pdfs(pdf_files, force=True, write_budget_ms=write_budget_ms)
+                elapsed = time.perf_counter() - started
+                stop_event.set()
+                prober.join()
+                notes = db.session.execute(db.text("SELECT COUNT(*) FROM care_note")).scalar()
+        finally:
+            stop_event.set()
+    return {
+        'mode': f"{write_budget_ms} ms budget" if write_budget_ms else "unthrottled",
+        'seconds': elapsed,
+        'notes': notes,
+        'probes': len(latencies) + len(errors),
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        'max': max(latencies, default=0.0),
+        'locked': len(errors),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pdf_files', nargs='*', help='ward PDFs (default: ward_*_records.pdf)')
+    parser.add_argument('--budget', type=int, action='append',
+                        help='write budget in ms to compare against the unthrottled import (repeatable)')
+    parser.add_argument('--probe-interval', type=float, default=20,
+                        help='milliseconds between probe writes')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    pdf_files = args.pdf_files or sorted(glob.glob('ward_*_records.pdf'))
+    if not pdf_files:
+        sys.exit("No ward PDFs found")
+    budgets = [None] + (args.budget or [50])
+    run_import(pdf_files, None, args.probe_interval)  # Warm the page text cache
+
+    print(f"{'mode':<18}{'import s':>10}{'notes':>8}{'probes':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'locked':>8}")
+    for budget in budgets:
+        row = run_import(pdf_files, budget, args.probe_interval)
+        print(f"{row['mode']:<18}{row['seconds']:>10.2f}{row['notes']:>8}{row['probes']:>8}{row['p50'] * 1000:>9.1f}"
+              f"{row['p99'] * 1000:>9.1f}{row['max'] * 1000:>9.1f}{row['locked']:>8}")
+
+if __name__ == "__main__":
+    main()
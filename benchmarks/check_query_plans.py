@@ -0,0 +1,145 @@
+"""Check with EXPLAIN QUERY PLAN that the app's hot queries are served by an index.
+
+Each query below is built the way its route builds it. A query passes if
+SQLite reads every table through an index (or the rowid) rather than a full
+scan, uses the index listed for it, and does not sort the results in a
+temp B-tree. By default the plans are taken on scratch databases filled by
+load_synthetic_data.py (which ANALYZEs them); --live checks the app's own
+databases, after migrations/apply_indexes.py.
+
+Exits with status 1 if any query fails.
+
+Usage:
+    python benchmarks/check_query_plans.py [--patients 2000] [--notes 100000]
+    python benchmarks/check_query_plans.py --live
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Add parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Log to a scratch directory, not the app's logs/app.log
+os.environ.setdefault('LOG_DIR', os.path.join(tempfile.gettempdir(), 'ward_benchmark_logs'))
+
+from app import app, db, care_notes_with_names
+from load_synthetic_data import load_synthetic_data, synthetic_databases
+from models import AuditLog, CareNote, Patient, RecentlyViewedPatient, User
+
+PATIENT_ID = '1000000001'
+WARD = '1'
+USER_ID = 1
+
+def hot_queries():
+    """(name, bind, index names any of which must be used, statement) of each hot query"""
+    cutoff = datetime.utcnow() - timedelta(hours=12)
+    manual_notes = care_notes_with_names().filter(CareNote.is_pdf_note == False)
+    return [
+        ('patient: care notes', None, ['uq_carenote_natural_key'],
+         CareNote.query.filter_by(patient_id=PATIENT_ID).order_by(CareNote.timestamp.desc())),
+        ('load_more_notes', None, ['uq_carenote_natural_key'],
+         CareNote.query.filter_by(patient_id=PATIENT_ID).order_by(CareNote.timestamp.desc()).offset(20).limit(20)),
+        ('patient: lookup', 'pdf_parsed', ['sqlite_autoindex_patient_1'],
+         Patient.query.filter_by(hospital_id=PATIENT_ID, is_active=True)),
+        ('ward: patients', 'pdf_parsed', ['idx_patient_ward_active_name'],
+         Patient.query.filter_by(current_ward=WARD, is_active=True).order_by(Patient.name)),
+        ('ward_patient_count', 'pdf_parsed', ['idx_patient_ward_active_name'],
+         db.session.query(db.func.count(Patient.id)).filter_by(current_ward=WARD, is_active=True)),
+        ('index: patients per ward', 'pdf_parsed', ['idx_patient_ward_active_name'],
+         db.session.query(Patient.current_ward, db.func.count(Patient.id)).filter(
+             Patient.is_active == True).group_by(Patient.current_ward)),
+        ('my_shift_notes', None, ['idx_carenote_user_timestamp'],
+         care_notes_with_names().filter(CareNote.user_id == USER_ID, CareNote.timestamp >= cutoff).order_by(
+             CareNote.timestamp.desc())),
+        ('my_shift_notes: show all', None, ['idx_carenote_user_timestamp'],
+         care_notes_with_names().filter(CareNote.user_id == USER_ID).order_by(CareNote.timestamp.desc())),
+        ('admin_notes', None, ['idx_carenote_is_pdf_note_timestamp'],
+         manual_notes.order_by(CareNote.timestamp.desc()).limit(50)),
+        ('admin_notes: by date', None, ['idx_carenote_is_pdf_note_timestamp'],
+         manual_notes.filter(CareNote.timestamp >= cutoff - timedelta(days=7), CareNote.timestamp <= cutoff)
+         .order_by(CareNote.timestamp.desc()).limit(50)),
+        ('admin_notes: by ward', None, ['idx_carenote_ward_timestamp', 'idx_carenote_is_pdf_note_timestamp'],
+         manual_notes.filter(CareNote.ward_id == WARD).order_by(CareNote.timestamp.desc()).limit(50)),
+        ('admin_notes: note authors', None, ['idx_carenote_user_timestamp'],
+         db.session.query(User.username).filter(db.exists().where(CareNote.user_id == User.id)).order_by(
+             User.username)),
+        ('export_notes', None, ['idx_carenote_is_pdf_note_timestamp'],
+         manual_notes.order_by(CareNote.timestamp.desc())),
+        ('recent_patients', None, ['idx_recently_viewed_user_viewed_at'],
+         RecentlyViewedPatient.query.filter_by(user_id=USER_ID).order_by(RecentlyViewedPatient.viewed_at.desc())),
+        ('view_audit_log', 'audit', ['idx_auditlog_timestamp'],
+         AuditLog.query.order_by(AuditLog.timestamp.desc())),
+        ('import priority: ward views', 'audit', ['idx_auditlog_action_target'],
+         db.session.query(AuditLog.patient_id, db.func.count(AuditLog.id)).filter(
+             AuditLog.action == 'view_ward', AuditLog.patient_id.like('Ward %'),
+             AuditLog.timestamp >= cutoff - timedelta(days=14)).group_by(AuditLog.patient_id)),
+    ]
+
+def query_plan(engine, query):
+    """The detail lines of SQLite's EXPLAIN QUERY PLAN for an ORM query"""
+    compiled = query.statement.compile(dialect=engine.dialect)
+    params = compiled.construct_params()
+    values = tuple(str(value) if isinstance(value, datetime) else value
+                   for value in (params[name] for name in compiled.positiontup))
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", values)]
+
+def plan_problems(plan, indexes):
+    """What is wrong with a query plan, if anything"""
+    problems = []
+    for line in plan:
+        if line.startswith(('SCAN ', 'SEARCH ')) and ' USING ' not in line:
+            problems.append(f"full table scan: {line}")
+        if 'USE TEMP B-TREE' in line:
+            problems.append(f"sorts: {line}")
+    if not any(f"INDEX {index}" in line for line in plan for index in indexes):
+        problems.append(f"does not use {' or '.join(indexes)}")
+    return problems
+
+def check_plans():
+    """Print the plan of every hot query; returns the number that failed"""
+    failed = 0
+    for name, bind, indexes, query in hot_queries():
+        plan = query_plan(db.get_engine(app, bind), query)
+        problems = plan_problems(plan, indexes)
+        failed += bool(problems)
+        print(f"{'FAIL' if problems else 'ok':<6}{name}")
+        for line in plan:
+            print(f"        {line}")
+        for problem in problems:
+            print(f"      ! {problem}")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--live', action='store_true', help="check the app's databases instead of scratch ones")
+    parser.add_argument('--patients', type=int, default=2000, help='synthetic patients to load')
+    parser.add_argument('--notes', type=int, default=100000, help='synthetic care notes to load')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    if args.live:
+        with app.app_context():
+            failed = check_plans()
+    else:
+        with tempfile.TemporaryDirectory() as scratch:
+            load_synthetic_data(scratch, wards=50, patients=args.patients, notes=args.notes, users=20,
+                                audit_entries=args.patients * 5, seed=args.seed)
+            with synthetic_databases(scratch):
+                failed = check_plans()
+                db.session.remove()
+                for bind in [None] + list(app.config['SQLALCHEMY_BINDS']):
+                    db.get_engine(app, bind).dispose()
+
+    if failed:
+        print(f"\n{failed} hot quer{'y' if failed == 1 else 'ies'} not served by an index")
+        return 1
+    print("\nAll hot queries use an index without a temp B-tree sort")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
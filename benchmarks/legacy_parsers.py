@@ -0,0 +1,258 @@
+"""Ward PDF parsers as they were before utils.ward_pdf_parser replaced them.
+
+Kept only as the reference for benchmarks/benchmark_pdf_parsers.py; nothing
+in the application imports this module.
+"""
+import logging
+import re
+from datetime import datetime
+
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# initialize_database.parse_pdf_content (reset_and_initialize had an identical copy)
+def parse_pdf_content(pdf_path, patient_id=None):
+    """Extract patient info and notes from PDF file"""
+    patient_data = {}
+    current_patient = None
+    current_patient_id = None
+    try:
+        reader = PdfReader(pdf_path)
+        for page_idx in range(len(reader.pages)):
+            page = reader.pages[page_idx]
+            text = page.extract_text()
+            # Check if this is a new patient record
+            if "Patient Record - Ward" in text:
+                # Save previous patient if exists
+                if current_patient_id and current_patient:
+                    if not patient_id or current_patient_id == patient_id:
+                        patient_data[current_patient_id] = current_patient
+                # Reset for new patient
+                current_patient = {
+                    "info": {},
+                    "name": "Unknown",
+                    "vitals": "",
+                    "care_notes": []
+                }
+                current_patient_id = None
+                in_care_notes = False
+                
+            # Extract patient ID - MUST do this for all patients
+            if current_patient and not current_patient_id:
+                id_match = re.search(r"Patient ID:\s*(\d+)", text)
+                if id_match:
+                    current_patient_id = id_match.group(1).strip()
+                    
+            # If we found the specific patient we're looking for, or we want all patients
+            if not patient_id or (current_patient_id and (current_patient_id == patient_id)):
+                # Extract name if we haven't yet
+                if current_patient and current_patient["name"] == "Unknown":
+                    name_match = re.search(r"Name:\s*([^\n]+)", text)
+                    if name_match:
+                        current_patient["name"] = name_match.group(1).strip()
+                
+                # Extract DOB if we haven't yet
+                if current_patient and "DOB" not in current_patient["info"]:
+                    dob_match = re.search(r"DOB:\s*([^\n]+)", text)
+                    if dob_match:
+                        current_patient["info"]["DOB"] = dob_match.group(1).strip()
+                
+                # Check for care notes section
+                if "Continuous Care Notes" in text and not in_care_notes:
+                    in_care_notes = True
+                
+                # Extract care notes if we're in that section
+                if in_care_notes and current_patient:
+                    care_notes_text = text
+                    if "Continuous Care Notes" in text:
+                        care_notes_section = text.split("Continuous Care Notes", 1)
+                        if len(care_notes_section) > 1:
+                            care_notes_text = care_notes_section[1].strip()
+                    
+                    # Extract individual notes using regex pattern
+                    care_notes_pattern = r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2})\s+([^,]+(?:, [A-Z]+)?)\s+(.+?)(?=(?:\d{4}-\d{2}-\d{2} \d{2}:\d{2})|$)"
+                    matches = list(re.finditer(care_notes_pattern, care_notes_text, re.DOTALL))
+                    
+                    for match in matches:
+                        date = match.group(1).strip()
+                        staff = match.group(2).strip()
+                        note = match.group(3).strip()
+                        if date and staff and note:
+                            current_patient["care_notes"].append({
+                                "date": date,
+                                "staff": staff,
+                                "note": note
+                            })
+            
+        # Don't forget to add the last patient
+        if current_patient_id and current_patient:
+            if not patient_id or current_patient_id == patient_id:
+                patient_data[current_patient_id] = current_patient
+                
+        return patient_data
+        
+    except Exception as e:
+        logger.error(f"PDF parsing error: {str(e)}")
+        return {}
+
+# migrations/migrate_to_new_schema.extract_patient_info
+def extract_patient_info(pdf_path):
+    """Extract patient information from PDF files"""
+    logger.info(f"Extracting patient information from {pdf_path}")
+    
+    try:
+        # Create a PDF reader object
+        reader = PdfReader(pdf_path)
+        
+        # Store patient data
+        patients = {}
+        current_patient_id = None
+        
+        # Process each page for patient headers
+        for page_num, page in enumerate(reader.pages):
+            text = page.extract_text()
+            logger.info(f"Processing page {page_num+1}, text length: {len(text)}")
+            
+            # Find patient records
+            # This regex pattern needs to match how patient IDs appear in your PDFs
+            patient_pattern = r'(\d{10})\s+([A-Za-z\s,\-]+)(?:\s+DOB:\s+(\d{2}/\d{2}/\d{4}))?'
+            
+            for match in re.finditer(patient_pattern, text):
+                patient_id, name, dob = match.groups()
+                current_patient_id = patient_id  # Track current patient for care notes
+                
+                # Add patient to our dictionary if not already there
+                if patient_id not in patients:
+                    patients[patient_id] = {
+                        'name': name.strip(),
+                        'info': {
+                            'DOB': dob if dob else 'Unknown'
+                        },
+                        'care_notes': []
+                    }
+                    
+                    logger.info(f"Found patient: {patient_id} - {name.strip()}")
+            
+            # Now extract care notes if we found any patients
+            if current_patient_id and "Continuous Care Notes" in text:
+                # Find the care notes section
+                sections = text.split("Continuous Care Notes")
+                if len(sections) > 1:
+                    notes_section = sections[1]
+                    lines = notes_section.split('\n')
+                    
+                    # Look for notes after header row
+                    in_notes_table = False
+                    for line in lines:
+                        if "Date & Time" in line and "Staff Member" in line and "Notes" in line:
+                            in_notes_table = True
+                            continue
+                        
+                        if in_notes_table and line.strip():
+                            # Try to match date pattern at start of line (YYYY-MM-DD HH:MM)
+                            date_match = re.match(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2})', line)
+                            if date_match:
+                                try:
+                                    date_str = date_match.group(1)
+                                    remaining = line[len(date_str):].strip()
+                                    
+                                    # Split remaining text to get staff and note
+                                    parts = [p for p in re.split(r'\s{2,}', remaining) if p.strip()]
+                                    
+                                    if len(parts) >= 2:
+                                        staff = parts[0].strip()
+                                        note = ' '.join(parts[1:]).strip()
+                                        
+                                        # Add note to current patient
+                                        if current_patient_id in patients:
+                                            patients[current_patient_id]['care_notes'].append({
+                                                'date': date_str,
+                                                'staff': staff,
+                                                'note': note
+                                            })
+                                            logger.debug(f"Added note for {current_patient_id}: {date_str}")
+                                except Exception as e:
+                                    logger.error(f"Error parsing note line: {line[:50]}... Error: {str(e)}")
+        
+        # Log summary of extracted notes
+        for patient_id, data in patients.items():
+            logger.info(f"Patient {patient_id} has {len(data.get('care_notes', []))} care notes")
+            
+        logger.info(f"Extracted {len(patients)} patients from {pdf_path}")
+        return patients
+        
+    except Exception as e:
+        logger.error(f"Error extracting data from {pdf_path}: {str(e)}")
+        return {}
+
+# migrations/transfer_pdf_notes.extract_notes_from_pdf
+def extract_notes_from_pdf(pdf_path):
+    """Extract care notes from PDF with improved table parsing"""
+    try:
+        logger.info(f"Extracting notes from: {pdf_path}")
+        reader = PdfReader(pdf_path)
+        notes = []
+        
+        # Process each page in the PDF
+        for page_num, page in enumerate(reader.pages):
+            text = page.extract_text()
+            logger.info(f"Processing page {page_num+1}, text length: {len(text)}")
+            
+            # Debug: First 200 chars of each page to see content structure
+            logger.debug(f"Page {page_num+1} start: {text[:200]}")
+            
+            # Check if this page contains care notes
+            if "Continuous Care Notes" in text:
+                # Split into lines
+                lines = text.split('\n')
+                notes_section = False
+                header_found = False
+                
+                for line in lines:
+                    # Skip until we find "Continuous Care Notes" section
+                    if "Continuous Care Notes" in line:
+                        notes_section = True
+                        logger.debug("Found 'Continuous Care Notes' section")
+                        continue
+                    
+                    # Look for header row after finding notes section
+                    if notes_section and not header_found and "Date & Time" in line and "Staff Member" in line:
+                        header_found = True
+                        logger.debug("Found header row")
+                        continue
+                    
+                    # Now process actual note rows (after section and header are found)
+                    if notes_section and header_found and line.strip():
+                        # Try to match the date/time pattern at the start of the line
+                        date_match = re.match(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2})', line)
+                        if date_match:
+                            try:
+                                # Get the datetime from the match
+                                datetime_str = date_match.group(1)
+                                
+                                # Rest of the line after the datetime
+                                remaining = line[len(datetime_str):].strip()
+                                
+                                # Extract staff name (usually appears next and ends with commas/spaces)
+                                staff_parts = remaining.split('  ')[0].strip()
+                                # Get the actual note text (everything after staff name)
+                                note_text = remaining[len(staff_parts):].strip()
+                                
+                                # Only add if we have valid data
+                                if datetime_str and staff_parts and note_text:
+                                    notes.append({
+                                        'timestamp': datetime.strptime(datetime_str, '%Y-%m-%d %H:%M'),
+                                        'staff_name': staff_parts,
+                                        'note_text': note_text
+                                    })
+                                    logger.debug(f"Extracted note: {datetime_str} | {staff_parts[:20]} | {note_text[:30]}...")
+                            except Exception as e:
+                                logger.error(f"Error parsing note line: {line[:50]}... Error: {str(e)}")
+        
+        logger.info(f"Successfully extracted {len(notes)} notes from PDF")
+        return notes
+        
+    except Exception as e:
+        logger.error(f"Error reading PDF {pdf_path}: {str(e)}")
+        return []
@@ -12,9 +12,8 @@ class Config:
         'pdf_parsed': 'sqlite:///pdf_parsed.db'  # New database for PDF parsed information
     }
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True,
-    }
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # No pool_pre_ping: connections to local SQLite files never go stale
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') == '1'  # See utils/sqlite_tuning.py
     
     # Session settings
     SESSION_COOKIE_SECURE = True
@@ -25,5 +24,19 @@ class Config:
     # PDF directory
     PDF_DIRECTORY = os.environ.get('PDF_DIRECTORY') or '.'
     
+    # Cache of extracted PDF page text (0 MB disables it)
+    PAGE_TEXT_CACHE_PATH = os.environ.get('PAGE_TEXT_CACHE_PATH') or 'page_text_cache.db'
+    PAGE_TEXT_CACHE_MAX_MB = float(os.environ.get('PAGE_TEXT_CACHE_MAX_MB') or 512)
+    
+    # Page text extractor: 'reportlab' reads our generated PDFs directly and falls back to 'pypdf2'
+    PDF_TEXT_EXTRACTOR = os.environ.get('PDF_TEXT_EXTRACTOR') or 'reportlab'
+    
+    # Lock file that keeps the hot-folder watcher (INGEST_DAEMON, ingest_daemon.py) to one process
+    INGEST_LOCK_PATH = os.environ.get('INGEST_LOCK_PATH') or 'ingest_daemon.lock'
+    
+    # JSON telemetry reports of ward PDF imports
+    IMPORT_REPORT_DIR = os.environ.get('IMPORT_REPORT_DIR') or 'import_reports'
+    
     # Logging
     LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT')
+    LOG_DIR = os.environ.get('LOG_DIR') or 'logs'  # app.log and its rotations
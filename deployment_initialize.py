@@ -1,30 +1,56 @@
 from app import app, db
-from models import Ward, Patient
-import os
+from models import Ward
+from utils.bulk_import import patient_row, write_batch
+from utils.import_priority import prioritize_pdfs
+from utils.pdf_manifest import PATIENTS_ONLY, ensure_manifest_table, record_imported_pdf, split_changed_pdfs
+from utils.reconcile import reconcile_ward
 from datetime import datetime
 from sqlalchemy import text
 import re
-from initialize_database import parse_pdf_content  # Import the function from initialize_database
+from config import Config
+from utils.ward_pdf_parser import iter_pdf_patients, list_ward_pdfs, ward_number_for
+from utils.parallel_import import (
+    DEFAULT_PDF_TIMEOUT, PdfParseError, build_arg_parser, iter_parsed_ward_pdfs, resolve_jobs
+)
 
-def process_ward_pdfs():
-    """Process existing ward PDFs and update database tables"""
+def process_ward_pdfs(jobs=1, timeout=DEFAULT_PDF_TIMEOUT, force=False):
+    """Process existing ward PDFs and update database tables
+
+    jobs > 1 parses the PDFs in a process pool; this process applies the results.
+    Files unchanged since their last import are skipped unless ``force``.
+    """
     with app.app_context():
         try:
             print("Processing existing ward PDFs...")
             
             # Get list of existing ward PDFs
-            ward_files = [f for f in os.listdir('.') if f.startswith('ward_') and f.endswith('_records.pdf')]
+            ward_files = list_ward_pdfs(Config.PDF_DIRECTORY)
             
             if not ward_files:
-                print("No ward PDF files found in current directory")
+                print(f"No ward PDF files found in {Config.PDF_DIRECTORY}")
                 return False
             
             print(f"Found {len(ward_files)} ward PDF files")
             
-            # Process each ward file
-            for pdf_filename in ward_files:
+            # Skip files whose fingerprint matches the last successful import
+            ensure_manifest_table(db.get_engine(app, 'pdf_parsed'))
+            changed_files, unchanged_files = split_changed_pdfs(ward_files, force=force, scope=PATIENTS_ONLY)
+            for pdf_filename in sorted(unchanged_files):
+                print(f"Skipping unchanged {pdf_filename}")
+            fingerprints = dict(changed_files)
+            ward_files = prioritize_pdfs(list(fingerprints))  # Busy wards first
+            
+            # Process each ward file as its patients stream in from the parser
+            failed_files = []
+            for pdf_filename, patient_records, error in iter_parsed_ward_pdfs(
+                    ward_files, iter_pdf_patients, resolve_jobs(jobs), timeout):
+                if error:
+                    print(f"\nFailed to parse {pdf_filename}: {error}")
+                    failed_files.append(pdf_filename)
+                    continue
+                
                 # Extract ward number/name from filename (between 'ward_' and '_records.pdf')
-                ward_part = pdf_filename[5:-12]  # Remove 'ward_' and '_records.pdf'
+                ward_part = ward_number_for(pdf_filename)
                 
                 # Determine display name
                 if ward_part.startswith('Long_'):
@@ -52,38 +78,37 @@ def process_ward_pdfs():
                     ward.last_updated = datetime.utcnow()
                     print(f"Updated existing ward record: {display_name}")
                 
-                # Extract patient data from PDF
-                patient_data = parse_pdf_content(pdf_filename)
-                print(f"Found {len(patient_data)} patients in {pdf_filename}")
-                
-                # Create or update patient records
-                for patient_id, info in patient_data.items():
-                    existing_patient = Patient.query.filter_by(hospital_id=patient_id).first()
-                    
-                    if not existing_patient:
-                        # Create new patient record
-                        patient = Patient(
-                            hospital_id=patient_id,
-                            name=info.get('name', 'Unknown'),
-                            dob=info.get('info', {}).get('DOB', ''),
-                            current_ward=ward_part,
-                            pdf_file=pdf_filename,
-                            is_active=True
-                        )
-                        db.session.add(patient)
-                        print(f"Created new patient record: {patient_id}")
-                    else:
-                        # Update existing patient record
-                        existing_patient.name = info.get('name', 'Unknown')
-                        existing_patient.dob = info.get('info', {}).get('DOB', '')
-                        existing_patient.current_ward = ward_part
-                        existing_patient.pdf_file = pdf_filename
-                        existing_patient.is_active = True
-                        print(f"Updated existing patient record: {patient_id}")
+                try:
+                    # Insert new patients in one statement as they stream in
+                    patient_rows, roster = [], []
+                    for patient_id, info in patient_records:
+                        row = patient_row(patient_id, info, ward_part, pdf_filename)
+                        row['section_hash'] = None  # Notes are not imported here
+                        patient_rows.append(row)
+                        roster.append((patient_id, row['name'], row['dob']))
+                    patient_count = len(patient_rows)
+                    write_batch(patient_rows, [])
+                except PdfParseError as e:
+                    db.session.rollback()
+                    print(f"\nFailed to parse {pdf_filename}: {e}")
+                    failed_files.append(pdf_filename)
+                    continue
                 
+                # Move transferred patients here and discharge the ones no longer listed
+                movements = reconcile_ward(pdf_filename, ward_part, roster, fingerprints[pdf_filename]['file_mtime'])
+                print(f"{movements['transfer']} transferred in, {movements['readmit']} readmitted, "
+                      f"{movements['discharge']} discharged")
+                # Patients only: a full import (initialize_database.py) still reads this file's notes
+                record_imported_pdf(pdf_filename, ward_part, fingerprints[pdf_filename], scope=PATIENTS_ONLY)
                 db.session.commit()
+                print(f"Found {patient_count} patients in {pdf_filename}")
+            
+            if failed_files:
+                print(f"\n{len(failed_files)} ward PDF(s) could not be parsed: {', '.join(sorted(failed_files))}")
+                return False
             
-            print("\nAll ward PDFs processed successfully!")
+            print(f"\nAll ward PDFs processed successfully! "
+                  f"({len(ward_files)} imported, {len(unchanged_files)} unchanged)")
             return True
             
         except Exception as e:
@@ -92,4 +117,8 @@ def process_ward_pdfs():
             raise
 
 if __name__ == "__main__":
-    process_ward_pdfs()
+    parser = build_arg_parser("Import existing ward PDFs into the database")
+    parser.add_argument('--force', action='store_true',
+                        help='re-import every ward PDF, even if unchanged since the last import')
+    args = parser.parse_args()
+    process_ward_pdfs(jobs=args.jobs, timeout=args.timeout, force=args.force)
@@ -1,18 +1,37 @@
+"""Generate synthetic ward PDFs for testing and load testing.
+
+Every ward is generated from its own random.Random seeded with the run's
+--seed and the ward name, and the PDFs are written with reportlab's
+invariant mode (no timestamps or random document IDs), so the same
+arguments always produce byte-identical files, however many processes
+generate them.
+
+Usage:
+    python generate_long_stay_ward.py [--wards 50] [--special-wards 15] [--patients 24]
+        [--days 1-90] [--notes-per-day 1-3] [--seed 0] [--end-date 2025-01-01]
+        [--jobs 0] [--output-dir DIR] [--clean]
+
+--days and --notes-per-day take a number or a MIN-MAX range drawn per
+patient. A 10x corpus: --wards 500 --patients 240 --seed 1 --jobs 0
+"""
+import argparse
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.platypus import Table, TableStyle, Paragraph  # added Paragraph import
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet               # added stylesheet import
-from datetime import datetime, timedelta
-import os
+from reportlab.platypus import Table, TableStyle, Paragraph
+
+from utils.parallel_import import resolve_jobs
 
 # Get the default style for wrapping
 styles = getSampleStyleSheet()
 normal_style = styles['Normal']
 
-# Reuse basic patient data arrays from generate_pdf.py
 staff_names = [
     "Emma Thompson, RN", "Michael Chen, RN", "Sarah Martinez, RN",
     "David Wilson, RN", "Lisa Anderson, NP", "John Davis, RN",
@@ -20,11 +39,10 @@ staff_names = [
     "Kevin Patel, RN"
 ]
 
-# Import ward names from generate_pdf.py
-# Numeric ward names (1-50)
+# Numeric ward names (1-50 by default, see --wards)
 numeric_wards = list(map(str, range(1, 51)))
 
-# Special ward names from generate_pdf.py
+# Special ward names with non-numeric names (see --special-wards)
 special_wards = [
     "ACU",  # Acute Care Unit
     "CCU",  # Critical Care Unit
@@ -43,436 +61,292 @@ special_wards = [
     "Pediatrics"
 ]
 
+first_names = ['James', 'Mary', 'John', 'Patricia', 'Robert']
+last_names = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones']
+
 # Extended care note templates for longer entries
 long_care_notes = [
     """Patient continues to make steady progress with rehabilitation. Morning physical therapy session completed with good engagement. Patient reported mild discomfort during exercises but was able to complete full session. Pain managed effectively with prescribed medication. Encouraged deep breathing exercises between activities. Patient participated well in afternoon mobility exercises.""",
-    
+
     """Comprehensive nursing assessment completed. All vital signs within normal parameters. Patient alert and oriented x3. Skin assessment reveals no areas of concern. Previously noted redness on sacrum completely resolved. Maintaining good oral intake and tolerating regular diet. Family visited this afternoon and patient's mood notably improved afterward.""",
-    
+
     """Night shift report: Patient experienced periods of restlessness between 2300-0200. PRN medication administered at 2330 with good effect. Finally settled to sleep around 0200. Regular position changes maintained throughout night. No signs of distress noted. Vital signs remained stable.""",
-    
+
     """Multidisciplinary team review completed. Current treatment plan discussed with patient who expressed understanding and agreement. Goals adjusted to reflect recent progress. Speech therapy reports improvement in swallowing function. Occupational therapy session focused on daily living activities with notable progress in independent dressing.""",
-    
+
     """Patient required increased oxygen support during morning activities. Respiratory therapy attended and performed chest physiotherapy. Good response noted with improved breath sounds post-treatment. SpO2 levels returned to baseline. Will continue to monitor closely."""
 ]
 
-# Generate a random paragraph by combining sentences
-def generate_random_paragraph():
-    sentences = [
-        "Vital signs remain stable throughout shift.",
-        "Patient comfortable at rest.",
-        "Good response to prescribed medications.",
-        "Maintaining adequate oral intake.",
-        "Family present for support.",
-        "Regular position changes maintained.",
-        "Oxygen therapy continued as prescribed.",
-        "Patient participating well in care activities.",
-        "No new concerns reported.",
-        "Will continue to monitor."
-    ]
-    return " ".join(random.choices(sentences, k=random.randint(3, 8)))
+care_note_sentences = [
+    "Vital signs remain stable throughout shift.",
+    "Patient comfortable at rest.",
+    "Good response to prescribed medications.",
+    "Maintaining adequate oral intake.",
+    "Family present for support.",
+    "Regular position changes maintained.",
+    "Oxygen therapy continued as prescribed.",
+    "Patient participating well in care activities.",
+    "No new concerns reported.",
+    "Will continue to monitor."
+]
 
-def generate_long_care_note():
+DEFAULT_END_DATE = "2025-01-01"
+
+# Patient IDs are <ward prefix><6 random digits>, unique across a corpus. The
+# prefix comes from the ward's name alone: PATIENT_ID_BASE + N for ward N, and
+# SPECIAL_WARD_ID_BASE + its place in special_wards for the named wards
+PATIENT_ID_BASE = 1000
+SPECIAL_WARD_ID_BASE = 9000
+MAX_NUMERIC_WARDS = SPECIAL_WARD_ID_BASE - PATIENT_ID_BASE - 1
+MAX_PATIENTS_PER_WARD = 10 ** 6
+
+PAGE_MARGIN = 50
+
+NOTE_COLUMN_WIDTHS = [100, 100]  # Date & Time, Staff Member; Notes takes the rest
+
+INFO_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('PADDING', (0, 0), (-1, -1), 6),
+])
+
+NOTES_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('PADDING', (0, 0), (-1, -1), 6),
+])
+
+# Continuation pages have no header row to style
+NOTES_CONTINUATION_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('PADDING', (0, 0), (-1, -1), 6),
+])
+
+def generate_random_paragraph(rng=random):
+    """Combine 3-8 stock sentences into a paragraph"""
+    return " ".join(rng.choices(care_note_sentences, k=rng.randint(3, 8)))
+
+def generate_long_care_note(rng=random):
     # Sometimes use a template, sometimes generate random content
-    if random.random() < 0.3:
-        return random.choice(long_care_notes)
-    else:
-        # Generate 1-3 paragraphs
-        paragraphs = []
-        for _ in range(random.randint(1, 3)):
-            paragraphs.append(generate_random_paragraph())
-        return "\n\n".join(paragraphs)
-
-def generate_patient_stay_notes():
+    if rng.random() < 0.3:
+        return rng.choice(long_care_notes)
+    # Generate 1-3 paragraphs
+    return "\n\n".join(generate_random_paragraph(rng) for _ in range(rng.randint(1, 3)))
+
+def draw_count(rng, count_range):
+    """A number drawn from a (min, max) range"""
+    low, high = count_range
+    return low if low == high else rng.randint(low, high)
+
+def generate_patient_notes(rng, days, notes_per_day, end_date):
+    """Care note rows [time, staff, Paragraph] for one stay, newest first
+
+    The stay lasts ``days`` days up to end_date with ``notes_per_day``
+    notes at random times each day.
+    """
     notes = []
-    current_date = datetime.now()
-    
-    # Determine if this is a long-stay patient (>30 days)
-    is_long_stay = random.random() < 0.2  # 20% chance
-    
-    if is_long_stay:
-        # Generate 30-60 days of notes
-        days_admitted = random.randint(30, 60)
-        notes_per_day = random.randint(3, 6)  # More notes per day for long-stay
-    else:
-        # Generate 1-5 days of notes
-        days_admitted = random.randint(1, 5)
-        notes_per_day = random.randint(2, 4)
-    
-    # Generate notes for each day
-    for day in range(days_admitted):
-        day_date = current_date - timedelta(days=day)
-        
-        # Generate multiple notes per day
+    for day in range(days):
+        day_date = end_date - timedelta(days=day)
         for _ in range(notes_per_day):
-            hour = random.randint(0, 23)
-            minute = random.randint(0, 59)
-            note_datetime = day_date.replace(hour=hour, minute=minute)
-            
-            staff = random.choice(staff_names)
-            note = generate_long_care_note()
+            note_datetime = day_date.replace(hour=rng.randint(0, 23), minute=rng.randint(0, 59))
+            staff = rng.choice(staff_names)
             # Convert note text into a Paragraph for proper wrapping
-            wrapped_note = Paragraph(note, normal_style)
-            
-            notes.append([note_datetime.strftime("%Y-%m-%d %H:%M"), staff, wrapped_note])
-    
-    # Sort notes by datetime (newest first)
-    notes.sort(key=lambda x: datetime.strptime(x[0], "%Y-%m-%d %H:%M"), reverse=True)
-    return notes
-
-def generate_extended_patient_stay_notes():
-    # Generate a random number of continuous care notes between 10 and 200 for a patient.
-    num_notes = random.randint(10, 200)
-    notes = []
-    current_date = datetime.now()
-    for _ in range(num_notes):
-        # Random time within the past 90 days
-        delta_minutes = random.randint(0, 60*24*90)
-        note_datetime = current_date - timedelta(minutes=delta_minutes)
-        staff = random.choice(staff_names)
-        note = generate_long_care_note()
-        wrapped_note = Paragraph(note, normal_style)
-        notes.append([note_datetime.strftime("%Y-%m-%d %H:%M"), staff, wrapped_note])
-    notes.sort(key=lambda x: datetime.strptime(x[0], "%Y-%m-%d %H:%M"), reverse=True)
+            notes.append([note_datetime.strftime("%Y-%m-%d %H:%M"), staff,
+                          Paragraph(generate_long_care_note(rng), normal_style)])
+    notes.sort(key=lambda row: row[0], reverse=True)
     return notes
 
-def create_long_stay_pdf(file_path):
-    c = canvas.Canvas(file_path, pagesize=letter)
+def draw_notes_table(c, notes, y_position):
+    """Draw the care notes table from y_position down, continuing on new pages"""
     width, height = letter
-    margin = 50
-    available_width = width - 2*margin
-    
-    for i in range(24):  # 24 patients per ward
-        # ...existing patient info generation...
-        patient_id = str(random.randint(1000000000, 9999999999))
-        name = f"{random.choice(['James', 'Mary', 'John', 'Patricia', 'Robert'])} {random.choice(['Smith', 'Johnson', 'Williams', 'Brown', 'Jones'])}"
-        dob = f"{random.randint(1940, 2000)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
-        
-        # ...existing bookmark and header...
-        c.bookmarkPage(patient_id)
-        c.addOutlineEntry(f"Patient: {name} ({patient_id})", patient_id, level=0)
-        
-        y_position = height - margin
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(margin, y_position, "Patient Record - Ward Long")
-        y_position -= 30
-        
-        # ...existing info table...
-        info_data = [
-            ["Patient ID:", patient_id],
-            ["Name:", name],
-            ["Ward:", "Long"],
-            ["DOB:", dob]
-        ]
-        info_table = Table(info_data, colWidths=[150, available_width-150])
-        info_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
-        
-        w, h = info_table.wrap(available_width, y_position)
-        info_table.drawOn(c, margin, y_position - h)
-        y_position -= h + 30
-        
-        # Create care notes table header on the first page only
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(margin, y_position, "Continuous Care Notes")
-        y_position -= 20
-        
-        # Get notes data and prepare for table creation
-        all_notes = generate_patient_stay_notes()
-        header_row = ["Date & Time", "Staff Member", "Notes"]
-        col_widths = [100, 100, available_width-200]
-        table_style = TableStyle([
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ])
-        
-        # Process notes in chunks to ensure proper pagination
-        remaining_notes = all_notes[:]  # Make a copy of all notes
-        first_chunk = True  # Flag to track if this is the first chunk
-        
-        while remaining_notes:
-            # Calculate available space on current page
-            if first_chunk:
-                available_height = y_position - margin
+    available_width = width - 2 * PAGE_MARGIN
+    col_widths = NOTE_COLUMN_WIDTHS + [available_width - sum(NOTE_COLUMN_WIDTHS)]
+    header_row = ["Date & Time", "Staff Member", "Notes"]
+
+    # A table is as tall as its rows, so measure each row once instead of
+    # re-wrapping the growing chunk for every row added
+    def row_height(row, style):
+        row_table = Table([row], colWidths=col_widths)
+        row_table.setStyle(style)
+        return row_table.wrap(available_width, height)[1]
+
+    remaining_notes = notes
+    first_chunk = True
+    while remaining_notes:
+        available_height = y_position - PAGE_MARGIN if first_chunk else height - PAGE_MARGIN * 2
+        style = NOTES_TABLE_STYLE if first_chunk else NOTES_CONTINUATION_STYLE
+
+        # Add rows until the next one no longer fits on the page
+        current_chunk = [header_row] if first_chunk else []
+        chunk_height = row_height(header_row, style) if first_chunk else 0
+        rows_to_remove = 0
+        for i, note_row in enumerate(remaining_notes):
+            h = row_height(note_row, NOTES_CONTINUATION_STYLE)
+            if chunk_height + h <= available_height:
+                current_chunk.append(note_row)
+                chunk_height += h
+                rows_to_remove = i + 1
             else:
-                available_height = height - margin * 2
-            
-            # Start with header row only for the first chunk
-            current_chunk = []
-            if first_chunk:
-                current_chunk = [header_row]
-            
-            # Add rows until we can't fit any more
-            rows_to_remove = 0
-            for i, note_row in enumerate(remaining_notes):
-                if first_chunk:
-                    # First chunk includes header
-                    test_chunk = current_chunk + [note_row]
-                else:
-                    # Subsequent chunks don't include header
-                    test_chunk = current_chunk + [note_row]
-                
-                test_table = Table(test_chunk, colWidths=col_widths)
-                
-                # Apply style - but with header styling only on first chunk
-                if first_chunk:
-                    test_table.setStyle(table_style)
-                else:
-                    # Remove header-specific styling for continuation chunks
-                    cont_style = TableStyle([
-                        ('FONTSIZE', (0, 0), (-1, -1), 10),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                        ('PADDING', (0, 0), (-1, -1), 6),
-                    ])
-                    test_table.setStyle(cont_style)
-                
-                w, h = test_table.wrap(available_width, height)
-                
-                if h <= available_height:
+                # If we couldn't add even one row, force at least one row
+                if not current_chunk and i == 0:
                     current_chunk.append(note_row)
-                    rows_to_remove = i + 1
-                else:
-                    # If we couldn't add even one row, force at least one row
-                    if len(current_chunk) == 0 and i == 0:
-                        current_chunk.append(note_row)
-                        rows_to_remove = 1
-                    break
-            
-            # If we have rows to draw, create and draw the table
-            if current_chunk:
-                # Create the final table for this chunk
-                if first_chunk:
-                    chunk_table = Table([header_row] + current_chunk, colWidths=col_widths)
-                    chunk_table.setStyle(table_style)
-                else:
-                    chunk_table = Table(current_chunk, colWidths=col_widths)
-                    # Only apply non-header styles
-                    cont_style = TableStyle([
-                        ('FONTSIZE', (0, 0), (-1, -1), 10),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                        ('PADDING', (0, 0), (-1, -1), 6),
-                    ])
-                    chunk_table.setStyle(cont_style)
-                
-                w, h = chunk_table.wrap(available_width, available_height)
-                
-                # Ensure we have enough space or go to a new page
-                if y_position - h < margin:
-                    c.showPage()
-                    y_position = height - margin
-                
-                chunk_table.drawOn(c, margin, y_position - h)
-                y_position -= h
-            
-            # Remove processed rows
-            remaining_notes = remaining_notes[rows_to_remove:]
-            
-            # If we have more notes, go to a new page
-            if remaining_notes:
+                    rows_to_remove = 1
+                break
+
+        if current_chunk:
+            chunk_table = Table(current_chunk, colWidths=col_widths)
+            chunk_table.setStyle(style)
+            w, h = chunk_table.wrap(available_width, available_height)
+            if y_position - h < PAGE_MARGIN:
                 c.showPage()
-                y_position = height - margin
-                
-            # No longer the first chunk after the first iteration
-            first_chunk = False
-        
-        c.showPage()  # Start new page for next patient
-    
-    c.save()
+                y_position = height - PAGE_MARGIN
+            chunk_table.drawOn(c, PAGE_MARGIN, y_position - h)
+            y_position -= h
+
+        remaining_notes = remaining_notes[rows_to_remove:]
+        if remaining_notes:
+            c.showPage()
+            y_position = height - PAGE_MARGIN
+        first_chunk = False
 
-def create_extended_long_stay_pdf(file_path, ward_name):
-    c = canvas.Canvas(file_path, pagesize=letter)
+def ward_id_prefix(ward_name):
+    """Patient ID prefix of a ward, the same whichever other wards are generated with it"""
+    if ward_name.isdigit():
+        return PATIENT_ID_BASE + int(ward_name)
+    return SPECIAL_WARD_ID_BASE + special_wards.index(ward_name)
+
+def create_ward_pdf(file_path, ward_name, seed, patients, days, notes_per_day, end_date):
+    """Write one ward PDF; the same arguments always give the same bytes
+
+    Returns (patients, notes) written.
+    """
+    rng = random.Random(f"{seed}:{ward_name}")
+    c = canvas.Canvas(file_path, pagesize=letter, invariant=1)
     width, height = letter
-    margin = 50
-    available_width = width - 2*margin
-    
-    for i in range(24):  # 24 patients per ward
-        # ...existing patient info generation...
-        patient_id = str(random.randint(1000000000, 9999999999))
-        name = f"{random.choice(['James','Mary','John','Patricia','Robert'])} {random.choice(['Smith','Johnson','Williams','Brown','Jones'])}"
-        dob = f"{random.randint(1940,2000)}-{random.randint(1,12):02d}-{random.randint(1,28):02d}"
-        
-        # ...existing bookmark and header...
+    available_width = width - 2 * PAGE_MARGIN
+
+    note_count = 0
+    id_prefix = ward_id_prefix(ward_name)
+    for id_suffix in rng.sample(range(MAX_PATIENTS_PER_WARD), patients):
+        patient_id = f"{id_prefix}{id_suffix:06d}"
+        name = f"{rng.choice(first_names)} {rng.choice(last_names)}"
+        dob = f"{rng.randint(1940, 2000)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+        # One outline entry per patient, used by utils/pdf_outline.py
         c.bookmarkPage(patient_id)
         c.addOutlineEntry(f"Patient: {name} ({patient_id})", patient_id, level=0)
-        
-        y_position = height - margin
+
+        y_position = height - PAGE_MARGIN
         c.setFont("Helvetica-Bold", 16)
-        c.drawString(margin, y_position, f"Patient Record - Ward {ward_name}")
+        c.drawString(PAGE_MARGIN, y_position, f"Patient Record - Ward {ward_name}")
         y_position -= 30
-        
-        # ...existing info table...
-        info_data = [
+
+        info_table = Table([
             ["Patient ID:", patient_id],
             ["Name:", name],
             ["Ward:", ward_name],
             ["DOB:", dob]
-        ]
-        info_table = Table(info_data, colWidths=[150, available_width - 150])
-        info_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
+        ], colWidths=[150, available_width - 150])
+        info_table.setStyle(INFO_TABLE_STYLE)
         w, h = info_table.wrap(available_width, y_position)
-        info_table.drawOn(c, margin, y_position - h)
+        info_table.drawOn(c, PAGE_MARGIN, y_position - h)
         y_position -= h + 30
-        
-        # Create care notes table header on the first page only
+
         c.setFont("Helvetica-Bold", 14)
-        c.drawString(margin, y_position, "Continuous Care Notes")
+        c.drawString(PAGE_MARGIN, y_position, "Continuous Care Notes")
         y_position -= 20
-        
-        # Get notes data and prepare for table creation
-        all_notes = generate_extended_patient_stay_notes()
-        header_row = ["Date & Time", "Staff Member", "Notes"]
-        col_widths = [100, 100, available_width-200]
-        table_style = TableStyle([
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ])
-        
-        # Process notes in chunks to ensure proper pagination
-        remaining_notes = all_notes[:]  # Make a copy of all notes
-        first_chunk = True  # Flag to track if this is the first chunk
-        
-        while remaining_notes:
-            # Calculate available space on current page
-            if first_chunk:
-                available_height = y_position - margin
-            else:
-                available_height = height - margin * 2
-            
-            # Start with header row only for the first chunk
-            current_chunk = []
-            if first_chunk:
-                current_chunk = [header_row]
-            
-            # Add rows until we can't fit any more
-            rows_to_remove = 0
-            for i, note_row in enumerate(remaining_notes):
-                test_chunk = current_chunk + [note_row]
-                test_table = Table(test_chunk, colWidths=col_widths)
-                
-                # Apply style - but with header styling only on first chunk
-                if first_chunk:
-                    test_table.setStyle(table_style)
-                else:
-                    # Remove header-specific styling for continuation chunks
-                    cont_style = TableStyle([
-                        ('FONTSIZE', (0, 0), (-1, -1), 10),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                        ('PADDING', (0, 0), (-1, -1), 6),
-                    ])
-                    test_table.setStyle(cont_style)
-                
-                w, h = test_table.wrap(available_width, height)
-                
-                if h <= available_height:
-                    current_chunk.append(note_row)
-                    rows_to_remove = i + 1
-                else:
-                    # If we couldn't add even one row, force at least one row
-                    if len(current_chunk) == 0 and i == 0:
-                        current_chunk.append(note_row)
-                        rows_to_remove = 1
-                    break
-            
-            # If we have rows to draw, create and draw the table
-            if current_chunk:
-                # Create the final table for this chunk
-                chunk_table = Table(current_chunk, colWidths=col_widths)
-                if first_chunk:
-                    chunk_table.setStyle(table_style)
-                else:
-                    # Only apply non-header styles
-                    cont_style = TableStyle([
-                        ('FONTSIZE', (0, 0), (-1, -1), 10),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                        ('PADDING', (0, 0), (-1, -1), 6),
-                    ])
-                    chunk_table.setStyle(cont_style)
-                
-                w, h = chunk_table.wrap(available_width, available_height)
-                
-                # Ensure we have enough space or go to a new page
-                if y_position - h < margin:
-                    c.showPage()
-                    y_position = height - margin
-                
-                chunk_table.drawOn(c, margin, y_position - h)
-                y_position -= h
-            
-            # Remove processed rows
-            remaining_notes = remaining_notes[rows_to_remove:]
-            
-            # If we have more notes, go to a new page
-            if remaining_notes:
-                c.showPage()
-                y_position = height - margin
-                
-            # No longer the first chunk after the first iteration
-            first_chunk = False
-        
+
+        notes = generate_patient_notes(rng, draw_count(rng, days), draw_count(rng, notes_per_day), end_date)
+        note_count += len(notes)
+        draw_notes_table(c, notes, y_position)
+
         c.showPage()  # Start new page for next patient
-    
+
     c.save()
+    return patients, note_count
 
-def remove_existing_pdfs():
+def ward_names(wards, special):
+    """Names of the first ``wards`` numeric and ``special`` special wards"""
+    return list(map(str, range(1, wards + 1))) + special_wards[:special]
+
+def remove_existing_pdfs(directory='.'):
     """Remove existing PDF files that match the ward naming pattern"""
     removed_count = 0
-    for filename in os.listdir('.'):
+    for filename in os.listdir(directory):
         if filename.startswith('ward_') and filename.endswith('_records.pdf'):
             try:
-                os.remove(filename)
+                os.remove(os.path.join(directory, filename))
                 removed_count += 1
-            except:
+            except OSError:
                 print(f"Could not remove {filename}")
-    
+
     print(f"Removed {removed_count} existing PDF files")
 
+def count_range(value):
+    """argparse type for N or MIN-MAX"""
+    try:
+        low, _, high = value.partition('-')
+        low, high = int(low), int(high or low)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number or MIN-MAX, got {value!r}")
+    if low < 0 or high < low:
+        raise argparse.ArgumentTypeError(f"invalid range {value!r}")
+    return low, high
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Generate synthetic ward PDFs with long-stay care notes")
+    parser.add_argument('--wards', type=int, default=50, help='numeric wards to generate (1..N)')
+    parser.add_argument('--special-wards', type=int, default=len(special_wards), choices=range(len(special_wards) + 1),
+                        metavar=f'0-{len(special_wards)}', help='named wards to generate (ICU, ED, ...)')
+    parser.add_argument('--patients', type=int, default=24, help='patients per ward')
+    parser.add_argument('--days', type=count_range, default=(1, 90), help='days of stay per patient (N or MIN-MAX)')
+    parser.add_argument('--notes-per-day', type=count_range, default=(1, 3), help='care notes per day (N or MIN-MAX)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed; the same seed gives byte-identical PDFs')
+    parser.add_argument('--end-date', type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        default=DEFAULT_END_DATE, help='last day of every stay (YYYY-MM-DD)')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='wards generated at once (0 = one per CPU core)')
+    parser.add_argument('--output-dir', default='.', help='directory to write the PDFs to')
+    parser.add_argument('--clean', action='store_true', help='remove existing ward PDFs from the output directory first')
+    return parser
+
+def main():
+    args = build_arg_parser().parse_args()
+    if args.patients > MAX_PATIENTS_PER_WARD:
+        raise SystemExit(f"At most {MAX_PATIENTS_PER_WARD} patients per ward")
+    if args.wards > MAX_NUMERIC_WARDS:
+        raise SystemExit(f"At most {MAX_NUMERIC_WARDS} numeric wards")
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.clean:
+        remove_existing_pdfs(args.output_dir)
+
+    names = ward_names(args.wards, args.special_wards)
+    jobs = resolve_jobs(args.jobs)
+    print(f"Generating {len(names)} ward PDFs with {jobs} worker(s), seed {args.seed}...")
+    tasks = [
+        (os.path.join(args.output_dir, f"ward_{name}_records.pdf"), name, args.seed,
+         args.patients, args.days, args.notes_per_day, args.end_date)
+        for name in names
+    ]
+    total_notes = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(create_ward_pdf, *task) for task in tasks]
+        for task, future in zip(tasks, futures):
+            patients, notes = future.result()
+            total_notes += notes
+            print(f"Generated {os.path.basename(task[0])} ({patients} patients, {notes} notes)")
+
+    print(f"Generated {len(names)} ward PDFs successfully! "
+          f"({len(names) * args.patients} patients, {total_notes} notes)")
+
 if __name__ == "__main__":
-    # Ask user if they want to remove existing PDFs
-    response = input("Do you want to remove existing PDF files? (y/n): ")
-    if response.lower() == 'y':
-        remove_existing_pdfs()
-    
-    print("Generating ward PDFs with extended care notes...")
-    
-    # Create PDFs for all numeric wards (1-50)
-    for ward_num in numeric_wards:
-        print(f"Generating ward_{ward_num}_records.pdf")
-        create_extended_long_stay_pdf(f"ward_{ward_num}_records.pdf", ward_num)
-    
-    # Create PDFs for special wards with non-numeric names
-    for ward_name in special_wards:
-        print(f"Generating ward_{ward_name}_records.pdf")
-        create_extended_long_stay_pdf(f"ward_{ward_name}_records.pdf", ward_name)
-        
-    print(f"Generated {len(numeric_wards) + len(special_wards)} ward PDFs successfully!")
+    main()
@@ -0,0 +1,42 @@
+"""Watch the PDF directory and import ward PDFs as they are dropped in.
+
+Runs alongside the web app, writing to the same databases. Parsing happens
+in this process (or its worker pool with --jobs), so requests keep being
+served while a ward is imported.
+
+Usage:
+    python ingest_daemon.py [--directory DIR] [--interval 5] [--settle 10] [--jobs N] [--write-budget-ms 50] [--once]
+"""
+import logging
+
+from app import app
+from config import Config
+from utils.bulk_import import DEFAULT_WRITE_BUDGET_MS
+from utils.ingest_daemon import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_SECONDS, claim_watcher_lock, run_ingest_loop
+from utils.parallel_import import build_arg_parser
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+if __name__ == "__main__":
+    parser = build_arg_parser("Import ward PDFs as they appear in the PDF directory")
+    parser.add_argument('--directory', default=Config.PDF_DIRECTORY,
+                        help='directory to watch (default: PDF_DIRECTORY)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='seconds between scans of the directory')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help='seconds a file must be unchanged before it is imported')
+    parser.add_argument('--write-budget-ms', type=int, default=DEFAULT_WRITE_BUDGET_MS,
+                        help='milliseconds each write transaction may hold the SQLite write lock (0 = unthrottled)')
+    parser.add_argument('--once', action='store_true',
+                        help='import the ward PDFs present now, then exit')
+    args = parser.parse_args()
+    if not claim_watcher_lock(Config.INGEST_LOCK_PATH):
+        raise SystemExit(f"Another process is already watching ward PDFs ({Config.INGEST_LOCK_PATH} is locked)")
+    try:
+        run_ingest_loop(app, args.directory, args.interval, args.settle,
+                        args.jobs, args.timeout, once=args.once, write_budget_ms=args.write_budget_ms)
+    except KeyboardInterrupt:
+        pass
@@ -1,11 +1,14 @@
 from app import app, db
-from models import Ward, Patient, Note, CareNote
+from models import Ward, Patient, Note
 import logging
 import os
-import re
-from datetime import datetime
 from config import Config
-from PyPDF2 import PdfReader
+from utils.import_journal import unfinished_imports
+from utils.import_telemetry import ImportTelemetry
+from utils.parallel_import import DEFAULT_PDF_TIMEOUT, build_arg_parser, resolve_jobs
+from utils.pdf_manifest import ensure_manifest_table, load_patient_page_index
+from utils.ward_import import import_ward_pdfs, save_patient_data
+from utils.ward_pdf_parser import iter_pdf_patients, list_ward_pdfs
 
 # Fix the invalid escape sequence warning
 app.config.from_object(Config)
@@ -16,178 +19,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def parse_pdf_content(pdf_path, patient_id=None):
-    """Extract patient info and notes from PDF file"""
-    patient_data = {}
-    current_patient = None
-    current_patient_id = None
-    try:
-        reader = PdfReader(pdf_path)
-        for page_idx in range(len(reader.pages)):
-            page = reader.pages[page_idx]
-            text = page.extract_text()
-            # Check if this is a new patient record
-            if "Patient Record - Ward" in text:
-                # Save previous patient if exists
-                if current_patient_id and current_patient:
-                    if not patient_id or current_patient_id == patient_id:
-                        patient_data[current_patient_id] = current_patient
-                # Reset for new patient
-                current_patient = {
-                    "info": {},
-                    "name": "Unknown",
-                    "vitals": "",
-                    "care_notes": []
-                }
-                current_patient_id = None
-                in_care_notes = False
-                
-            # Extract patient ID - MUST do this for all patients
-            if current_patient and not current_patient_id:
-                id_match = re.search(r"Patient ID:\s*(\d+)", text)
-                if id_match:
-                    current_patient_id = id_match.group(1).strip()
-                    
-            # If we found the specific patient we're looking for, or we want all patients
-            if not patient_id or (current_patient_id and (current_patient_id == patient_id)):
-                # Extract name if we haven't yet
-                if current_patient and current_patient["name"] == "Unknown":
-                    name_match = re.search(r"Name:\s*([^\n]+)", text)
-                    if name_match:
-                        current_patient["name"] = name_match.group(1).strip()
-                
-                # Extract DOB if we haven't yet
-                if current_patient and "DOB" not in current_patient["info"]:
-                    dob_match = re.search(r"DOB:\s*([^\n]+)", text)
-                    if dob_match:
-                        current_patient["info"]["DOB"] = dob_match.group(1).strip()
-                
-                # Check for care notes section
-                if "Continuous Care Notes" in text and not in_care_notes:
-                    in_care_notes = True
-                
-                # Extract care notes if we're in that section
-                if in_care_notes and current_patient:
-                    care_notes_text = text
-                    if "Continuous Care Notes" in text:
-                        care_notes_section = text.split("Continuous Care Notes", 1)
-                        if len(care_notes_section) > 1:
-                            care_notes_text = care_notes_section[1].strip()
-                    
-                    # Extract individual notes using regex pattern
-                    care_notes_pattern = r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2})\s+([^,]+(?:, [A-Z]+)?)\s+(.+?)(?=(?:\d{4}-\d{2}-\d{2} \d{2}:\d{2})|$)"
-                    matches = list(re.finditer(care_notes_pattern, care_notes_text, re.DOTALL))
-                    
-                    for match in matches:
-                        date = match.group(1).strip()
-                        staff = match.group(2).strip()
-                        note = match.group(3).strip()
-                        if date and staff and note:
-                            current_patient["care_notes"].append({
-                                "date": date,
-                                "staff": staff,
-                                "note": note
-                            })
-            
-        # Don't forget to add the last patient
-        if current_patient_id and current_patient:
-            if not patient_id or current_patient_id == patient_id:
-                patient_data[current_patient_id] = current_patient
-                
-        return patient_data
-        
-    except Exception as e:
-        logger.error(f"PDF parsing error: {str(e)}")
-        return {}
-
-def extract_patient_data(pdf_path, ward_number):
-    """Extract patient and notes data from a single PDF file and save directly to CareNote table"""
-    try:
-        # Use the working PDF parser
-        patient_data = parse_pdf_content(pdf_path)
-        total_patients = len(patient_data)
-        logger.info(f"Extracted {total_patients} patients from {pdf_path}")
-
-        # Debug information to verify notes are being extracted properly
-        for patient_id, info in patient_data.items():
-            note_count = len(info.get('care_notes', []))
-            if note_count == 0:  # Flag if we have patients with no notes
-                logger.warning(f"Patient {patient_id} has no care notes!")
-            else:
-                logger.info(f"Patient {patient_id} has {note_count} care notes")
-                # Log first note as sample
-                if note_count > 0:
-                    sample_note = info['care_notes'][0]
-                    logger.info(f"Sample note: {sample_note['date']} | {sample_note['staff'][:20]} | {sample_note['note'][:30]}...")
-
-        # Batch database operations
-        patients_to_add = []
-        carenotes_to_add = []  # Changed from notes_to_add
-        processed_patients = 0
-
-        for patient_id, info in patient_data.items():
-            processed_patients += 1
-            if processed_patients % 5 == 0:  # Log progress every 5 patients
-                logger.info(f"Processing patient {processed_patients}/{total_patients} in {pdf_path}")
-
-            # Check if patient exists using one query instead of per-patient
-            patient = Patient.query.filter_by(hospital_id=patient_id).first()
-            if not patient:
-                patient = Patient(
-                    hospital_id=patient_id,
-                    name=info['name'],
-                    dob=info['info'].get('DOB', ''),
-                    current_ward=ward_number
-                )
-                patients_to_add.append(patient)
-                db.session.add(patient)
-                logger.info(f"Added patient: {patient_id} - {info['name']}")
-            
-            # Batch care note creation (directly to CareNote table)
-            for note_data in info['care_notes']:
-                timestamp = datetime.strptime(note_data['date'], '%Y-%m-%d %H:%M')
-                
-                # Only check for existing note if absolutely necessary
-                existing_note = CareNote.query.filter_by(
-                    patient_id=patient_id,  # Use hospital_id directly
-                    timestamp=timestamp,
-                    note=note_data['note']
-                ).first()
-
-                if not existing_note:
-                    # Use the staff_name field that already exists in the model
-                    carenote = CareNote(
-                        patient_id=patient_id,  # Use hospital_id directly
-                        ward_id=ward_number,
-                        timestamp=timestamp,
-                        staff_name=note_data['staff'],  # Use staff_name field from the model
-                        note=note_data['note'],
-                        patient_name=info['name'],
-                        is_pdf_note=True
-                    )
-                    carenotes_to_add.append(carenote)
-
-            # Commit in batches to reduce database operations
-            if len(carenotes_to_add) >= 100:  # Commit every 100 notes
-                db.session.add_all(carenotes_to_add)
-                db.session.commit()
-                carenotes_to_add = []
-
-        # Final commit for any remaining records
-        if carenotes_to_add:
-            db.session.add_all(carenotes_to_add)
-        db.session.commit()
-        
-        logger.info(f"Completed processing {pdf_path}")
-        return True
+def initialize_database(jobs=1, timeout=DEFAULT_PDF_TIMEOUT, force=False, resume=False, report_path=None,
+                        write_budget_ms=None):
+    """One-time database initialization and PDF import
 
-    except Exception as e:
-        logger.error(f"Error processing {pdf_path}: {str(e)}")
-        db.session.rollback()
-        return False
-
-def initialize_database():
-    """One-time database initialization and PDF import"""
+    jobs > 1 parses the ward PDFs in a process pool while this process
+    writes the results; each file gets at most ``timeout`` seconds to parse.
+    Unchanged files (by fingerprint) and unchanged patients within changed
+    files (by section hash) are skipped unless ``force``. With ``resume``
+    an interrupted import carries on from its last checkpoint. A JSON
+    telemetry report is written to ``report_path`` (default: one file per
+    run in IMPORT_REPORT_DIR) and summarised on screen. ``write_budget_ms``
+    throttles the writes for an import while the app is running.
+    """
     with app.app_context():
         try:
             # Create all tables in the main database first (which includes care_note table)
@@ -211,38 +55,22 @@ def initialize_database():
             pdf_tables = pdf_inspector.get_table_names()
             if 'ward' not in pdf_tables or 'patient' not in pdf_tables or 'note' not in pdf_tables:
                 raise Exception("Required tables are not created in the pdf_parsed database.")
+            ensure_manifest_table(pdf_engine)  # Adds manifest columns newer than the database
             
             # Process ward PDFs
-            pdf_files = [f for f in os.listdir('.') if f.startswith('ward_') and f.endswith('_records.pdf')]
-            logger.info(f"Found {len(pdf_files)} ward PDF files")
-            
-            for pdf_file in pdf_files:
-                # Extract ward number from filename
-                ward_num = pdf_file[5:-12]  # Remove 'ward_' and '_records.pdf'
-                display_name = f"Ward {ward_num}" if ward_num.isdigit() else ward_num.replace('_', ' ')
-                
-                # Create or update ward record
-                ward = Ward.query.filter_by(ward_number=ward_num).first()
-                if not ward:
-                    ward = Ward(
-                        ward_number=ward_num,
-                        display_name=display_name,
-                        pdf_file=pdf_file,
-                        last_updated=datetime.utcnow()
-                    )
-                    db.session.add(ward)
-                else:
-                    ward.pdf_file = pdf_file
-                    ward.last_updated = datetime.utcnow()
-                db.session.commit()
-                
-                logger.info(f"Processing {pdf_file}...")
-                if extract_patient_data(pdf_file, ward_num):
-                    logger.info(f"Successfully processed {pdf_file}")
-                else:
-                    logger.error(f"Failed to process {pdf_file}")
-            
-            logger.info("Database initialization complete!")
+            pdf_files = list_ward_pdfs(Config.PDF_DIRECTORY)
+            logger.info(f"Found {len(pdf_files)} ward PDF files in {Config.PDF_DIRECTORY}")
+            telemetry = ImportTelemetry(resolve_jobs(jobs))
+            imported_files, unchanged_files, failed_files = import_ward_pdfs(
+                pdf_files, jobs, timeout, force, resume, telemetry, write_budget_ms)
+            report_path = report_path or os.path.join(
+                Config.IMPORT_REPORT_DIR, f"import_{telemetry.extra['run_id']}.json")
+            print(telemetry.summary())
+            logger.info(f"Import telemetry written to {telemetry.write_json(report_path)}")
+            logger.info(f"Database initialization complete! Imported {len(imported_files)}, "
+                        f"skipped {len(unchanged_files)} unchanged, {len(failed_files)} failed")
+            if failed_files:
+                logger.info("Retry the failed files with: python initialize_database.py --resume")
             return True
             
         except Exception as e:
@@ -250,5 +78,70 @@ def initialize_database():
             db.session.rollback()
             return False
 
+def resync_patient(hospital_id, force=False):
+    """Re-import a single patient, reading only that patient's pages of the ward PDF"""
+    with app.app_context():
+        try:
+            ensure_manifest_table(db.get_engine(app, bind='pdf_parsed'))
+            patient = Patient.query.filter_by(hospital_id=hospital_id).first()
+            if not patient:
+                logger.error(f"Patient {hospital_id} not found")
+                return False
+            ward = Ward.query.filter_by(ward_number=patient.current_ward).first()
+            pdf_file = patient.pdf_file or (ward.pdf_file if ward else None)
+            if not pdf_file or not os.path.exists(pdf_file):
+                logger.error(f"No ward PDF found for patient {hospital_id}")
+                return False
+
+            page_range = load_patient_page_index(pdf_file).get(hospital_id)
+            if page_range:
+                logger.info(f"Reading pages {page_range[0] + 1}-{page_range[1] + 1} of {pdf_file} for patient {hospital_id}")
+            else:
+                logger.info(f"Patient {hospital_id} is not bookmarked in {pdf_file}, scanning the whole file")
+
+            known_hashes = {} if force else {hospital_id: patient.section_hash}
+            records = iter_pdf_patients(pdf_file, hospital_id, known_hashes, page_range)
+            return save_patient_data(records, pdf_file, patient.current_ward)
+
+        except Exception as e:
+            logger.error(f"Re-sync of patient {hospital_id} failed: {str(e)}")
+            db.session.rollback()
+            return False
+
+def list_failed_imports():
+    """Print the ward PDFs the last import run did not finish"""
+    with app.app_context():
+        ensure_manifest_table(db.get_engine(app, bind='pdf_parsed'))
+        entries = unfinished_imports()
+        if not entries:
+            print("The last import finished every ward PDF")
+            return
+        print(f"{len(entries)} ward PDF(s) not finished in import run {entries[0].run_id}:")
+        for entry in entries:
+            progress = f", {entry.patients_done} patients committed" if entry.patients_done else ""
+            print(f"  {entry.pdf_file}: {entry.status}{progress}" + (f" - {entry.error}" if entry.error else ""))
+        print("Retry them with: python initialize_database.py --resume")
+
 if __name__ == "__main__":
-    initialize_database()
\ No newline at end of file
+    parser = build_arg_parser("Create the databases and import all ward PDFs")
+    parser.add_argument('--force', action='store_true',
+                        help='re-import every ward PDF, even if unchanged since the last import')
+    parser.add_argument('--patient', metavar='HOSPITAL_ID',
+                        help='re-sync only this patient, using the PDF outline to read just its pages')
+    parser.add_argument('--resume', action='store_true',
+                        help='carry on from the checkpoints of the last interrupted import')
+    parser.add_argument('--failed', action='store_true',
+                        help='list the ward PDFs the last import did not finish, then exit')
+    parser.add_argument('--write-budget-ms', type=int, metavar='MS',
+                        help='throttle writes so each transaction holds the SQLite write lock for about MS '
+                             'milliseconds, to import while the app is running')
+    parser.add_argument('--report', metavar='PATH',
+                        help='where to write the JSON telemetry report (default: IMPORT_REPORT_DIR)')
+    args = parser.parse_args()
+    if args.failed:
+        list_failed_imports()
+    elif args.patient:
+        resync_patient(args.patient, force=args.force)
+    else:
+        initialize_database(jobs=args.jobs, timeout=args.timeout, force=args.force, resume=args.resume,
+                            report_path=args.report, write_budget_ms=args.write_budget_ms)
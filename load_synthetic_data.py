@@ -0,0 +1,309 @@
+"""Load synthetic wards, patients, care notes and audit history straight into SQLite.
+
+Builds production-sized users.db, audit.db and pdf_parsed.db files in
+--output-dir without going through ward PDFs, so query plans and latencies
+can be reproduced on a laptop. Names, staff and note text come from
+generate_long_stay_ward.py, and patient IDs follow its scheme, so PDFs
+generated with the same ward list look like the same hospital.
+
+    pdf_parsed.db  Ward, Patient (a --discharged share of them inactive)
+    users.db       User (admin + nurses, password --password), CareNote
+                   (imported notes, plus a --manual-notes share written by
+                   the nurses), RecentlyViewedPatient
+    audit.db       AuditLog (logins, ward and patient views, notes added)
+
+Ward traffic is skewed: a few wards get most of the views, as in production.
+The same arguments and --seed always load the same rows (bar the load time
+in created_at columns). ANALYZE is run at the end so SQLite plans queries
+from production-like statistics.
+
+Usage:
+    python load_synthetic_data.py --output-dir synthetic_db [--wards 200] [--patients 10000]
+        [--notes 5000000] [--users 200] [--audit-entries 1000000] [--days 90]
+        [--seed 0] [--end-date YYYY-MM-DD] [--overwrite]
+
+Point the app at the result by copying the three .db files next to app.py.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+
+from werkzeug.security import generate_password_hash
+
+from app import app, db
+from generate_long_stay_ward import (MAX_NUMERIC_WARDS, MAX_PATIENTS_PER_WARD, first_names, generate_long_care_note,
+                                     last_names, special_wards, staff_names, ward_id_prefix, ward_names)
+from models import AuditLog, CareNote, Patient, RecentlyViewedPatient, User, Ward, care_note_hash
+from utils.pdf_manifest import ensure_manifest_table
+from utils.ward_import import ward_display_name
+
+# Rows per executemany
+INSERT_BATCH_SIZE = 20000
+
+# Distinct note texts to draw from; generating and hashing one per note would dominate the load
+NOTE_TEXT_POOL_SIZE = 5000
+
+# RecentlyViewedPatient rows the app keeps per user
+RECENT_PATIENTS_PER_USER = 10
+
+# Share of audit entries per action; patient_id holds what log_access() stores for it
+AUDIT_ACTIONS = {
+    'view_patient': 0.45,
+    'view_ward': 0.25,
+    'index': 0.08,
+    'login': 0.08,
+    'logout': 0.05,
+    'add_note': 0.05,
+    'view_pdf': 0.04,
+}
+
+DATABASE_FILES = ('users.db', 'audit.db', 'pdf_parsed.db')
+
+@contextmanager
+def synthetic_databases(output_dir):
+    """Point the app at the databases in output_dir for the duration of the block"""
+    live_uri, live_binds = app.config['SQLALCHEMY_DATABASE_URI'], app.config['SQLALCHEMY_BINDS']
+    output_dir = os.path.abspath(output_dir)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(output_dir, 'users.db')}"
+    app.config['SQLALCHEMY_BINDS'] = {bind: f'sqlite:///{os.path.join(output_dir, bind)}.db' for bind in live_binds}
+    try:
+        with app.app_context():
+            yield
+            db.session.remove()
+    finally:
+        app.config['SQLALCHEMY_DATABASE_URI'], app.config['SQLALCHEMY_BINDS'] = live_uri, live_binds
+
+def bulk_insert(model, rows):
+    """Insert rows (any iterable of dicts) into model's table in one transaction; returns the count
+
+    The table's indexes are dropped for the load and built afterwards, which
+    is about twice as fast as updating them row by row.
+    """
+    engine = db.get_engine(app, bind=getattr(model, '__bind_key__', None))
+    started = time.perf_counter()
+    count = 0
+    rows = iter(rows)
+    for index in model.__table__.indexes:
+        index.drop(bind=engine)
+    with engine.connect() as conn:
+        # Scratch files: nothing to protect if the load dies half way
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        conn.exec_driver_sql("PRAGMA journal_mode=MEMORY")
+        with conn.begin():
+            while True:
+                batch = list(islice(rows, INSERT_BATCH_SIZE))
+                if not batch:
+                    break
+                conn.execute(model.__table__.insert(), batch)
+                count += len(batch)
+    for index in model.__table__.indexes:
+        index.create(bind=engine)
+    elapsed = time.perf_counter() - started
+    print(f"  {model.__table__.name:<26}{count:>10} rows {elapsed:>8.1f} s {count / max(elapsed, 1e-9):>10.0f} rows/s")
+    return count
+
+def ward_weights(wards, rng):
+    """Relative traffic of each ward: a shuffled 1/rank curve, so a few wards are busy"""
+    ranks = list(range(1, len(wards) + 1))
+    rng.shuffle(ranks)
+    return [1 / rank for rank in ranks]
+
+def build_patients(wards, patients, discharged, rng):
+    """Patient rows spread evenly over the wards, IDs as in generate_long_stay_ward"""
+    rows = []
+    for ward_index, ward_num in enumerate(wards):
+        count = patients // len(wards) + (ward_index < patients % len(wards))
+        for id_suffix in rng.sample(range(MAX_PATIENTS_PER_WARD), count):
+            rows.append({
+                'hospital_id': f"{ward_id_prefix(ward_num)}{id_suffix:06d}",
+                'name': f"{rng.choice(first_names)} {rng.choice(last_names)}",
+                'dob': f"{rng.randint(1940, 2000)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                'current_ward': ward_num,
+                'pdf_file': f"ward_{ward_num}_records.pdf",
+                'is_active': rng.random() >= discharged,
+                'section_hash': None,
+            })
+    return rows
+
+def build_users(count, wards, weights, password, rng):
+    """An admin and count - 1 nurses, each with a default ward weighted by ward traffic"""
+    password_hash = generate_password_hash(password)  # Hashed once: it is deliberately slow
+    rows = [{'username': 'admin', 'password_hash': password_hash, 'role': 'admin', 'default_ward': None}]
+    for number in range(1, count):
+        rows.append({
+            'username': f"nurse{number:04d}",
+            'password_hash': password_hash,
+            'role': 'user',
+            'default_ward': rng.choices(wards, weights)[0],
+        })
+    return rows
+
+def care_note_rows(patients, notes, days, manual_share, user_count, end_date, rng):
+    """Yield CareNote rows, about ``notes`` in all, for patients in admission order
+
+    Each patient has a stay of 1..days days ending at end_date and notes in
+    proportion to its length, at distinct minutes so the natural key holds.
+    """
+    pool = []
+    for _ in range(NOTE_TEXT_POOL_SIZE):
+        text = generate_long_care_note(rng)
+        pool.append((text, care_note_hash(text)))
+    stays = [rng.randint(1, days) for _ in patients]
+    total_days = sum(stays)
+    for patient, stay in zip(patients, stays):
+        minutes = stay * 24 * 60
+        count = min(minutes, round(notes * stay / total_days))
+        for offset in sorted(rng.sample(range(minutes), count), reverse=True):
+            text, note_hash = rng.choice(pool)
+            manual = rng.random() < manual_share
+            yield {
+                'patient_id': patient['hospital_id'],
+                'user_id': rng.randint(2, user_count) if manual and user_count > 1 else None,
+                'note': text,
+                'timestamp': end_date - timedelta(minutes=offset),
+                'ward_id': patient['current_ward'],
+                'patient_name': patient['name'],
+                'staff_name': None if manual else rng.choice(staff_names),
+                'is_pdf_note': not manual,
+                'note_hash': None if manual else note_hash,
+            }
+
+def audit_rows(entries, users, wards, weights, patients, days, end_date, rng, recent):
+    """Yield AuditLog rows in time order over the last ``days`` days
+
+    Every view_patient is also remembered in recent[user_id] (an OrderedDict
+    of hospital_id -> (ward, name, viewed_at)), newest last, trimmed to
+    RECENT_PATIENTS_PER_USER as the app does.
+    """
+    ward_patients = {}
+    for patient in patients:
+        if patient['is_active']:
+            ward_patients.setdefault(patient['current_ward'], []).append(patient)
+    busy_wards = [ward for ward in wards if ward in ward_patients]
+    busy_weights = [weight for ward, weight in zip(wards, weights) if ward in ward_patients]
+    actions, action_weights = list(AUDIT_ACTIONS), list(AUDIT_ACTIONS.values())
+    span = days * 24 * 60 * 60
+    for offset in sorted((rng.random() * span for _ in range(entries)), reverse=True):
+        timestamp = end_date - timedelta(seconds=offset)
+        user_id = rng.randint(1, len(users))
+        action = rng.choices(actions, action_weights)[0]
+        if action == 'view_ward':
+            patient_id = f"Ward {rng.choices(wards, weights)[0]}"
+        elif action in ('view_patient', 'add_note', 'view_pdf') and busy_wards:
+            patient = rng.choice(ward_patients[rng.choices(busy_wards, busy_weights)[0]])
+            patient_id = patient['hospital_id']
+            if action == 'view_patient':
+                viewed = recent.setdefault(user_id, OrderedDict())
+                viewed.pop(patient_id, None)
+                viewed[patient_id] = (patient['current_ward'], patient['name'], timestamp)
+                if len(viewed) > RECENT_PATIENTS_PER_USER:
+                    viewed.popitem(last=False)
+        elif action == 'index':
+            patient_id = f"Index accessed by: {users[user_id - 1]['username']}"
+        else:
+            patient_id = None
+        yield {
+            'user_id': user_id,
+            'username': users[user_id - 1]['username'],
+            'action': action,
+            'patient_id': patient_id,
+            'timestamp': timestamp,
+        }
+
+def recent_rows(recent):
+    """RecentlyViewedPatient rows from the views collected by audit_rows"""
+    for user_id, viewed in sorted(recent.items()):
+        for patient_id, (ward_num, name, viewed_at) in viewed.items():
+            yield {'user_id': user_id, 'patient_id': patient_id, 'ward_num': ward_num,
+                   'patient_name': name, 'viewed_at': viewed_at}
+
+def load_synthetic_data(output_dir, wards=200, patients=10000, notes=5000000, users=200, audit_entries=1000000,
+                        days=90, manual_notes=0.02, discharged=0.1, seed=0, end_date=None, password='synthetic'):
+    """Create the three databases in output_dir and fill them; returns rows loaded per table
+
+    Databases already in output_dir must be removed first.
+    """
+    end_date = end_date or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    rng = random.Random(seed)
+    special = min(wards, len(special_wards))
+    ward_list = ward_names(wards - special, special)
+    if patients // len(ward_list) + 1 > MAX_PATIENTS_PER_WARD:
+        raise ValueError(f"At most {MAX_PATIENTS_PER_WARD} patients per ward")
+    if wards - special > MAX_NUMERIC_WARDS:
+        raise ValueError(f"At most {MAX_NUMERIC_WARDS + special} wards")
+
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {}
+    with synthetic_databases(output_dir):
+        db.create_all()
+        ensure_manifest_table(db.get_engine(app, bind='pdf_parsed'))
+
+        weights = ward_weights(ward_list, rng)
+        patient_rows = build_patients(ward_list, patients, discharged, rng)
+        user_rows = build_users(users, ward_list, weights, password, rng)
+        loaded_at = datetime.utcnow()
+        counts['ward'] = bulk_insert(Ward, ({
+            'ward_number': ward_num,
+            'display_name': ward_display_name(ward_num),
+            'pdf_file': f"ward_{ward_num}_records.pdf",
+            'last_updated': loaded_at,
+        } for ward_num in ward_list))
+        counts['patient'] = bulk_insert(Patient, patient_rows)
+        counts['user'] = bulk_insert(User, user_rows)
+        counts['care_note'] = bulk_insert(CareNote, care_note_rows(
+            patient_rows, notes, days, manual_notes, users, end_date, rng))
+        recent = {}
+        counts['audit_log'] = bulk_insert(AuditLog, audit_rows(
+            audit_entries, user_rows, ward_list, weights, patient_rows, days, end_date, rng, recent))
+        counts['recently_viewed_patient'] = bulk_insert(RecentlyViewedPatient, recent_rows(recent))
+
+        for bind in (None, 'audit', 'pdf_parsed'):
+            with db.get_engine(app, bind=bind).connect() as conn:
+                conn.exec_driver_sql("ANALYZE")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output-dir', default='synthetic_db', help='directory for users.db, audit.db and pdf_parsed.db')
+    parser.add_argument('--wards', type=int, default=200, help=f'wards, the first {len(special_wards)} named (ICU, ED, ...)')
+    parser.add_argument('--patients', type=int, default=10000, help='patients, spread evenly over the wards')
+    parser.add_argument('--notes', type=int, default=5000000, help='care notes in all')
+    parser.add_argument('--users', type=int, default=200, help='users, including the admin')
+    parser.add_argument('--audit-entries', type=int, default=1000000, help='audit log entries')
+    parser.add_argument('--days', type=int, default=90, help='longest stay, and the audit log history, in days')
+    parser.add_argument('--manual-notes', type=float, default=0.02, help='share of notes written in the app')
+    parser.add_argument('--discharged', type=float, default=0.1, help='share of patients that are inactive')
+    parser.add_argument('--seed', type=int, default=0, help='random seed; the same seed loads the same rows')
+    parser.add_argument('--end-date', type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        help='end of every stay and of the audit history (default: today)')
+    parser.add_argument('--password', default='synthetic', help='password of every synthetic user')
+    parser.add_argument('--overwrite', action='store_true', help='replace databases already in --output-dir')
+    args = parser.parse_args()
+    if args.wards < 1 or args.patients < 1 or args.users < 1 or args.days < 1:
+        parser.error("--wards, --patients, --users and --days must be at least 1")
+
+    existing = [name for name in DATABASE_FILES if os.path.exists(os.path.join(args.output_dir, name))]
+    if existing and not args.overwrite:
+        sys.exit(f"{', '.join(existing)} already in {args.output_dir}; pass --overwrite to replace")
+    for name in existing:
+        os.remove(os.path.join(args.output_dir, name))
+
+    print(f"Loading synthetic data into {args.output_dir} (seed {args.seed})...")
+    started = time.perf_counter()
+    counts = load_synthetic_data(
+        args.output_dir, wards=args.wards, patients=args.patients, notes=args.notes, users=args.users,
+        audit_entries=args.audit_entries, days=args.days, manual_notes=args.manual_notes,
+        discharged=args.discharged, seed=args.seed, end_date=args.end_date, password=args.password,
+    )
+    sizes = ', '.join(f"{name} {os.path.getsize(os.path.join(args.output_dir, name)) / 2**20:.0f} MB"
+                      for name in DATABASE_FILES)
+    print(f"Loaded {sum(counts.values())} rows in {time.perf_counter() - started:.1f} s ({sizes})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+from app import app, db
+from models import care_note_hash
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+import sys
+
+def add_care_note_natural_key():
+    """Add note_hash to CareNote, backfill it for imported notes and create the natural-key unique index"""
+    with app.app_context():
+        try:
+            inspector = inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('care_note')]
+            
+            if 'note_hash' not in columns:
+                print("Adding note_hash column to CareNote table...")
+                db.session.execute(text('ALTER TABLE care_note ADD COLUMN note_hash VARCHAR(64)'))
+                db.session.commit()
+            
+            # Backfill hashes for PDF-imported notes so re-imports can detect them
+            rows = db.session.execute(text(
+                'SELECT id, note FROM care_note WHERE is_pdf_note = 1 AND note_hash IS NULL AND note IS NOT NULL'
+            )).fetchall()
+            if rows:
+                print(f"Hashing {len(rows)} imported care notes...")
+                db.session.execute(
+                    text('UPDATE care_note SET note_hash = :note_hash WHERE id = :id'),
+                    [{'id': row.id, 'note_hash': care_note_hash(row.note)} for row in rows]
+                )
+                db.session.commit()
+            
+            # Earlier imports could store the same note twice; keep the oldest copy
+            removed = db.session.execute(text(
+                'DELETE FROM care_note WHERE note_hash IS NOT NULL AND id NOT IN ('
+                'SELECT MIN(id) FROM care_note WHERE note_hash IS NOT NULL '
+                'GROUP BY patient_id, timestamp, note_hash)'
+            )).rowcount
+            if removed:
+                print(f"Removed {removed} duplicate imported care notes")
+            
+            db.session.execute(text(
+                'CREATE UNIQUE INDEX IF NOT EXISTS uq_carenote_natural_key '
+                'ON care_note (patient_id, timestamp, note_hash)'
+            ))
+            db.session.commit()
+            print("Migration completed successfully!")
+                
+        except OperationalError as e:
+            print(f"Database error: {str(e)}")
+            db.session.rollback()
+            sys.exit(1)
+        except Exception as e:
+            print(f"Unexpected error: {str(e)}")
+            db.session.rollback()
+            sys.exit(1)
+
+if __name__ == "__main__":
+    add_care_note_natural_key()
@@ -0,0 +1,31 @@
+from app import app, db
+from sqlalchemy import inspect
+from sqlalchemy.exc import OperationalError
+import sys
+
+def add_section_hash_column():
+    """Add section_hash column to Patient table (pdf_parsed database) if it doesn't exist"""
+    with app.app_context():
+        try:
+            # Check if column exists
+            engine = db.get_engine(app, 'pdf_parsed')
+            inspector = inspect(engine)
+            columns = [col['name'] for col in inspector.get_columns('patient')]
+            
+            if 'section_hash' not in columns:
+                print("Adding section_hash column to Patient table...")
+                engine.execute('ALTER TABLE patient ADD COLUMN section_hash VARCHAR(64)')
+                # Existing patients have no hash, so the next import re-checks all of their notes
+                print("Migration completed successfully!")
+            else:
+                print("section_hash column already exists, no migration needed.")
+                
+        except OperationalError as e:
+            print(f"Database error: {str(e)}")
+            sys.exit(1)
+        except Exception as e:
+            print(f"Unexpected error: {str(e)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    add_section_hash_column()
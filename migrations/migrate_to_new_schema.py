@@ -2,14 +2,13 @@ import sys
 import os
 from datetime import datetime
 import logging
-from PyPDF2 import PdfReader
-import re
 
 # Add parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import app, db
 from models import Ward, Patient, Note
+from utils.ward_pdf_parser import iter_pdf_patients
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,78 +18,17 @@ def extract_patient_info(pdf_path):
     logger.info(f"Extracting patient information from {pdf_path}")
     
     try:
-        # Create a PDF reader object
-        reader = PdfReader(pdf_path)
-        
-        # Store patient data
-        patients = {}
-        current_patient_id = None
-        
-        # Process each page for patient headers
-        for page_num, page in enumerate(reader.pages):
-            text = page.extract_text()
-            logger.info(f"Processing page {page_num+1}, text length: {len(text)}")
-            
-            # Find patient records
-            # This regex pattern needs to match how patient IDs appear in your PDFs
-            patient_pattern = r'(\d{10})\s+([A-Za-z\s,\-]+)(?:\s+DOB:\s+(\d{2}/\d{2}/\d{4}))?'
-            
-            for match in re.finditer(patient_pattern, text):
-                patient_id, name, dob = match.groups()
-                current_patient_id = patient_id  # Track current patient for care notes
-                
-                # Add patient to our dictionary if not already there
-                if patient_id not in patients:
-                    patients[patient_id] = {
-                        'name': name.strip(),
-                        'info': {
-                            'DOB': dob if dob else 'Unknown'
-                        },
-                        'care_notes': []
-                    }
-                    
-                    logger.info(f"Found patient: {patient_id} - {name.strip()}")
-            
-            # Now extract care notes if we found any patients
-            if current_patient_id and "Continuous Care Notes" in text:
-                # Find the care notes section
-                sections = text.split("Continuous Care Notes")
-                if len(sections) > 1:
-                    notes_section = sections[1]
-                    lines = notes_section.split('\n')
-                    
-                    # Look for notes after header row
-                    in_notes_table = False
-                    for line in lines:
-                        if "Date & Time" in line and "Staff Member" in line and "Notes" in line:
-                            in_notes_table = True
-                            continue
-                        
-                        if in_notes_table and line.strip():
-                            # Try to match date pattern at start of line (YYYY-MM-DD HH:MM)
-                            date_match = re.match(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2})', line)
-                            if date_match:
-                                try:
-                                    date_str = date_match.group(1)
-                                    remaining = line[len(date_str):].strip()
-                                    
-                                    # Split remaining text to get staff and note
-                                    parts = [p for p in re.split(r'\s{2,}', remaining) if p.strip()]
-                                    
-                                    if len(parts) >= 2:
-                                        staff = parts[0].strip()
-                                        note = ' '.join(parts[1:]).strip()
-                                        
-                                        # Add note to current patient
-                                        if current_patient_id in patients:
-                                            patients[current_patient_id]['care_notes'].append({
-                                                'date': date_str,
-                                                'staff': staff,
-                                                'note': note
-                                            })
-                                            logger.debug(f"Added note for {current_patient_id}: {date_str}")
-                                except Exception as e:
-                                    logger.error(f"Error parsing note line: {line[:50]}... Error: {str(e)}")
+        # Same parser as the importers, so the migration sees the same patients and notes
+        patients = {
+            patient_id: {
+                'name': record['name'],
+                'info': {
+                    'DOB': record['info'].get('DOB', 'Unknown')
+                },
+                'care_notes': record['care_notes']
+            }
+            for patient_id, record in iter_pdf_patients(pdf_path)
+        }
         
         # Log summary of extracted notes
         for patient_id, data in patients.items():
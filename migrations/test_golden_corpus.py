@@ -0,0 +1,136 @@
+"""Import the golden corpus and check every ward against its manifest.json.
+
+benchmarks/golden_corpus/ holds small ward PDFs made by
+generate_long_stay_ward.py and a manifest.json of what each must import
+to: the file's SHA-256, the patient and note counts the generator wrote,
+and a digest of the imported patients and notes. The corpus is imported
+into scratch databases with the page text cache off, so the live databases
+are not touched. Exits with status 1 if any ward differs.
+
+Usage:
+    python migrations/test_golden_corpus.py [--jobs 1]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Log to a scratch directory, not the app's logs/app.log
+os.environ.setdefault('LOG_DIR', os.path.join(tempfile.gettempdir(), 'ward_benchmark_logs'))
+
+from app import app, db
+from config import Config
+from load_synthetic_data import synthetic_databases
+from models import Patient
+from utils.pdf_manifest import ensure_manifest_table, hash_file
+from utils.ward_import import import_ward_pdfs
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'golden_corpus')
+MANIFEST_FILE = 'manifest.json'
+
+def corpus_files(corpus_dir):
+    return sorted(glob.glob(os.path.join(corpus_dir, 'ward_*_records.pdf')))
+
+def load_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def corpus_changes(corpus_dir, manifest):
+    """Names of corpus files that are missing, changed or not in the manifest"""
+    changed = [name for name, entry in manifest['files'].items()
+               if not os.path.exists(os.path.join(corpus_dir, name))
+               or hash_file(os.path.join(corpus_dir, name)) != entry['sha256']]
+    extra = sorted(set(map(os.path.basename, corpus_files(corpus_dir))) - set(manifest['files']))
+    return changed + extra
+
+def imported_wards():
+    """{ward: {'patients', 'notes', 'content_sha256'}} of what is in the current databases
+
+    The digest covers every patient (ID, name, DOB, ward) and note (patient,
+    time, staff, text hash) of the ward, in a fixed order.
+    """
+    wards = {}
+    for ward, hospital_id, name, dob in db.session.execute(db.text(
+            "SELECT current_ward, hospital_id, name, dob FROM patient ORDER BY current_ward, hospital_id"),
+            bind_arguments={'mapper': Patient.__mapper__}):
+        ward_entry = wards.setdefault(ward, {'patients': 0, 'notes': 0, 'digest': hashlib.sha256()})
+        ward_entry['patients'] += 1
+        ward_entry['digest'].update(f"P|{hospital_id}|{name}|{dob}\n".encode('utf-8'))
+    for ward, patient_id, timestamp, staff_name, note_hash in db.session.execute(db.text(
+            "SELECT ward_id, patient_id, timestamp, staff_name, note_hash FROM care_note "
+            "ORDER BY ward_id, patient_id, timestamp, note_hash")):
+        ward_entry = wards.setdefault(ward, {'patients': 0, 'notes': 0, 'digest': hashlib.sha256()})
+        ward_entry['notes'] += 1
+        ward_entry['digest'].update(f"N|{patient_id}|{timestamp}|{staff_name}|{note_hash}\n".encode('utf-8'))
+    return {ward: {'patients': entry['patients'], 'notes': entry['notes'],
+                   'content_sha256': entry['digest'].hexdigest()} for ward, entry in wards.items()}
+
+def run_import(pdf_files, jobs):
+    """Import pdf_files into fresh scratch databases; returns (seconds, failed files, imported_wards())"""
+    live_cache_mb = Config.PAGE_TEXT_CACHE_MAX_MB
+    with tempfile.TemporaryDirectory() as scratch:
+        Config.PAGE_TEXT_CACHE_MAX_MB = 0  # Measure text extraction too, every run
+        try:
+            with synthetic_databases(scratch):
+                db.create_all()
+                ensure_manifest_table(db.get_engine(app, bind='pdf_parsed'))
+                started = time.perf_counter()
+                _, _, failed = import_ward_pdfs(pdf_files, jobs=jobs, force=True)
+                elapsed = time.perf_counter() - started
+                wards = imported_wards()
+        finally:
+            Config.PAGE_TEXT_CACHE_MAX_MB = live_cache_mb
+    return elapsed, failed, wards
+
+def check_parity(manifest, wards):
+    """Lines describing every ward whose import differs from the manifest"""
+    problems = []
+    for file_name, expected in sorted(manifest['files'].items()):
+        imported = wards.pop(expected['ward'], None)
+        if imported is None:
+            problems.append(f"{file_name}: nothing imported")
+            continue
+        for key in ('patients', 'notes'):
+            if imported[key] != expected[key]:
+                problems.append(f"{file_name}: {imported[key]} {key}, expected {expected[key]}")
+        if imported['content_sha256'] != expected['content_sha256'] and (
+                imported['patients'], imported['notes']) == (expected['patients'], expected['notes']):
+            problems.append(f"{file_name}: patient or note contents differ")
+    for ward in sorted(wards):
+        problems.append(f"ward {ward}: imported but not in the manifest")
+    return problems
+
+def verify_golden_corpus(corpus_dir=CORPUS_DIR, jobs=1):
+    """Problems found importing the corpus in corpus_dir; empty if every ward matches"""
+    manifest = load_json(os.path.join(corpus_dir, MANIFEST_FILE))
+    pdf_files = corpus_files(corpus_dir)
+    if manifest is None or not pdf_files:
+        return [f"No golden corpus in {corpus_dir}; build it with benchmarks/benchmark_golden_corpus.py --regenerate"]
+    changes = corpus_changes(corpus_dir, manifest)
+    if changes:
+        return [f"Corpus does not match {MANIFEST_FILE}: {', '.join(changes)}"]
+    _, failed, wards = run_import(pdf_files, jobs)
+    problems = [f"{os.path.basename(pdf_file)}: import failed" for pdf_file in failed]
+    return problems + check_parity(manifest, wards)
+
+def test_golden_corpus_parity():
+    problems = verify_golden_corpus()
+    assert not problems, "\n".join(problems)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=1, help='parser processes, as for initialize_database.py')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    problems = verify_golden_corpus(jobs=args.jobs)
+    for problem in problems:
+        print(f"  {problem}")
+    print(f"\nGolden corpus verification {'failed' if problems else 'successful'}")
+    sys.exit(1 if problems else 0)
@@ -1,8 +1,9 @@
+import hashlib
 from datetime import datetime
 from flask_login import UserMixin
-from flask_sqlalchemy import SQLAlchemy
+from utils.sqlite_tuning import TunedSQLAlchemy
 
-db = SQLAlchemy()
+db = TunedSQLAlchemy()
 
 class User(UserMixin, db.Model):
     __table_args__ = {'extend_existing': True}
@@ -13,7 +14,12 @@ class User(UserMixin, db.Model):
     default_ward = db.Column(db.String(50), nullable=True)
 
 class AuditLog(db.Model):
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('idx_auditlog_timestamp', 'timestamp'),
+        # Covers the recent ward views counted by utils/import_priority.py
+        db.Index('idx_auditlog_action_target', 'action', 'patient_id', 'timestamp'),
+        {'extend_existing': True}
+    )
     __bind_key__ = 'audit'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, nullable=False)
@@ -24,9 +30,8 @@ class AuditLog(db.Model):
 
 class Patient(db.Model):
     __table_args__ = (
-        db.Index('idx_patient_hospital_id', 'hospital_id'),
-        db.Index('idx_patient_current_ward', 'current_ward'),
-        db.Index('idx_patient_is_active', 'is_active'),
+        # A ward's active patients by name; also covers the per-ward patient counts
+        db.Index('idx_patient_ward_active_name', 'current_ward', 'is_active', 'name'),
         {'extend_existing': True}
     )
     id = db.Column(db.Integer, primary_key=True)
@@ -39,6 +44,7 @@ class Patient(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    section_hash = db.Column(db.String(64))  # SHA-256 of this patient's PDF pages at last note import
     __bind_key__ = 'pdf_parsed'  # Associate with pdf_parsed database
 
 class Note(db.Model):
@@ -78,6 +84,63 @@ class Ward(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     __bind_key__ = 'pdf_parsed'  # Associate with pdf_parsed database
 
+class WardPdfManifest(db.Model):
+    """Fingerprint of each imported ward PDF, used to skip files that have not changed"""
+    __table_args__ = {'extend_existing': True}
+    id = db.Column(db.Integer, primary_key=True)
+    pdf_file = db.Column(db.String(200), unique=True, nullable=False)
+    ward_number = db.Column(db.String(50), nullable=False)
+    file_size = db.Column(db.Integer, nullable=False)
+    file_mtime = db.Column(db.Float, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the file contents
+    scope = db.Column(db.String(20), nullable=False, default='full')  # 'full' (patients and notes) or 'patients'
+    imported_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __bind_key__ = 'pdf_parsed'  # Stored alongside Ward in pdf_parsed database
+
+class PatientPageIndex(db.Model):
+    """Page range of each patient inside a ward PDF, read from the PDF outline"""
+    __table_args__ = (
+        db.UniqueConstraint('pdf_file', 'hospital_id', name='uq_patient_page_index'),
+        {'extend_existing': True}
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    pdf_file = db.Column(db.String(200), nullable=False, index=True)
+    hospital_id = db.Column(db.String(50), nullable=False)
+    first_page = db.Column(db.Integer, nullable=False)  # 0-based, inclusive
+    last_page = db.Column(db.Integer, nullable=False)  # 0-based, inclusive
+    content_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the file the index was read from
+    __bind_key__ = 'pdf_parsed'
+
+class PatientMovement(db.Model):
+    """Transfers, readmissions and discharges found when reconciling imported ward PDFs"""
+    __table_args__ = {'extend_existing': True}
+    id = db.Column(db.Integer, primary_key=True)
+    hospital_id = db.Column(db.String(10), nullable=False, index=True)
+    movement = db.Column(db.String(20), nullable=False)  # transfer, readmit, discharge
+    from_ward = db.Column(db.String(50))
+    to_ward = db.Column(db.String(50))  # None for a discharge
+    pdf_file = db.Column(db.String(200))  # The ward PDF the movement was found in
+    run_id = db.Column(db.String(32))  # ImportJournal run that found it
+    recorded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __bind_key__ = 'pdf_parsed'
+
+class ImportJournal(db.Model):
+    """Progress of each ward PDF in an import run, so an interrupted import can be resumed"""
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'pdf_file', name='uq_import_journal'),
+        {'extend_existing': True}
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.String(32), nullable=False, index=True)
+    pdf_file = db.Column(db.String(200), nullable=False)
+    content_hash = db.Column(db.String(64))  # SHA-256 of the file being imported
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, in_progress, done, failed
+    patients_done = db.Column(db.Integer, nullable=False, default=0)  # Patients committed so far
+    last_patient_id = db.Column(db.String(50))  # Hospital ID of the last committed patient
+    error = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __bind_key__ = 'pdf_parsed'
+
 class Settings(db.Model):
     __table_args__ = {'extend_existing': True}
     id = db.Column(db.Integer, primary_key=True)
@@ -124,14 +187,20 @@ def get_timeout_minutes():
     except ValueError:
         return 30  # Default if the setting isn't a valid number
 
+def care_note_hash(note_text):
+    """Hash of a note's text, used in the CareNote natural key (patient_id, timestamp, note_hash)"""
+    return hashlib.sha256(note_text.encode('utf-8')).hexdigest()
+
 class CareNote(db.Model):
     __tablename__ = 'care_note'
-    # Add indexes to commonly queried columns
+    # Each index serves a filter followed by ORDER BY timestamp (newest first), so no sort is needed
     __table_args__ = (
-        db.Index('idx_carenote_patient_id', 'patient_id'),
-        db.Index('idx_carenote_user_id', 'user_id'),
-        db.Index('idx_carenote_timestamp', 'timestamp'),
-        db.Index('idx_carenote_ward_id', 'ward_id'),
+        # Natural key for PDF-imported notes; manual notes leave note_hash NULL.
+        # Also a patient's notes by time.
+        db.Index('uq_carenote_natural_key', 'patient_id', 'timestamp', 'note_hash', unique=True),
+        db.Index('idx_carenote_user_timestamp', 'user_id', 'timestamp'),  # My shift notes
+        db.Index('idx_carenote_is_pdf_note_timestamp', 'is_pdf_note', 'timestamp'),  # Manual notes (admin, export)
+        db.Index('idx_carenote_ward_timestamp', 'ward_id', 'timestamp'),  # Admin notes filtered by ward
         {'extend_existing': True}
     )
     id = db.Column(db.Integer, primary_key=True)
@@ -144,6 +213,7 @@ class CareNote(db.Model):
     # Add staff_name field for imported notes from PDFs
     staff_name = db.Column(db.String(100))
     is_pdf_note = db.Column(db.Boolean, default=False)
+    note_hash = db.Column(db.String(64))  # care_note_hash(note) for imported notes
     
     # Existing relationships
     user = db.relationship('User', backref='care_notes')
@@ -161,9 +231,20 @@ class CareNote(db.Model):
             'is_pdf_note': self.is_pdf_note
         }
 
+# Patient, Ward and AuditLog as seen from the main database, which attaches the
+# pdf_parsed and audit databases (utils/sqlite_tuning.py); for joining care notes
+# with their patient and ward in one statement
+attached_metadata = db.MetaData()
+attached_patient = Patient.__table__.to_metadata(attached_metadata, schema='pdf_parsed')
+attached_ward = Ward.__table__.to_metadata(attached_metadata, schema='pdf_parsed')
+attached_audit_log = AuditLog.__table__.to_metadata(attached_metadata, schema='audit')
+
 class RecentlyViewedPatient(db.Model):
     """Model to track recently viewed patients for each user"""
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('idx_recently_viewed_user_viewed_at', 'user_id', 'viewed_at'),
+        {'extend_existing': True}
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     patient_id = db.Column(db.String(50), nullable=False)  # External patient ID
@@ -184,7 +265,10 @@ class RecentlyViewedPatient(db.Model):
 
 class NoteTemplate(db.Model):
     """Model for predefined note templates"""
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('idx_note_template_category_active', 'category_id', 'is_active'),
+        {'extend_existing': True}
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)  # Template name (e.g., "Medical Clerking")
     content = db.Column(db.Text, nullable=False)      # Template content
@@ -1,13 +1,23 @@
-from app import app, db, CareNote
-from models import Ward, Patient, Note, User, Settings
+from app import app, db
+from models import Note, User, Settings
 from werkzeug.security import generate_password_hash
 import logging
 import os
-import re
 import shutil
+import sqlite3
+import sys
 from datetime import datetime
-from PyPDF2 import PdfReader
-from sqlalchemy import inspect, text
+from sqlalchemy import inspect
+from utils.db_indexes import apply_indexes
+from utils.bulk_import import DEFAULT_WRITE_BUDGET_MS
+from config import Config
+from utils.import_telemetry import ImportTelemetry
+from utils.pdf_manifest import ensure_manifest_table
+from utils.reconcile import carry_over_history
+from utils.shadow_db import BUILDING_SUFFIX, discard_shadow, generation_path, swap_in, verify_database
+from utils.ward_import import import_ward_pdfs
+from utils.ward_pdf_parser import list_ward_pdfs, ward_number_for
+from utils.parallel_import import DEFAULT_PDF_TIMEOUT, build_arg_parser, resolve_jobs
 
 # Configure logging
 logging.basicConfig(
@@ -38,167 +48,11 @@ def backup_databases():
     
     return True
 
-def parse_pdf_content(pdf_path, patient_id=None):
-    """Extract patient info and notes from PDF file"""
-    patient_data = {}
-    current_patient = None
-    current_patient_id = None
-    try:
-        reader = PdfReader(pdf_path)
-        for page_idx in range(len(reader.pages)):
-            page = reader.pages[page_idx]
-            text = page.extract_text()
-            # Check if this is a new patient record
-            if "Patient Record - Ward" in text:
-                # Save previous patient if exists
-                if current_patient_id and current_patient:
-                    if not patient_id or current_patient_id == patient_id:
-                        patient_data[current_patient_id] = current_patient
-                # Reset for new patient
-                current_patient = {
-                    "info": {},
-                    "name": "Unknown",
-                    "vitals": "",
-                    "care_notes": []
-                }
-                current_patient_id = None
-                in_care_notes = False
-                
-            # Extract patient ID
-            if current_patient and not current_patient_id:
-                id_match = re.search(r"Patient ID:\s*(\d+)", text)
-                if id_match:
-                    current_patient_id = id_match.group(1).strip()
-                    
-            # If we found the specific patient we're looking for, or we want all patients
-            if not patient_id or (current_patient_id and (current_patient_id == patient_id)):
-                # Extract name if we haven't yet
-                if current_patient and current_patient["name"] == "Unknown":
-                    name_match = re.search(r"Name:\s*([^\n]+)", text)
-                    if name_match:
-                        current_patient["name"] = name_match.group(1).strip()
-                
-                # Extract DOB if we haven't yet
-                if current_patient and "DOB" not in current_patient["info"]:
-                    dob_match = re.search(r"DOB:\s*([^\n]+)", text)
-                    if dob_match:
-                        current_patient["info"]["DOB"] = dob_match.group(1).strip()
-                
-                # Check for care notes section
-                if "Continuous Care Notes" in text and not in_care_notes:
-                    in_care_notes = True
-                
-                # Extract care notes if we're in that section
-                if in_care_notes and current_patient:
-                    care_notes_text = text
-                    if "Continuous Care Notes" in text:
-                        care_notes_section = text.split("Continuous Care Notes", 1)
-                        if len(care_notes_section) > 1:
-                            care_notes_text = care_notes_section[1].strip()
-                    
-                    # Extract individual notes using regex pattern
-                    care_notes_pattern = r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2})\s+([^,]+(?:, [A-Z]+)?)\s+(.+?)(?=(?:\d{4}-\d{2}-\d{2} \d{2}:\d{2})|$)"
-                    matches = list(re.finditer(care_notes_pattern, care_notes_text, re.DOTALL))
-                    
-                    for match in matches:
-                        date = match.group(1).strip()
-                        staff = match.group(2).strip()
-                        note = match.group(3).strip()
-                        if date and staff and note:
-                            current_patient["care_notes"].append({
-                                "date": date,
-                                "staff": staff,
-                                "note": note
-                            })
-            
-        # Don't forget to add the last patient
-        if current_patient_id and current_patient:
-            if not patient_id or current_patient_id == patient_id:
-                patient_data[current_patient_id] = current_patient
-                
-        return patient_data
-        
-    except Exception as e:
-        logger.error(f"PDF parsing error: {str(e)}")
-        return {}
+def reset_and_initialize_system(jobs=1, timeout=DEFAULT_PDF_TIMEOUT):
+    """Reset databases and initialize with PDF data
 
-def apply_indexes():
-    """Apply all indexes to the databases"""
-    logger.info("Applying database indexes...")
-    
-    with app.app_context():
-        # Group 1: Main database indexes
-        main_db_indexes = [
-            # User table indexes
-            ('CREATE INDEX IF NOT EXISTS idx_user_username ON user (username)'),
-            ('CREATE INDEX IF NOT EXISTS idx_user_role ON user (role)'),
-            
-            # Care Note indexes
-            ('CREATE INDEX IF NOT EXISTS idx_carenote_patient_id ON care_note (patient_id)'),
-            ('CREATE INDEX IF NOT EXISTS idx_carenote_timestamp ON care_note (timestamp DESC)'),
-            ('CREATE INDEX IF NOT EXISTS idx_carenote_user_id ON care_note (user_id)'),
-            ('CREATE INDEX IF NOT EXISTS idx_carenote_ward_id ON care_note (ward_id)'),
-            ('CREATE INDEX IF NOT EXISTS idx_carenote_is_pdf_note ON care_note (is_pdf_note)'),
-            
-            # Recently viewed patients
-            ('CREATE INDEX IF NOT EXISTS idx_recently_viewed_user_id ON recently_viewed_patient (user_id)'),
-            ('CREATE INDEX IF NOT EXISTS idx_recently_viewed_timestamp ON recently_viewed_patient (viewed_at DESC)'),
-            
-            # Settings and templates
-            ('CREATE INDEX IF NOT EXISTS idx_settings_key ON settings (key)'),
-            ('CREATE INDEX IF NOT EXISTS idx_note_template_category ON note_template (category_id)'),
-            ('CREATE INDEX IF NOT EXISTS idx_note_template_active ON note_template (is_active)')
-        ]
-        
-        # Apply main DB indexes
-        for index_sql in main_db_indexes:
-            try:
-                logger.info(f"Applying to main DB: {index_sql}")
-                db.session.execute(text(index_sql))
-                db.session.commit()
-            except Exception as e:
-                logger.error(f"Error applying index: {str(e)}")
-                db.session.rollback()
-        
-        # Group 2: pdf_parsed database indexes
-        try:
-            pdf_parsed_engine = db.get_engine(app, 'pdf_parsed')
-            pdf_parsed_indexes = [
-                ('CREATE INDEX IF NOT EXISTS idx_patient_hospital_id ON patient (hospital_id)'),
-                ('CREATE INDEX IF NOT EXISTS idx_patient_current_ward ON patient (current_ward)'),
-                ('CREATE INDEX IF NOT EXISTS idx_patient_is_active ON patient (is_active)'),
-                ('CREATE INDEX IF NOT EXISTS idx_patient_name ON patient (name)'),
-                ('CREATE INDEX IF NOT EXISTS idx_ward_ward_number ON ward (ward_number)')
-            ]
-            
-            for index_sql in pdf_parsed_indexes:
-                try:
-                    logger.info(f"Applying to pdf_parsed DB: {index_sql}")
-                    pdf_parsed_engine.execute(text(index_sql))
-                except Exception as e:
-                    logger.error(f"Error applying index to pdf_parsed DB: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error accessing pdf_parsed database: {str(e)}")
-        
-        # Group 3: audit database indexes
-        try:
-            audit_engine = db.get_engine(app, 'audit')
-            audit_indexes = [
-                ('CREATE INDEX IF NOT EXISTS idx_auditlog_timestamp ON audit_log (timestamp DESC)'),
-                ('CREATE INDEX IF NOT EXISTS idx_auditlog_user_id ON audit_log (user_id)')
-            ]
-            
-            for index_sql in audit_indexes:
-                try:
-                    logger.info(f"Applying to audit DB: {index_sql}")
-                    audit_engine.execute(text(index_sql))
-                except Exception as e:
-                    logger.error(f"Error applying index to audit DB: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error accessing audit database: {str(e)}")
-
-def reset_and_initialize_system():
-    """Reset databases and initialize with PDF data"""
+    jobs > 1 parses the ward PDFs in a process pool; this process does all writes.
+    """
     with app.app_context():
         try:
             # Step 1: Backup existing databases
@@ -237,82 +91,26 @@ def reset_and_initialize_system():
             # Commit initial setup
             db.session.commit()
             
-            # Step 6: Process PDF files and import data
+            # Step 6: Import the ward PDFs through the same pipeline as initialize_database.py,
+            # which also records them in the manifest so the app does not import them again
             logger.info("Processing ward PDF files...")
-            pdf_files = [f for f in os.listdir('.') if f.startswith('ward_') and f.endswith('_records.pdf')]
+            pdf_files = list_ward_pdfs(Config.PDF_DIRECTORY)
             logger.info(f"Found {len(pdf_files)} ward PDF files")
-            
-            total_patients = 0
-            total_notes = 0
-            
-            for pdf_file in pdf_files:
-                ward_num = pdf_file[5:-12]  # Remove 'ward_' and '_records.pdf'
-                display_name = f"Ward {ward_num}" if ward_num.isdigit() else ward_num.replace('_', ' ')
-                
-                # Create or update ward record
-                ward = Ward.query.filter_by(ward_number=ward_num).first()
-                if not ward:
-                    ward = Ward(
-                        ward_number=ward_num,
-                        display_name=display_name,
-                        pdf_file=pdf_file,
-                        last_updated=datetime.utcnow()
-                    )
-                    db.session.add(ward)
-                else:
-                    ward.pdf_file = pdf_file
-                    ward.last_updated = datetime.utcnow()
-                
-                db.session.commit()
-                
-                # Import PDF data
-                logger.info(f"Processing {pdf_file}...")
-                patient_data = parse_pdf_content(pdf_file)
-                ward_patients = len(patient_data)
-                total_patients += ward_patients
-                logger.info(f"Found {ward_patients} patients in {pdf_file}")
-                
-                # Process each patient
-                for patient_id, info in patient_data.items():
-                    # Create or update patient
-                    patient = Patient.query.filter_by(hospital_id=patient_id).first()
-                    if not patient:
-                        patient = Patient(
-                            hospital_id=patient_id,
-                            name=info['name'],
-                            dob=info['info'].get('DOB', ''),
-                            current_ward=ward_num
-                        )
-                        db.session.add(patient)
-                        logger.debug(f"Added patient: {patient_id} - {info['name']}")
-                    
-                    # Add care notes directly to CareNote table
-                    notes_count = len(info.get('care_notes', []))
-                    
-                    for note_data in info['care_notes']:
-                        timestamp = datetime.strptime(note_data['date'], '%Y-%m-%d %H:%M')
-                        
-                        # Create CareNote
-                        carenote = CareNote(
-                            patient_id=patient_id,
-                            ward_id=ward_num,
-                            timestamp=timestamp,
-                            staff_name=note_data['staff'],
-                            note=note_data['note'],
-                            patient_name=info['name'],
-                            is_pdf_note=True
-                        )
-                        db.session.add(carenote)
-                        total_notes += 1
-                    
-                    # Commit after each patient to avoid large transactions
-                    db.session.commit()
-            
-            logger.info(f"Reset and initialization complete. Added {total_patients} patients and {total_notes} care notes.")
+            telemetry = ImportTelemetry(resolve_jobs(jobs))
+            imported_files, _, failed_files = import_ward_pdfs(pdf_files, jobs, timeout, force=True,
+                                                               telemetry=telemetry)
+            print(telemetry.summary())
+            telemetry.write_json(os.path.join(Config.IMPORT_REPORT_DIR, f"reset_{telemetry.extra['run_id']}.json"))
+            
+            totals = telemetry.report()['totals']
+            logger.info(f"Reset and initialization complete. Imported {len(imported_files)} ward PDF(s) with "
+                        f"{totals['patients']} patients and {totals['notes_inserted']} care notes.")
+            if failed_files:
+                logger.info("Retry the failed files with: python initialize_database.py --resume")
             
             # Step 7: Apply database indexes
             logger.info("Applying database indexes...")
-            apply_indexes()
+            apply_indexes(app)
             logger.info("Database indexes applied successfully")
             
             return True
@@ -322,10 +120,122 @@ def reset_and_initialize_system():
             db.session.rollback()
             return False
 
+def count_patients_by_ward(path):
+    """Map ward number -> active patients in the pdf_parsed database at path"""
+    if not os.path.exists(path):
+        return {}
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return dict(conn.execute(
+            "SELECT current_ward, COUNT(*) FROM patient WHERE is_active GROUP BY current_ward"
+        ).fetchall())
+    except sqlite3.Error:
+        return {}
+    finally:
+        conn.close()
+
+def verify_pdf_parsed_shadow(shadow_path, live_path, pdf_files, min_ratio=0.5):
+    """Return the reasons not to swap the shadow pdf_parsed database in (empty if it is complete)"""
+    problems = verify_database(shadow_path, ['ward', 'patient', 'note', 'ward_pdf_manifest'])
+    if problems:
+        return problems
+    
+    shadow_counts = count_patients_by_ward(shadow_path)
+    for pdf_file in pdf_files:
+        if not shadow_counts.get(ward_number_for(pdf_file)):
+            problems.append(f"no patients imported from {pdf_file}")
+    
+    # Guard against swapping in a partial PDF set, e.g. a half-synced PDF directory
+    live_total = sum(count_patients_by_ward(live_path).values())
+    shadow_total = sum(shadow_counts.values())
+    if live_total and shadow_total < live_total * min_ratio:
+        problems.append(f"only {shadow_total} patients against {live_total} in the live database")
+    return problems
+
+def refresh_pdf_parsed_database(jobs=1, timeout=DEFAULT_PDF_TIMEOUT, min_ratio=0.5,
+                                write_budget_ms=DEFAULT_WRITE_BUDGET_MS):
+    """Rebuild pdf_parsed.db from the ward PDFs without taking it offline
+
+    The new database is built next to the live one, verified and then
+    swapped in atomically (see utils/shadow_db.py), so the app keeps
+    serving the old wards and patients until the new ones are complete.
+    The live patient movement log and discharged patients are carried
+    over, and the moves since the live build are logged (utils/reconcile.py).
+    Care notes are added to the main database as usual; notes already
+    there are skipped. Those writes go to the live users.db, so they are
+    throttled to ``write_budget_ms`` per transaction (0 = unthrottled).
+    """
+    with app.app_context():
+        live_path = db.get_engine(app, bind='pdf_parsed').url.database
+        shadow_path = generation_path(live_path) + BUILDING_SUFFIX
+        live_binds = app.config['SQLALCHEMY_BINDS']
+        
+        # Point this process at the shadow file; the app keeps using the live one
+        app.config['SQLALCHEMY_BINDS'] = dict(live_binds, pdf_parsed=f'sqlite:///{shadow_path}')
+        try:
+            logger.info(f"Building {os.path.basename(shadow_path)}...")
+            db.create_all(bind='pdf_parsed')
+            ensure_manifest_table(db.get_engine(app, bind='pdf_parsed'))
+            
+            pdf_files = list_ward_pdfs(Config.PDF_DIRECTORY)
+            logger.info(f"Found {len(pdf_files)} ward PDF files in {Config.PDF_DIRECTORY}")
+            telemetry = ImportTelemetry(resolve_jobs(jobs))
+            imported_files, _, failed_files = import_ward_pdfs(pdf_files, jobs, timeout, force=True,
+                                                               telemetry=telemetry, write_budget_ms=write_budget_ms)
+            print(telemetry.summary())
+            telemetry.write_json(os.path.join(Config.IMPORT_REPORT_DIR, f"refresh_{telemetry.extra['run_id']}.json"))
+            db.session.remove()
+            db.get_engine(app, bind='pdf_parsed').dispose()
+            
+            # Keep the movement log and discharged patients, and log the moves since the live build
+            if os.path.exists(live_path):
+                moves = carry_over_history(shadow_path, live_path, telemetry.extra['run_id'])
+                logger.info(f"Since the live database: {moves['transfer']} transferred, "
+                            f"{moves['readmit']} readmitted, {moves['discharge']} discharged")
+        except Exception as e:
+            logger.error(f"Building the new pdf_parsed database failed: {str(e)}")
+            db.session.rollback()
+            db.session.remove()
+            failed_files = None
+        finally:
+            app.config['SQLALCHEMY_BINDS'] = live_binds
+        
+        if failed_files is None:
+            problems = ["build failed"]
+        elif failed_files:
+            problems = [f"{len(failed_files)} ward PDF(s) failed: {', '.join(sorted(failed_files))}"]
+        else:
+            problems = verify_pdf_parsed_shadow(shadow_path, live_path, imported_files, min_ratio)
+        if problems:
+            for problem in problems:
+                logger.error(f"Not swapping in the new pdf_parsed database: {problem}")
+            discard_shadow(shadow_path)
+            return False
+        
+        swap_in(live_path, shadow_path)
+        logger.info(f"Refresh complete: {len(imported_files)} ward PDF(s) now live")
+        return True
+
 if __name__ == "__main__":
+    parser = build_arg_parser("Reset all databases and re-import the ward PDFs")
+    parser.add_argument('--refresh', action='store_true',
+                        help='rebuild only pdf_parsed.db next to the live one and swap it in, '
+                             'keeping users, notes and the audit log')
+    parser.add_argument('--min-ratio', type=float, default=0.5,
+                        help='with --refresh, refuse to swap if the new database has fewer than '
+                             'this fraction of the live patients')
+    parser.add_argument('--write-budget-ms', type=int, default=DEFAULT_WRITE_BUDGET_MS,
+                        help='with --refresh, milliseconds each write transaction may hold the SQLite '
+                             'write lock (0 = unthrottled)')
+    args = parser.parse_args()
+    
+    if args.refresh:
+        sys.exit(0 if refresh_pdf_parsed_database(args.jobs, args.timeout, args.min_ratio,
+                                                  args.write_budget_ms) else 1)
+    
     # Ask for confirmation before proceeding
     response = input("This will reset ALL databases and lose all data. Are you sure you want to proceed? (y/n): ")
     if response.lower() == 'y':
-        reset_and_initialize_system()
+        reset_and_initialize_system(jobs=args.jobs, timeout=args.timeout)
     else:
         print("Reset and initialization cancelled.")
\ No newline at end of file
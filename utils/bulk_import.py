@@ -0,0 +1,153 @@
+"""Set-based loading of imported patients and care notes.
+
+Rows are written with Core INSERT ... ON CONFLICT DO NOTHING executemany
+statements instead of one ORM lookup per note; duplicates are rejected by
+the unique indexes on Patient.hospital_id and the CareNote natural key
+(patient_id, timestamp, note_hash).
+
+While the app is live, a WriteThrottle keeps each transaction short so the
+app's own writes (care notes, audit log) are never stuck behind an import
+holding the SQLite write lock.
+"""
+import time
+from datetime import datetime
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, CareNote, Patient, care_note_hash
+
+# Notes written per INSERT statement
+NOTE_BATCH_SIZE = 5000
+
+# Patients written per transaction; an interrupted import resumes after the last one committed
+CHECKPOINT_PATIENTS = 25
+
+# Seconds after which the patients parsed so far are committed, however few
+CHECKPOINT_SECONDS = 10
+
+# Milliseconds a throttled import may hold the write lock per transaction
+DEFAULT_WRITE_BUDGET_MS = 50
+
+# Smallest number of notes a throttled transaction is cut down to
+MIN_THROTTLED_BATCH_SIZE = 20
+
+# Seconds a throttled import waits at least after each transaction
+MIN_THROTTLE_PAUSE = 0.005
+
+class WriteThrottle:
+    """Sizes write transactions to a write-lock time budget and pauses between them
+
+    The batch size follows the measured time per row, shrinking at once when
+    a transaction runs over the budget and growing back gradually. After each
+    commit the import sleeps for as long as the lock was held, so the app's
+    writers always get their turn.
+    """
+
+    def __init__(self, budget_ms=DEFAULT_WRITE_BUDGET_MS):
+        self.budget = budget_ms / 1000
+        self.batch_size = 500
+        self.transactions = 0
+        self.over_budget = 0
+        self.locked_seconds = 0.0
+        self.paused_seconds = 0.0
+
+    def committed(self, seconds, rows):
+        """Record a transaction of rows that held the write lock for seconds, then pause"""
+        self.transactions += 1
+        self.locked_seconds += seconds
+        if seconds > self.budget:
+            self.over_budget += 1
+        if rows and seconds > 0:
+            # Aim a little under the budget to absorb jitter
+            fitting = int(0.8 * self.budget / (seconds / rows))
+            if fitting < self.batch_size:
+                self.batch_size = fitting
+            else:
+                self.batch_size = (self.batch_size + fitting) // 2
+            self.batch_size = max(MIN_THROTTLED_BATCH_SIZE, min(NOTE_BATCH_SIZE, self.batch_size))
+        pause = max(seconds, MIN_THROTTLE_PAUSE)
+        time.sleep(pause)
+        self.paused_seconds += pause
+
+    def report(self):
+        """Totals of the throttled transactions, for the import telemetry"""
+        return {
+            'write_budget_ms': round(self.budget * 1000),
+            'transactions': self.transactions,
+            'over_budget': self.over_budget,
+            'locked_seconds': round(self.locked_seconds, 3),
+            'paused_seconds': round(self.paused_seconds, 3),
+            'final_batch_size': self.batch_size,
+        }
+
+def patient_row(patient_id, info, ward_number, pdf_file):
+    """Column values for a new Patient built from a parsed patient record, read from pdf_file"""
+    return {
+        'hospital_id': patient_id,
+        'name': info.get('name', 'Unknown'),
+        'dob': info.get('info', {}).get('DOB', ''),
+        'current_ward': ward_number,
+        'pdf_file': pdf_file,
+        'section_hash': info.get('section_hash'),
+    }
+
+def care_note_rows(patient_id, info, ward_number):
+    """Yield CareNote column values for each parsed note of one patient"""
+    for note_data in info.get('care_notes', []):
+        yield {
+            'patient_id': patient_id,
+            'ward_id': ward_number,
+            'timestamp': datetime.fromisoformat(note_data['date']),
+            'staff_name': note_data['staff'],
+            'note': note_data['note'],
+            'note_hash': care_note_hash(note_data['note']),
+            'patient_name': info.get('name', 'Unknown'),
+            'is_pdf_note': True,
+        }
+
+def write_batch(patient_rows, note_rows, throttle=None):
+    """Insert a batch of patients and notes, skipping rows that already exist
+
+    Notes are committed before section hashes are stored, so a crash in
+    between only causes those patients to be re-checked on the next import.
+    The notes are inserted NOTE_BATCH_SIZE at a time, or with a WriteThrottle
+    in transactions that fit its budget. Returns the number of notes
+    actually inserted.
+    """
+    session = db.session
+    started = time.perf_counter()
+    if patient_rows:
+        new_patients = [{k: v for k, v in row.items() if k != 'section_hash'} for row in patient_rows]
+        session.execute(insert(Patient.__table__).on_conflict_do_nothing(), new_patients)
+    inserted = 0
+    start = 0
+    while True:
+        chunk = note_rows[start:start + (throttle.batch_size if throttle else NOTE_BATCH_SIZE)]
+        if chunk:
+            result = session.execute(insert(CareNote.__table__).on_conflict_do_nothing(), chunk)
+            inserted += max(result.rowcount, 0)
+        session.commit()
+        if throttle:
+            throttle.committed(time.perf_counter() - started, len(chunk))
+            started = time.perf_counter()
+        start += len(chunk)
+        if start >= len(note_rows):
+            break
+
+    hashed = [{'b_hospital_id': row['hospital_id'], 'b_section_hash': row['section_hash']}
+              for row in patient_rows if row.get('section_hash')]
+    if hashed:
+        session.execute(
+            update(Patient.__table__)
+            .where(Patient.__table__.c.hospital_id == bindparam('b_hospital_id'))
+            .values(section_hash=bindparam('b_section_hash')),
+            hashed
+        )
+        session.commit()
+        if throttle:
+            throttle.committed(time.perf_counter() - started, 0)
+
+    # Nothing from this batch is needed again; keep the identity map from growing
+    session.expunge_all()
+    return inserted
@@ -0,0 +1,115 @@
+"""Bring the indexes of existing databases in line with models.py.
+
+db.create_all() only creates a model's indexes together with its table, so
+databases created before an index was declared get it from apply_indexes().
+Indexes earlier releases created (in models.py or in the old index
+migration) that a declared composite index now covers, or that no query
+uses, are dropped. Every database is ANALYZEd afterwards so the query
+planner knows how selective the new indexes are. An index on a column an
+older database does not have yet is not attempted: apply_indexes() stops
+before changing anything and names the migration that adds the column.
+
+benchmarks/check_query_plans.py checks that the app's hot queries use them.
+"""
+import logging
+
+from sqlalchemy import inspect
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Rows ANALYZE samples per index; enough for the planner on any database size
+ANALYSIS_LIMIT = 1000
+
+# {bind: index names} no longer declared on the models
+SUPERSEDED_INDEXES = {
+    None: [
+        'idx_user_username', 'idx_user_role',  # username is unique; role is never filtered on
+        'idx_carenote_patient_id',  # uq_carenote_natural_key
+        'idx_carenote_user_id',  # idx_carenote_user_timestamp
+        'idx_carenote_timestamp', 'idx_carenote_is_pdf_note',  # idx_carenote_is_pdf_note_timestamp
+        'idx_carenote_ward_id',  # idx_carenote_ward_timestamp
+        'idx_recently_viewed_user_id', 'idx_recently_viewed_timestamp',  # idx_recently_viewed_user_viewed_at
+        'idx_settings_key',  # key is unique
+        'idx_note_template_category', 'idx_note_template_active',  # idx_note_template_category_active
+    ],
+    'pdf_parsed': [
+        'idx_patient_hospital_id',  # hospital_id is unique
+        'idx_patient_current_ward', 'idx_patient_is_active', 'idx_patient_name',  # idx_patient_ward_active_name
+        'idx_ward_ward_number',  # ward_number is unique
+    ],
+    'audit': [
+        'idx_auditlog_user_id',  # The audit log is never filtered by user
+    ],
+}
+
+# Migration scripts that add indexed columns missing from older databases, by (table, column)
+COLUMN_MIGRATIONS = {
+    ('care_note', 'note_hash'): 'migrate_care_note_hash.py',
+}
+
+class MigrationRequired(Exception):
+    """A declared index needs a column the database does not have yet"""
+
+def declared_tables(app):
+    """{bind: [Table]} of the models, for every bind of the app"""
+    tables = {}
+    for table in db.Model.metadata.sorted_tables:
+        tables.setdefault(table.info.get('bind_key'), []).append(table)
+    return {bind: tables.get(bind, []) for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or {})}
+
+def missing_index_columns(app):
+    """Lines naming each indexed column an existing table lacks, and the migration that adds it"""
+    missing = []
+    for bind, tables in declared_tables(app).items():
+        inspector = inspect(db.get_engine(app, bind))
+        existing_tables = set(inspector.get_table_names())
+        for table in tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            indexed = {column.name for index in table.indexes for column in index.columns}
+            for name in sorted(indexed - columns):
+                migration = COLUMN_MIGRATIONS.get((table.name, name), 'the migration that adds it')
+                missing.append(f"{table.name}.{name} is missing from the {bind or 'main'} database; "
+                               f"run python {migration} first")
+    return missing
+
+def apply_indexes(app):
+    """Create the declared indexes and drop the superseded ones in every bind's database
+
+    Returns {bind: (created index names, dropped index names)}. Raises
+    MigrationRequired, without changing any database, if an index needs a
+    column that a database does not have yet.
+    """
+    missing = missing_index_columns(app)
+    if missing:
+        raise MigrationRequired("; ".join(missing))
+
+    changes = {}
+    for bind, tables in declared_tables(app).items():
+        engine = db.get_engine(app, bind)
+        created, dropped = [], []
+        with engine.begin() as conn:
+            existing_tables = set(inspect(conn).get_table_names())
+            existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            for name in SUPERSEDED_INDEXES.get(bind, []):
+                if name in existing:
+                    conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+                    dropped.append(name)
+            for table in tables:
+                if table.name not in existing_tables:
+                    continue  # create_all() makes the table with its indexes
+                for index in sorted(table.indexes, key=lambda index: index.name):
+                    if index.name not in existing:
+                        index.create(bind=conn)
+                        created.append(index.name)
+            conn.exec_driver_sql(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+            conn.exec_driver_sql("ANALYZE main")  # Not the databases the main one attaches
+        for name in created:
+            logger.info(f"Created index {name} in the {bind or 'main'} database")
+        for name in dropped:
+            logger.info(f"Dropped superseded index {name} from the {bind or 'main'} database")
+        changes[bind] = (created, dropped)
+    return changes
@@ -0,0 +1,111 @@
+"""Checkpoint journal for ward PDF imports.
+
+Every import run records each ward PDF in ImportJournal: pending when the
+run starts, in_progress with the last committed patient after each batch
+of notes is written, and finally done or failed. ``--resume`` continues
+the most recent unfinished run: a file that was in progress restarts at
+the page after its last committed patient (found through the patient
+page index), and failed or pending files are imported again. The entries
+of a run are created in import order, so they double as its progress.
+"""
+from datetime import datetime
+
+from models import db, ImportJournal
+
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+FAILED = 'failed'
+
+# Import runs kept in the journal
+KEEP_RUNS = 20
+
+def latest_run_id():
+    """Return the run ID of the most recent import run, or None"""
+    entry = ImportJournal.query.order_by(ImportJournal.id.desc()).first()
+    return entry.run_id if entry else None
+
+def latest_unfinished_run_id():
+    """Return the run ID of the most recent run if it did not finish every file"""
+    run_id = latest_run_id()
+    if run_id and ImportJournal.query.filter(
+            ImportJournal.run_id == run_id, ImportJournal.status != DONE).first():
+        return run_id
+    return None
+
+def begin_import_run(pdf_files, content_hashes, resume=False):
+    """Start an import run for pdf_files, or continue the last unfinished one
+
+    content_hashes maps each file to the SHA-256 it is imported at. Returns
+    (run_id, resume_points) where resume_points maps a file to the
+    (patients_done, last_patient_id) it had committed, for files that were
+    in progress when the resumed run stopped and have not changed since.
+    """
+    run_id = latest_unfinished_run_id() if resume else None
+    entries = {}
+    if run_id:
+        entries = {entry.pdf_file: entry for entry in ImportJournal.query.filter_by(run_id=run_id)}
+    else:
+        run_id = datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')
+
+    resume_points = {}
+    for pdf_file in pdf_files:
+        entry = entries.get(pdf_file)
+        if (entry and entry.status == IN_PROGRESS and entry.last_patient_id
+                and entry.content_hash == content_hashes.get(pdf_file)):
+            resume_points[pdf_file] = (entry.patients_done, entry.last_patient_id)
+            continue
+        if not entry:
+            entry = ImportJournal(run_id=run_id, pdf_file=pdf_file)
+            db.session.add(entry)
+        entry.content_hash = content_hashes.get(pdf_file)
+        entry.status = PENDING
+        entry.patients_done = 0
+        entry.last_patient_id = None
+        entry.error = None
+    db.session.commit()
+
+    prune_import_runs()
+    return run_id, resume_points
+
+def checkpoint_ward(run_id, pdf_file, patients_done, last_patient_id):
+    """Record the last patient of a committed batch (commits)"""
+    ImportJournal.query.filter_by(run_id=run_id, pdf_file=pdf_file).update({
+        'status': IN_PROGRESS,
+        'patients_done': patients_done,
+        'last_patient_id': last_patient_id,
+        'updated_at': datetime.utcnow(),
+    })
+    db.session.commit()
+
+def finish_ward(run_id, pdf_file, error=None):
+    """Mark a file done, or failed with error (caller commits)"""
+    ImportJournal.query.filter_by(run_id=run_id, pdf_file=pdf_file).update({
+        'status': FAILED if error else DONE,
+        'error': error,
+        'updated_at': datetime.utcnow(),
+    })
+
+def unfinished_imports(run_id=None):
+    """Return the journal entries of a run (default: the latest) that did not finish"""
+    run_id = run_id or latest_run_id()
+    if not run_id:
+        return []
+    return ImportJournal.query.filter(
+        ImportJournal.run_id == run_id, ImportJournal.status != DONE
+    ).order_by(ImportJournal.pdf_file).all()
+
+def import_progress(run_id=None):
+    """Return the journal entries of a run (default: the latest) in import order"""
+    run_id = run_id or latest_run_id()
+    if not run_id:
+        return []
+    return ImportJournal.query.filter_by(run_id=run_id).order_by(ImportJournal.id).all()
+
+def prune_import_runs(keep=KEEP_RUNS):
+    """Delete the journal entries of all but the newest ``keep`` runs (commits)"""
+    run_ids = [row[0] for row in db.session.query(ImportJournal.run_id).distinct()
+               .order_by(ImportJournal.run_id.desc())]
+    if len(run_ids) > keep:
+        ImportJournal.query.filter(ImportJournal.run_id.in_(run_ids[keep:])).delete(synchronize_session=False)
+        db.session.commit()
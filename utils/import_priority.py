@@ -0,0 +1,61 @@
+"""Demand-based ordering of ward PDF imports.
+
+During a downtime event the wards that staff actually use should come
+online first. A ward's demand is the number of users whose default ward it
+is (weighted, since each of them lands on it straight after login) plus
+the number of times it was opened in the last DEMAND_WINDOW_DAYS days
+according to the 'view_ward' entries of the audit log. Wards without
+demand keep their usual (sorted) order after the busy ones.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from models import db, AuditLog, User
+from utils.ward_pdf_parser import ward_number_for
+
+logger = logging.getLogger(__name__)
+
+# Days of audit log taken into account
+DEMAND_WINDOW_DAYS = 14
+
+# Ward views a user's default ward counts as
+DEFAULT_WARD_WEIGHT = 20
+
+def ward_demand(window_days=DEMAND_WINDOW_DAYS):
+    """Map ward number -> demand score from default wards and recent ward views
+
+    Returns an empty dict if the users or audit tables cannot be read
+    (e.g. on a fresh deployment), which leaves the import order unchanged.
+    """
+    demand = {}
+    try:
+        for ward_number, users in db.session.query(User.default_ward, db.func.count(User.id)).filter(
+                User.default_ward.isnot(None)).group_by(User.default_ward):
+            demand[ward_number] = demand.get(ward_number, 0) + users * DEFAULT_WARD_WEIGHT
+
+        # view_ward entries record the ward as 'Ward <number>' in patient_id
+        since = datetime.utcnow() - timedelta(days=window_days)
+        for target, views in db.session.query(AuditLog.patient_id, db.func.count(AuditLog.id)).filter(
+                AuditLog.action == 'view_ward',
+                AuditLog.patient_id.like('Ward %'),
+                AuditLog.timestamp >= since).group_by(AuditLog.patient_id):
+            ward_number = target[len('Ward '):]
+            demand[ward_number] = demand.get(ward_number, 0) + views
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Could not read ward demand, importing in file order: {str(e)}")
+        return {}
+    return demand
+
+def prioritize_pdfs(pdf_files, demand=None):
+    """Return pdf_files ordered by the demand for their wards, busiest first
+
+    Ties (including wards without demand) keep their order in pdf_files.
+    """
+    demand = ward_demand() if demand is None else demand
+    ordered = sorted(pdf_files, key=lambda pdf_file: -demand.get(ward_number_for(pdf_file), 0))
+    if demand and ordered:
+        logger.info("Import order by demand: " + ", ".join(
+            f"{ward_number_for(pdf_file)} ({demand.get(ward_number_for(pdf_file), 0)})" for pdf_file in ordered[:10])
+            + (", ..." if len(ordered) > 10 else ""))
+    return ordered
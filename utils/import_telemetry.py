@@ -0,0 +1,162 @@
+"""Per-stage timings and throughput of a ward PDF import.
+
+Each ward gets a stats dict that the parser and the database writer fill in:
+
+    pages, patients, unchanged_patients, notes, notes_inserted,
+    cache_hits, cache_misses, transferred, readmitted, discharged,
+    and seconds spent per stage in
+    open (hashing and opening the PDF), extract_text (page text from the
+    cache or PyPDF2), parse (header and care note parsing) and db (writes).
+
+Stats from parser workers are merged back into the importing process.
+ImportTelemetry collects the wards of one run into a JSON report and a
+one-screen summary. Free of app/database imports so workers can use it.
+"""
+import json
+import os
+import platform
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+STAGES = ('open', 'extract_text', 'parse', 'db')
+
+COUNTERS = ('pages', 'patients', 'unchanged_patients', 'notes', 'notes_inserted', 'cache_hits', 'cache_misses',
+            'transferred', 'readmitted', 'discharged')
+
+# Wards listed individually in the summary; the rest are folded into one line
+SUMMARY_WARDS = 15
+
+def new_stats():
+    """Return an empty stats dict for one ward"""
+    stats = {counter: 0 for counter in COUNTERS}
+    stats['seconds'] = {stage: 0.0 for stage in STAGES}
+    return stats
+
+def merge_stats(into, stats):
+    """Add the counters and stage seconds of stats to into"""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            merge_stats(into.setdefault(key, {}), value)
+        else:
+            into[key] = into.get(key, 0) + value
+    return into
+
+@contextmanager
+def timed(stats, stage):
+    """Add the time spent in the enclosed block to a stage (no-op without stats)"""
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats['seconds'][stage] += time.perf_counter() - started
+
+def rates(stats, seconds):
+    """Pages, patients and notes per second over seconds"""
+    return {
+        'pages_per_second': round(stats['pages'] / seconds, 1) if seconds else None,
+        'patients_per_second': round(stats['patients'] / seconds, 1) if seconds else None,
+        'notes_per_second': round(stats['notes'] / seconds, 1) if seconds else None,
+    }
+
+class ImportTelemetry:
+    """Stats of every ward in one import run"""
+
+    def __init__(self, jobs=1):
+        self.jobs = jobs
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.wall_seconds = None
+        self.wards = {}  # pdf_file -> stats
+        self.status = {}  # pdf_file -> imported, failed
+        self.unchanged_files = []
+        self.extra = {}
+
+    def ward_stats(self, pdf_file):
+        """Return the stats dict of a ward, creating it on first use"""
+        if pdf_file not in self.wards:
+            self.wards[pdf_file] = new_stats()
+        return self.wards[pdf_file]
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self.started
+
+    def report(self):
+        """The run as a JSON-serialisable dict"""
+        wall_seconds = self.wall_seconds if self.wall_seconds is not None else time.perf_counter() - self.started
+        totals = new_stats()
+        wards = []
+        for pdf_file, stats in self.wards.items():
+            merge_stats(totals, stats)
+            busy = sum(stats['seconds'].values())
+            wards.append(dict(
+                pdf_file=pdf_file,
+                status=self.status.get(pdf_file, 'unknown'),
+                busy_seconds=round(busy, 3),
+                **{key: value for key, value in stats.items() if key != 'seconds'},
+                seconds={stage: round(value, 3) for stage, value in stats['seconds'].items()},
+                **rates(stats, busy)
+            ))
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall_seconds': round(wall_seconds, 3),
+            'jobs': self.jobs,
+            'python': platform.python_version(),
+            **self.extra,
+            'files': {
+                'imported': sum(1 for status in self.status.values() if status == 'imported'),
+                'failed': sum(1 for status in self.status.values() if status == 'failed'),
+                'unchanged': len(self.unchanged_files),
+            },
+            'totals': dict(
+                {key: value for key, value in totals.items() if key != 'seconds'},
+                seconds={stage: round(value, 3) for stage, value in totals['seconds'].items()},
+                **rates(totals, wall_seconds)
+            ),
+            'wards': wards,
+        }
+
+    def write_json(self, path):
+        """Write the report to path, creating its directory"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def summary(self):
+        """The report as a one-screen text table"""
+        report = self.report()
+        totals = report['totals']
+        files = report['files']
+        lines = [
+            f"Imported {files['imported']} ward PDF(s), {files['unchanged']} unchanged, {files['failed']} failed "
+            f"in {report['wall_seconds']:.1f}s with {report['jobs']} worker(s)",
+            f"{'ward PDF':<28}{'pages':>7}{'patients':>10}{'notes':>8}{'seconds':>9}{'pages/s':>9}{'notes/s':>9}  status",
+        ]
+        wards = sorted(report['wards'], key=lambda ward: ward['busy_seconds'], reverse=True)
+        for ward in wards[:SUMMARY_WARDS]:
+            lines.append(
+                f"{os.path.basename(ward['pdf_file'])[:27]:<28}{ward['pages']:>7}{ward['patients']:>10}{ward['notes']:>8}"
+                f"{ward['busy_seconds']:>9.2f}{ward['pages_per_second'] or 0:>9.0f}{ward['notes_per_second'] or 0:>9.0f}"
+                f"  {ward['status']}"
+            )
+        if len(wards) > SUMMARY_WARDS:
+            lines.append(f"... {len(wards) - SUMMARY_WARDS} more ward(s), see the JSON report")
+
+        busy = sum(totals['seconds'].values()) or 1
+        lines.append("Time by stage: " + ", ".join(
+            f"{stage} {seconds:.2f}s ({seconds / busy:.0%})" for stage, seconds in totals['seconds'].items()))
+        lines.append(
+            f"Throughput: {totals['pages_per_second'] or 0:.0f} pages/s, {totals['patients_per_second'] or 0:.1f} patients/s, "
+            f"{totals['notes_per_second'] or 0:.0f} notes/s ({totals['notes_inserted']} new notes, "
+            f"{totals['cache_hits']} of {totals['cache_hits'] + totals['cache_misses']} pages from the text cache)"
+        )
+        if totals['transferred'] or totals['readmitted'] or totals['discharged']:
+            lines.append(f"Roster changes: {totals['transferred']} transferred, {totals['readmitted']} readmitted, "
+                         f"{totals['discharged']} discharged")
+        return "\n".join(lines)
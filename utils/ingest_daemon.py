@@ -0,0 +1,260 @@
+"""Hot-folder ingestion of ward PDFs.
+
+Polls the PDF directory for new or replaced ward_*_records.pdf files and
+imports each one once it has stopped being written to, i.e. its size and
+modification time have not changed for ``settle`` seconds. Files whose
+content matches the last import are skipped by the manifest check in
+utils.ward_import, so restarting the watcher does not re-import anything.
+A file that fails to import is not retried until it changes again.
+
+Runs either as its own process (ingest_daemon.py) or as a background
+thread of the web app (INGEST_DAEMON=1). Either way a lock file
+(Config.INGEST_LOCK_PATH) keeps it to one watcher on the machine, however
+many processes serve the app.
+
+The web app also imports on demand: OnDemandImporter imports a ward PDF
+that has never been ingested in a background thread as soon as a page
+needs it, so the app can serve straight after a cold start.
+"""
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # No flock on Windows: one watcher per process
+    fcntl = None
+
+from models import db
+from utils.bulk_import import DEFAULT_WRITE_BUDGET_MS
+from utils.parallel_import import DEFAULT_PDF_TIMEOUT
+from utils.pdf_manifest import ensure_manifest_table, imported_pdf_names
+from utils.ward_import import import_ward_pdfs
+from utils.ward_pdf_parser import list_ward_pdfs
+
+logger = logging.getLogger(__name__)
+
+# Seconds between scans of the PDF directory
+DEFAULT_POLL_INTERVAL = 5
+
+# Seconds a file's size and mtime must stay the same before it is imported
+DEFAULT_SETTLE_SECONDS = 10
+
+_ingest_thread = None
+_watcher_lock = None
+
+# Serialises the imports started by this process (hot folder and on demand)
+import_lock = threading.Lock()
+
+def file_signature(path):
+    """Return (size, mtime_ns) of path, or None if it cannot be read"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+class HotFolderWatcher:
+    """Tracks the ward PDFs in a directory and reports the ones ready to import"""
+
+    def __init__(self, directory, settle=DEFAULT_SETTLE_SECONDS):
+        self.directory = directory
+        self.settle = settle
+        self.observed = {}  # path -> (signature, monotonic time it was first seen)
+        self.handled = {}  # path -> signature at its last import attempt
+
+    def poll(self, now=None):
+        """Return the files that are new or replaced and have settled, sorted"""
+        now = time.monotonic() if now is None else now
+        try:
+            pdf_files = list_ward_pdfs(self.directory)
+        except OSError as e:
+            logger.error(f"Cannot list {self.directory}: {str(e)}")
+            return []
+
+        ready = []
+        for pdf_file in pdf_files:
+            signature = file_signature(pdf_file)
+            if signature is None or signature[0] == 0 or self.handled.get(pdf_file) == signature:
+                self.observed.pop(pdf_file, None)
+                continue
+            previous = self.observed.get(pdf_file)
+            if previous is None or previous[0] != signature:
+                # Still being written (or just appeared); restart its settle clock
+                self.observed[pdf_file] = (signature, now)
+            elif now - previous[1] >= self.settle:
+                ready.append(pdf_file)
+
+        # Forget files that were removed so a later copy counts as new
+        for pdf_file in set(self.observed) | set(self.handled):
+            if pdf_file not in pdf_files:
+                self.observed.pop(pdf_file, None)
+                self.handled.pop(pdf_file, None)
+        return ready
+
+    def mark_handled(self, pdf_files):
+        """Remember the current version of pdf_files as imported (or failed)"""
+        for pdf_file in pdf_files:
+            signature, _ = self.observed.pop(pdf_file, (file_signature(pdf_file), None))
+            self.handled[pdf_file] = signature
+
+def ingest_ready_files(app, watcher, jobs=1, timeout=DEFAULT_PDF_TIMEOUT, write_budget_ms=DEFAULT_WRITE_BUDGET_MS):
+    """Import the files the watcher reports as ready; returns (imported, failed)
+
+    Writes are throttled to ``write_budget_ms`` per transaction (0 = off)
+    so the running app's own writes are not held up.
+    """
+    ready = watcher.poll()
+    if not ready:
+        return [], []
+    logger.info(f"Ingesting {len(ready)} ward PDF(s): {', '.join(ready)}")
+    with app.app_context():
+        try:
+            with import_lock:
+                ensure_manifest_table(db.get_engine(app, bind='pdf_parsed'))
+                imported, _, failed = import_ward_pdfs(ready, jobs, timeout, write_budget_ms=write_budget_ms)
+        except Exception as e:
+            logger.error(f"Ingestion of {', '.join(ready)} failed: {str(e)}")
+            db.session.rollback()
+            imported, failed = [], ready
+        finally:
+            db.session.remove()
+    watcher.mark_handled(ready)
+    return imported, failed
+
+def run_ingest_loop(app, directory, interval=DEFAULT_POLL_INTERVAL, settle=DEFAULT_SETTLE_SECONDS,
+                    jobs=1, timeout=DEFAULT_PDF_TIMEOUT, stop_event=None, once=False,
+                    write_budget_ms=DEFAULT_WRITE_BUDGET_MS):
+    """Watch directory and import ward PDFs as they arrive, until stop_event is set
+
+    With ``once`` every ward PDF present is imported (settle time aside) and
+    the loop returns, which suits a cron job.
+    """
+    watcher = HotFolderWatcher(directory, settle)
+    logger.info(f"Watching {os.path.abspath(directory)} for ward PDFs "
+                f"(every {interval}s, settle {settle}s)")
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        ingest_ready_files(app, watcher, jobs, timeout, write_budget_ms)
+        if once and not watcher.observed:
+            return
+        stop_event.wait(min(interval, settle) if watcher.observed else interval)
+
+def claim_watcher_lock(path):
+    """Hold an exclusive lock on path for the life of this process; False if another process holds it"""
+    global _watcher_lock
+    if _watcher_lock is not None or fcntl is None:
+        return True
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _watcher_lock = lock_file
+    return True
+
+def start_ingest_thread(app, directory, interval=DEFAULT_POLL_INTERVAL, settle=DEFAULT_SETTLE_SECONDS,
+                        jobs=1, timeout=DEFAULT_PDF_TIMEOUT, write_budget_ms=DEFAULT_WRITE_BUDGET_MS,
+                        lock_path=None):
+    """Run the ingest loop in a daemon thread of this process (started once)
+
+    With ``lock_path`` the thread is only started if no other process holds
+    that watcher lock; returns None otherwise. The per-file ``timeout`` is
+    only enforced when jobs > 1, since the parse alarm cannot be armed
+    outside the main thread.
+    """
+    global _ingest_thread
+    if lock_path and not claim_watcher_lock(lock_path):
+        logger.info(f"Another process is watching {os.path.abspath(directory)}; not starting a watcher")
+        return None
+    if _ingest_thread is None or not _ingest_thread.is_alive():
+        _ingest_thread = threading.Thread(
+            target=run_ingest_loop,
+            args=(app, directory, interval, settle, jobs, timeout),
+            kwargs={'write_budget_ms': write_budget_ms},
+            name='ward-pdf-ingest',
+            daemon=True
+        )
+        _ingest_thread.start()
+    return _ingest_thread
+
+def pending_ward_pdfs(pdf_files):
+    """Return the pdf_files that exist but whose notes were never imported (needs an app context)"""
+    try:
+        imported = imported_pdf_names()
+    except Exception:
+        # No import has created the manifest yet
+        db.session.rollback()
+        imported = set()
+    return [pdf_file for pdf_file in pdf_files
+            if os.path.isfile(pdf_file) and os.path.basename(pdf_file) not in imported]
+
+class OnDemandImporter:
+    """Imports ward PDFs in a background thread when a page needs them
+
+    Requests for files that are already queued are merged, so many users
+    polling a loading page start a single import. A file that fails is not
+    queued again until it changes.
+    """
+
+    def __init__(self, app, jobs=1, timeout=DEFAULT_PDF_TIMEOUT, write_budget_ms=DEFAULT_WRITE_BUDGET_MS):
+        self.app = app
+        self.jobs = jobs
+        self.timeout = timeout
+        self.write_budget_ms = write_budget_ms
+        self.queued = []  # files waiting for or in the current import
+        self.failed = {}  # path -> signature of the version that failed
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def is_loading(self):
+        """True while any ward PDF is queued or being imported"""
+        return bool(self.queued)
+
+    def is_queued(self, pdf_files):
+        """True if any of pdf_files is queued or being imported"""
+        with self._lock:
+            return any(pdf_file in self.queued for pdf_file in pdf_files)
+
+    def request(self, pdf_files):
+        """Queue pdf_files for import; returns those that are now queued (not failed)"""
+        with self._lock:
+            for pdf_file in pdf_files:
+                if pdf_file in self.queued:
+                    continue
+                if pdf_file in self.failed and self.failed[pdf_file] == file_signature(pdf_file):
+                    continue
+                self.failed.pop(pdf_file, None)
+                self.queued.append(pdf_file)
+            if self.queued and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ward-pdf-on-demand', daemon=True)
+                self._thread.start()
+            return [pdf_file for pdf_file in pdf_files if pdf_file in self.queued]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                batch = list(self.queued)
+                if not batch:
+                    self._thread = None
+                    return
+            logger.info(f"Importing {len(batch)} ward PDF(s) on demand: {', '.join(batch)}")
+            with self.app.app_context():
+                try:
+                    with import_lock:
+                        ensure_manifest_table(db.get_engine(self.app, bind='pdf_parsed'))
+                        _, _, failed = import_ward_pdfs(batch, self.jobs, self.timeout,
+                                                        write_budget_ms=self.write_budget_ms)
+                except Exception as e:
+                    logger.error(f"On-demand import of {', '.join(batch)} failed: {str(e)}")
+                    db.session.rollback()
+                    failed = batch
+                finally:
+                    db.session.remove()
+            with self._lock:
+                for pdf_file in failed:
+                    self.failed[pdf_file] = file_signature(pdf_file)
+                self.queued = [pdf_file for pdf_file in self.queued if pdf_file not in batch]
@@ -4,12 +4,13 @@ import os
 
 def setup_logger(app):
     # Ensure logs directory exists
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
+    log_dir = app.config.get('LOG_DIR', 'logs')
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
 
     # Configure file handler
     file_handler = RotatingFileHandler(
-        'logs/app.log',
+        os.path.join(log_dir, 'app.log'),
         maxBytes=1024 * 1024,  # 1MB
         backupCount=10
     )
@@ -0,0 +1,218 @@
+"""Persistent on-disk cache of text extracted from ward PDF pages.
+
+Text extraction dominates import time, and the same files are read
+by initialize_database, reset_and_initialize, deployment_initialize and the
+migration scripts. Page text is stored zlib-compressed in a small SQLite
+file keyed by (file hash, page index, extractor version), so a re-run or a
+verification pass never decodes a page twice. Pages are extracted by the
+configured extractor (see utils/text_extractors.py). When the cache grows past
+Config.PAGE_TEXT_CACHE_MAX_MB the least recently used pages are evicted.
+
+Workers in the import process pool share the same cache file.
+"""
+import hashlib
+import sqlite3
+import time
+import zlib
+
+from PyPDF2 import PdfReader
+
+from config import Config
+from utils.text_extractors import get_extractor
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Evict down to this fraction of the size limit so eviction does not run on every write
+EVICT_TO_FRACTION = 0.9
+
+# Newly extracted pages (or compressed bytes of them) held before they are written to the cache
+FLUSH_PAGES = 64
+FLUSH_BYTES = 4 * 1024 * 1024
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def connect_cache(path=None):
+    """Open the cache database, creating its tables on first use"""
+    conn = sqlite3.connect(path or Config.PAGE_TEXT_CACHE_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")  # Pool workers read and write concurrently
+    conn.execute("""CREATE TABLE IF NOT EXISTS page_text (
+        file_hash TEXT NOT NULL,
+        page_index INTEGER NOT NULL,
+        extractor_version TEXT NOT NULL,
+        text_zlib BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        last_used REAL NOT NULL,
+        PRIMARY KEY (file_hash, page_index, extractor_version)
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS page_count (
+        file_hash TEXT NOT NULL,
+        extractor_version TEXT NOT NULL,
+        pages INTEGER NOT NULL,
+        PRIMARY KEY (file_hash, extractor_version)
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_page_text_last_used ON page_text (last_used)")
+    return conn
+
+def evict_page_texts(conn, max_bytes):
+    """Delete least recently used pages until the cache is under max_bytes"""
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM page_text").fetchone()[0]
+    if total <= max_bytes:
+        return 0
+    target = total - int(max_bytes * EVICT_TO_FRACTION)
+    freed = 0
+    doomed = []
+    for rowid, size in conn.execute("SELECT rowid, size FROM page_text ORDER BY last_used"):
+        if freed >= target:
+            break
+        doomed.append((rowid,))
+        freed += size
+    conn.executemany("DELETE FROM page_text WHERE rowid = ?", doomed)
+    return len(doomed)
+
+class CachedPageTexts:
+    """Page texts of one PDF, read from the cache and extracted on a miss
+
+    Use as a context manager, or call close(), so new pages are written back:
+
+        with CachedPageTexts(pdf_path) as pages:
+            for page_idx in range(len(pages)):
+                text = pages[page_idx]
+
+    New pages are written back every FLUSH_PAGES pages or FLUSH_BYTES, so a
+    large ward's text is not held in memory until the end.
+    The PDF itself is only opened if a page (or the page count) is missing.
+    Time spent hashing and opening the PDF (open_seconds) and reading page
+    text (extract_seconds) is tallied for the import telemetry. ``extractor``
+    defaults to the one named by Config.PDF_TEXT_EXTRACTOR.
+    """
+
+    def __init__(self, pdf_path, cache_path=None, max_mb=None, extractor=None):
+        started = time.perf_counter()
+        self.pdf_path = pdf_path
+        self.extractor = extractor or get_extractor()
+        self.extractor_version = self.extractor.version
+        self.file_hash = hash_file(pdf_path)
+        self.max_bytes = int((Config.PAGE_TEXT_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self._reader = None
+        self._page_count = None
+        self._pending = []
+        self._pending_bytes = 0
+        self._hits = []
+        self._written = False
+        self._conn = None
+        self.hit_count = 0
+        self.miss_count = 0
+        self.extract_seconds = 0.0
+        if self.max_bytes > 0:
+            try:
+                self._conn = connect_cache(cache_path)
+            except sqlite3.Error:
+                pass  # An unusable cache only costs speed; extract directly
+        self.open_seconds = time.perf_counter() - started
+
+    @property
+    def reader(self):
+        """The PdfReader, opened on first use"""
+        if self._reader is None:
+            started = time.perf_counter()
+            self._reader = PdfReader(self.pdf_path)
+            self.open_seconds += time.perf_counter() - started
+        return self._reader
+
+    def __len__(self):
+        if self._page_count is None:
+            row = None
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT pages FROM page_count WHERE file_hash = ? AND extractor_version = ?",
+                    (self.file_hash, self.extractor_version)
+                ).fetchone()
+            if row:
+                self._page_count = row[0]
+            else:
+                self._page_count = len(self.reader.pages)
+                if self._conn is not None:
+                    with self._conn:  # Commit now so concurrent workers are not blocked
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO page_count (file_hash, extractor_version, pages) VALUES (?, ?, ?)",
+                            (self.file_hash, self.extractor_version, self._page_count)
+                        )
+        return self._page_count
+
+    def __getitem__(self, page_idx):
+        started = time.perf_counter()
+        opened = self.open_seconds
+        try:
+            return self._page_text(page_idx)
+        finally:
+            # Opening the PDF on a first miss counts as open, not extraction
+            self.extract_seconds += time.perf_counter() - started - (self.open_seconds - opened)
+
+    def _page_text(self, page_idx):
+        if self._conn is not None:
+            row = self._conn.execute(
+                "SELECT text_zlib FROM page_text WHERE file_hash = ? AND page_index = ? AND extractor_version = ?",
+                (self.file_hash, page_idx, self.extractor_version)
+            ).fetchone()
+            if row:
+                self.hit_count += 1
+                self._hits.append((time.time(), self.file_hash, page_idx, self.extractor_version))
+                return zlib.decompress(row[0]).decode('utf-8')
+
+        self.miss_count += 1
+        text = self.extractor.page_text(self.reader, page_idx)
+        if self._conn is not None:
+            blob = zlib.compress(text.encode('utf-8'))
+            self._pending.append((self.file_hash, page_idx, self.extractor_version, blob, len(blob), time.time()))
+            self._pending_bytes += len(blob)
+            if len(self._pending) >= FLUSH_PAGES or self._pending_bytes >= FLUSH_BYTES:
+                self.flush()
+        return text
+
+    def flush(self):
+        """Write the pages extracted and used since the last flush to the cache"""
+        if self._conn is None or not (self._pending or self._hits):
+            return
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO page_text "
+                    "(file_hash, page_index, extractor_version, text_zlib, size, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                    self._pending
+                )
+                self._conn.executemany(
+                    "UPDATE page_text SET last_used = ? WHERE file_hash = ? AND page_index = ? AND extractor_version = ?",
+                    self._hits
+                )
+            self._written = self._written or bool(self._pending)
+        except sqlite3.Error:
+            pass  # Losing cache writes only costs speed on the next run
+        finally:
+            self._pending, self._hits, self._pending_bytes = [], [], 0
+
+    def close(self):
+        """Write newly extracted pages back to the cache and apply the size limit"""
+        if self._conn is None:
+            return
+        try:
+            self.flush()
+            if self._written:
+                with self._conn:
+                    evict_page_texts(self._conn, self.max_bytes)
+        except sqlite3.Error:
+            pass  # Losing cache writes only costs speed on the next run
+        finally:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
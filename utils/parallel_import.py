@@ -0,0 +1,278 @@
+"""Process pool helpers for parsing ward PDFs in parallel.
+
+Deliberately free of app/database imports: worker processes only parse,
+and the importing script remains the single writer to the databases.
+
+A parser is a module-level generator function taking a PDF path (plus
+optional per-file keyword arguments) and yielding (patient_id,
+patient_record) pairs. Parsers must also accept ``page_range=(first, last)``
+and parse only those pages: large files are split into shards on patient
+boundaries so a single big ward is parsed by several workers.
+"""
+import argparse
+import itertools
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import Manager
+from queue import Empty
+
+from utils.import_telemetry import merge_stats, new_stats
+from utils.pdf_outline import plan_page_shards
+
+# Seconds a single ward PDF may spend in the parser before it is abandoned
+DEFAULT_PDF_TIMEOUT = 300
+
+# Patients a pool worker may parse ahead of the writer, per shard; a typical
+# shard fits, so workers only wait for the writer on very large wards
+STREAM_QUEUE_SIZE = 32
+
+# Shards per worker submitted ahead of the one the writer is reading
+SHARD_WINDOW = 2
+
+# Seconds between checks that a pool worker streaming records is still alive
+WORKER_POLL_INTERVAL = 1
+
+class PdfParseTimeout(BaseException):
+    """Raised inside a parser worker when a PDF exceeds its time budget.
+
+    Derives from BaseException so the parsers' blanket ``except Exception``
+    handlers cannot swallow it and report the file as an empty ward.
+    """
+
+class PdfParseError(Exception):
+    """A ward PDF could not be parsed (raised to consumers of a streamed parse)"""
+
+def _raise_parse_timeout(signum, frame):
+    raise PdfParseTimeout()
+
+@contextmanager
+def parse_time_limit(seconds):
+    """Raise PdfParseTimeout if the enclosed block runs longer than ``seconds``
+
+    Only enforced on platforms with SIGALRM, and only in the main thread
+    since signal handlers cannot be installed anywhere else.
+    """
+    if (not seconds or not hasattr(signal, 'SIGALRM')
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+    if seconds <= 0:
+        raise PdfParseTimeout()
+    previous_handler = signal.signal(signal.SIGALRM, _raise_parse_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+def stream_ward_pdf(pdf_path, parser, timeout=DEFAULT_PDF_TIMEOUT, parser_kwargs=None):
+    """Yield a ward's patient records lazily, charging only parse time to ``timeout``
+
+    The alarm is re-armed around each step of the parser, so time the caller
+    spends writing a patient to the database does not count against the file.
+    A timeout surfaces as PdfParseError so the writer can roll back cleanly.
+    """
+    remaining = timeout
+    records = iter(parser(pdf_path, **(parser_kwargs or {})))
+    while True:
+        started = time.monotonic()
+        try:
+            with parse_time_limit(remaining):
+                record = next(records)
+        except StopIteration:
+            return
+        except PdfParseTimeout:
+            records.close()
+            raise PdfParseError(f"timed out after {timeout}s")
+        if remaining:
+            remaining -= time.monotonic() - started
+        yield record
+
+def stream_ward_shard(pdf_path, parser, timeout, parser_kwargs, queue, stop):
+    """Process pool entry point: put each patient record of a ward PDF (shard) on queue as it is parsed
+
+    Puts ('record', (patient_id, patient_record)) per patient and finally
+    ('done', error, stats). queue is bounded, so the worker waits for the
+    writer instead of piling up the ward; only parse time counts against
+    ``timeout``. Returns early once the ``stop`` event is set.
+    """
+    parser_kwargs = parser_kwargs or {}
+    error = None
+    try:
+        records = stream_ward_pdf(pdf_path, parser, timeout, parser_kwargs)
+        for record in records:
+            if stop.is_set():  # The caller stopped reading
+                records.close()
+                return
+            queue.put(('record', record))
+    except Exception as e:
+        error = str(e)
+    queue.put(('done', error, parser_kwargs.get('stats')))
+
+def receive_shard_records(queue, future, stats=None):
+    """Yield the records a stream_ward_shard worker puts on queue, raising PdfParseError if the shard failed"""
+    while True:
+        try:
+            message = queue.get(timeout=WORKER_POLL_INTERVAL)
+        except Empty:
+            if not future.done():
+                continue
+            try:
+                message = queue.get_nowait()  # Sent just before the worker returned
+            except Empty:
+                # A worker that died outright (e.g. killed by the OOM killer)
+                raise PdfParseError(str(future.exception() or "parser worker exited")) from None
+        if message[0] == 'record':
+            yield message[1]
+            continue
+        _, error, shard_stats = message
+        if shard_stats and stats is not None:
+            merge_stats(stats, shard_stats)
+        if error:
+            raise PdfParseError(error)
+        return
+
+def receive_ward_records(file_shards, stats=None):
+    """Yield the records of a ward's (queue, future) shards in page order
+
+    Every shard is read to the end even after one fails, so no worker is
+    left waiting on a full queue; the first error is raised at the end.
+    """
+    error = None
+    for queue, future in file_shards:
+        try:
+            for record in receive_shard_records(queue, future, stats):
+                if error is None:
+                    yield record
+        except PdfParseError as e:
+            error = error or e
+    if error:
+        raise error
+
+def plan_ward_shards(pdf_file, jobs):
+    """Return the page ranges to parse pdf_file in, or [None] to parse it whole"""
+    try:
+        ranges = plan_page_shards(pdf_file, jobs)
+    except Exception:
+        return [None]  # Let the worker report why the file cannot be read
+    return ranges if len(ranges) > 1 else [None]
+
+def iter_parsed_ward_pdfs(pdf_files, parser, jobs=1, timeout=DEFAULT_PDF_TIMEOUT, parser_args=None):
+    """Yield (pdf_path, patient_records, error) for each ward PDF, in the order given.
+
+    patient_records is a lazy stream of (patient_id, patient_record) pairs;
+    it raises PdfParseError if the file fails after some patients were
+    yielded, while a file that fails before its first patient is yielded
+    with patient_records None and the error. With jobs > 1 the files are
+    parsed concurrently in a process pool: large files are split into
+    page-range shards on patient boundaries, each shard gets its own
+    ``timeout``, and the workers stream patients back over queues of
+    STREAM_QUEUE_SIZE patients, which the caller reads in page order. Only
+    SHARD_WINDOW shards per worker are in flight at a time, so at most about
+    jobs * SHARD_WINDOW * STREAM_QUEUE_SIZE patients wait in memory rather
+    than whole wards; a worker only waits for the writer when its shard
+    outgrows its queue. Either way the caller is the single DB writer.
+    ``parser_args`` optionally maps a PDF path to extra keyword arguments
+    for the parser call on that file; a file given its own
+    ``page_range`` there is parsed as a single shard. A ``stats`` dict there
+    receives the telemetry of every shard of the file, even when the shards
+    are parsed in other processes.
+    """
+    parser_args = parser_args or {}
+    if jobs <= 1:
+        for pdf_file in pdf_files:
+            yield pdf_file, stream_ward_pdf(pdf_file, parser, timeout, parser_args.get(pdf_file)), None
+        return
+
+    def shard_tasks():
+        for pdf_file in pdf_files:
+            if 'page_range' in (parser_args.get(pdf_file) or {}):
+                ranges = [None]  # Keep the caller's range, e.g. a resumed import
+            else:
+                ranges = plan_ward_shards(pdf_file, jobs)
+            for page_range in ranges:
+                kwargs = dict(parser_args.get(pdf_file) or {})
+                if page_range:
+                    kwargs['page_range'] = page_range
+                if 'stats' in kwargs:
+                    kwargs['stats'] = new_stats()  # Merged into the caller's dict when the shard finishes
+                yield pdf_file, kwargs
+
+    tasks = shard_tasks()
+    pending = deque()  # (pdf_file, queue, future) of the shards in flight, in submission order
+
+    with Manager() as manager, ProcessPoolExecutor(max_workers=jobs) as pool:
+        stop = manager.Event()
+
+        def submit_shards():
+            while len(pending) < jobs * SHARD_WINDOW:
+                pdf_file, kwargs = next(tasks, (None, None))
+                if pdf_file is None:
+                    return
+                queue = manager.Queue(STREAM_QUEUE_SIZE)
+                future = pool.submit(stream_ward_shard, pdf_file, parser, timeout, kwargs, queue, stop)
+                pending.append((pdf_file, queue, future))
+
+        def ward_shards(pdf_file):
+            """(queue, future) of each shard of pdf_file, submitting more shards as they are taken"""
+            while True:
+                submit_shards()
+                if not pending or pending[0][0] != pdf_file:
+                    return
+                yield pending[0][1:]
+                pending.popleft()  # Only once read, so an abandoned shard is still drained below
+
+        try:
+            # Read the shards in submission order: the pool starts them in that
+            # order, so the one being read always has a worker, while the
+            # shards submitted after it parse into their own queues
+            for pdf_file in pdf_files:
+                stats = (parser_args.get(pdf_file) or {}).get('stats')
+                records = receive_ward_records(ward_shards(pdf_file), stats)
+                try:
+                    first = next(records)
+                except StopIteration:
+                    yield pdf_file, iter(()), None
+                except PdfParseError as e:
+                    yield pdf_file, None, str(e)
+                else:
+                    yield pdf_file, itertools.chain([first], records), None
+                try:
+                    for _ in records:
+                        pass  # Drain what the caller did not read, freeing the workers
+                except PdfParseError:
+                    pass
+        finally:
+            # If the caller stopped early, stop the workers still parsing,
+            # taking records off their queues so none is left waiting on a full one
+            stop.set()
+            for _, queue, future in pending:
+                future.cancel()
+                while not future.done():
+                    try:
+                        queue.get(timeout=WORKER_POLL_INTERVAL)
+                    except Empty:
+                        pass
+
+def resolve_jobs(jobs):
+    """Translate a --jobs value into a worker count (0 means one per CPU core)"""
+    if jobs is None or jobs < 0:
+        return 1
+    if jobs == 0:
+        return os.cpu_count() or 1
+    return jobs
+
+def build_arg_parser(description):
+    """Command line options shared by the ward PDF import scripts"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='number of processes used to parse ward PDFs (0 = one per CPU core)')
+    parser.add_argument('--timeout', type=int, default=DEFAULT_PDF_TIMEOUT,
+                        help='seconds allowed to parse a single PDF before it is skipped')
+    return parser
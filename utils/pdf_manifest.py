@@ -0,0 +1,124 @@
+"""Fingerprint manifest for ward PDFs.
+
+Each successfully imported file is recorded in WardPdfManifest with its
+size, mtime and SHA-256. On the next run a file whose size and mtime are
+unchanged is skipped without being read; if only the mtime moved (e.g. the
+EPR re-exported identical content) the hash decides.
+
+Each entry also records the scope of the import: FULL_IMPORT (patients and
+care notes, utils/ward_import.py) or PATIENTS_ONLY (deployment_initialize.py).
+A patients-only entry never lets a full import skip the file, so its notes
+are still imported.
+
+The patient page index read from each file's outline is kept in
+PatientPageIndex and tagged with the same content hash, so a single-patient
+lookup reuses it until the file changes.
+"""
+import os
+from datetime import datetime
+
+from sqlalchemy import inspect
+
+from models import db, ImportJournal, PatientMovement, PatientPageIndex, WardPdfManifest
+from utils.page_text_cache import hash_file
+from utils.pdf_outline import read_patient_page_index
+
+FULL_IMPORT = 'full'
+PATIENTS_ONLY = 'patients'
+
+def ensure_manifest_table(engine):
+    """Create the manifest tables in the pdf_parsed database if they are missing"""
+    WardPdfManifest.__table__.create(bind=engine, checkfirst=True)
+    PatientPageIndex.__table__.create(bind=engine, checkfirst=True)
+    ImportJournal.__table__.create(bind=engine, checkfirst=True)
+    PatientMovement.__table__.create(bind=engine, checkfirst=True)
+    if 'scope' not in {column['name'] for column in inspect(engine).get_columns('ward_pdf_manifest')}:
+        # Entries from before the scope was recorded may be patients-only; the next full import re-checks them
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ALTER TABLE ward_pdf_manifest ADD COLUMN scope VARCHAR(20) NOT NULL "
+                                 f"DEFAULT '{PATIENTS_ONLY}'")
+
+def split_changed_pdfs(pdf_files, force=False, scope=FULL_IMPORT):
+    """Partition ward PDFs into (changed, unchanged) against the manifest
+
+    changed is a list of (pdf_file, fingerprint) pairs to import, where the
+    fingerprint is later passed to record_imported_pdf. unchanged is a list
+    of file names that can be skipped. Only entries whose import covered
+    ``scope`` count.
+    """
+    manifest = {entry.pdf_file: entry for entry in WardPdfManifest.query.all()}
+    changed, unchanged = [], []
+    for pdf_file in pdf_files:
+        stat = os.stat(pdf_file)
+        fingerprint = {'file_size': stat.st_size, 'file_mtime': stat.st_mtime, 'content_hash': None}
+        entry = manifest.get(os.path.basename(pdf_file))
+        if entry and scope == FULL_IMPORT and entry.scope != FULL_IMPORT:
+            entry = None  # Only the patients were imported
+
+        if not force and entry and entry.file_size == stat.st_size and entry.file_mtime == stat.st_mtime:
+            unchanged.append(pdf_file)
+            continue
+
+        fingerprint['content_hash'] = hash_file(pdf_file)
+        if not force and entry and entry.content_hash == fingerprint['content_hash']:
+            # Same bytes, new timestamp: remember the mtime so next run takes the fast path
+            entry.file_mtime = stat.st_mtime
+            unchanged.append(pdf_file)
+            continue
+
+        changed.append((pdf_file, fingerprint))
+
+    db.session.commit()
+    return changed, unchanged
+
+def record_imported_pdf(pdf_file, ward_number, fingerprint, scope=FULL_IMPORT):
+    """Add or refresh the manifest entry for a file that imported successfully (caller commits)"""
+    name = os.path.basename(pdf_file)
+    entry = WardPdfManifest.query.filter_by(pdf_file=name).first()
+    if not entry:
+        entry = WardPdfManifest(pdf_file=name, ward_number=ward_number, scope=scope, **fingerprint)
+        db.session.add(entry)
+    else:
+        if scope == FULL_IMPORT or entry.content_hash != fingerprint['content_hash']:
+            entry.scope = scope  # Otherwise the notes of the same file stay imported
+        entry.ward_number = ward_number
+        entry.file_size = fingerprint['file_size']
+        entry.file_mtime = fingerprint['file_mtime']
+        entry.content_hash = fingerprint['content_hash']
+    entry.imported_at = datetime.utcnow()
+    return entry
+
+def imported_pdf_names():
+    """Return the file names of all ward PDFs imported with their care notes at least once"""
+    return {pdf_file for (pdf_file,) in db.session.query(WardPdfManifest.pdf_file).filter(
+        WardPdfManifest.scope == FULL_IMPORT)}
+
+def current_content_hash(pdf_file):
+    """Return the SHA-256 of a file, taken from the manifest if size and mtime still match"""
+    stat = os.stat(pdf_file)
+    entry = WardPdfManifest.query.filter_by(pdf_file=os.path.basename(pdf_file)).first()
+    if entry and entry.file_size == stat.st_size and entry.file_mtime == stat.st_mtime:
+        return entry.content_hash
+    return hash_file(pdf_file)
+
+def load_patient_page_index(pdf_file):
+    """Return {hospital_id: (first_page, last_page)} for a ward PDF
+
+    The stored index is used while the file's content hash matches; otherwise
+    the outline is read again and the stored index replaced (commits).
+    """
+    name = os.path.basename(pdf_file)
+    content_hash = current_content_hash(pdf_file)
+    rows = PatientPageIndex.query.filter_by(pdf_file=name).all()
+    if rows and all(row.content_hash == content_hash for row in rows):
+        return {row.hospital_id: (row.first_page, row.last_page) for row in rows}
+
+    index = read_patient_page_index(pdf_file)
+    PatientPageIndex.query.filter_by(pdf_file=name).delete()
+    db.session.add_all(
+        PatientPageIndex(pdf_file=name, hospital_id=hospital_id, first_page=first_page,
+                         last_page=last_page, content_hash=content_hash)
+        for hospital_id, (first_page, last_page) in index.items()
+    )
+    db.session.commit()
+    return index
@@ -0,0 +1,89 @@
+"""Patient page index read from the outline (bookmarks) of a ward PDF.
+
+generate_long_stay_ward writes one top-level outline entry per patient,
+titled "Patient: {name} ({hospital_id})", pointing at the first page of
+that patient's record. Reading the outline needs no text extraction, so a
+single patient can be located without touching the other pages, and a large
+ward can be split into shards on patient boundaries for parallel parsing.
+"""
+import re
+
+from PyPDF2 import PdfReader
+
+OUTLINE_TITLE_PATTERN = re.compile(r"^Patient:.*\((\d+)\)\s*$")
+RECORD_HEADER = b"Patient Record - Ward"
+
+# Shards smaller than this cost more to set up than they save
+MIN_SHARD_PAGES = 40
+
+def read_patient_page_index(pdf_path_or_reader):
+    """Return {hospital_id: (first_page, last_page)} from the PDF outline
+
+    Pages are 0-based and inclusive. A patient's range ends on the page
+    before the next patient's bookmark, or on the last page of the file.
+    Returns an empty dict if the PDF has no patient bookmarks.
+    """
+    reader = pdf_path_or_reader
+    if not isinstance(reader, PdfReader):
+        reader = PdfReader(pdf_path_or_reader)
+
+    starts = []
+    for entry in reader.outline:
+        if isinstance(entry, list):
+            continue  # Nested entries belong to the previous patient
+        match = OUTLINE_TITLE_PATTERN.match(entry.title or '')
+        if match:
+            starts.append((reader.get_destination_page_number(entry), match.group(1)))
+    starts.sort()
+
+    page_count = len(reader.pages)
+    index = {}
+    for position, (first_page, hospital_id) in enumerate(starts):
+        next_start = starts[position + 1][0] if position + 1 < len(starts) else page_count
+        index[hospital_id] = (first_page, max(first_page, next_start - 1))
+    return index
+
+def patient_start_pages(reader):
+    """Return the sorted 0-based pages on which a patient record starts
+
+    Uses the outline when there is one. Otherwise the raw page content
+    streams are searched for the record header, which is far cheaper than
+    extracting their text.
+    """
+    index = read_patient_page_index(reader)
+    if index:
+        return sorted(first_page for first_page, _ in index.values())
+    starts = []
+    for page_idx, page in enumerate(reader.pages):
+        contents = page.get_contents()
+        if contents is not None and RECORD_HEADER in contents.get_data():
+            starts.append(page_idx)
+    return starts
+
+def plan_page_shards(pdf_path, max_shards, min_pages=MIN_SHARD_PAGES):
+    """Split a ward PDF into at most max_shards (first_page, last_page) ranges
+
+    Every range starts on a patient record, so each can be parsed on its
+    own and the results concatenated in order. Returns a single range
+    covering the whole file when it is too small to be worth splitting.
+    """
+    reader = PdfReader(pdf_path)
+    page_count = len(reader.pages)
+    shard_count = min(max_shards, page_count // min_pages)
+    if shard_count <= 1:
+        return [(0, page_count - 1)]
+
+    starts = patient_start_pages(reader)
+    if not starts:
+        return [(0, page_count - 1)]
+
+    # Cut at the first patient boundary past each equal share of the pages
+    target = (page_count - starts[0]) / shard_count
+    shard_starts = [starts[0]]
+    for start in starts[1:]:
+        if len(shard_starts) == shard_count:
+            break
+        if start - shard_starts[-1] >= target:
+            shard_starts.append(start)
+    ends = [start - 1 for start in shard_starts[1:]] + [page_count - 1]
+    return list(zip(shard_starts, ends))
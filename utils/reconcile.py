@@ -0,0 +1,208 @@
+"""Set-based reconciliation of ward rosters after a ward PDF is imported.
+
+The patients listed in a freshly imported ward PDF are loaded into a
+temporary table, and a handful of SQL statements then bring the patient
+table in line with it:
+
+    transfer   a listed patient whose current ward is another ward moves here,
+               unless that ward's PDF is newer than this one
+    readmit    a listed patient who was discharged becomes active again here
+    discharge  an active patient of this ward who is no longer listed is
+               marked inactive
+
+A patient discharged by one file and listed by another later in the same
+import run is logged as a transfer, replacing the discharge. Every move is
+recorded in PatientMovement. Names and dates of birth are
+refreshed from the PDF in the same pass. The work runs on the session's
+pdf_parsed connection, so it commits together with the file's manifest
+entry; its cost does not depend on the number of patients in the hospital.
+
+A pdf_parsed database rebuilt from scratch (reset_and_initialize.py
+--refresh) only knows the patients in the current PDFs; carry_over_history()
+brings the live database's movement log and discharged patients into it
+before it is swapped in.
+"""
+import logging
+import sqlite3
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models import db, Patient, PatientMovement
+
+logger = logging.getLogger(__name__)
+
+def pdf_parsed_connection():
+    """The session's connection to the pdf_parsed database (joins its transaction)"""
+    return db.session.connection(bind_arguments={'mapper': Patient.__mapper__})
+
+def reconcile_ward(pdf_file, ward_number, roster, file_mtime, run_id=None):
+    """Apply transfers, readmissions and discharges for one imported ward PDF (caller commits)
+
+    roster is a list of (hospital_id, name, dob) for every patient in the
+    file; name is None for patients whose demographics were not re-read.
+    An empty roster changes nothing, so a PDF that parsed to no
+    patients cannot discharge a whole ward. Returns the number of
+    transfers, readmissions and discharges.
+    """
+    counts = {'transfer': 0, 'readmit': 0, 'discharge': 0}
+    if not roster:
+        return counts
+
+    conn = pdf_parsed_connection()
+    params = {'ward': ward_number, 'pdf_file': pdf_file, 'mtime': file_mtime,
+              'now': datetime.utcnow(), 'run_id': run_id}
+    conn.execute(text("DROP TABLE IF EXISTS temp.imported_roster"))
+    conn.execute(text(
+        "CREATE TEMP TABLE imported_roster (hospital_id TEXT PRIMARY KEY, name TEXT, dob TEXT)"
+    ))
+    try:
+        conn.execute(
+            text("INSERT OR REPLACE INTO temp.imported_roster (hospital_id, name, dob) VALUES (:hospital_id, :name, :dob)"),
+            [{'hospital_id': hospital_id, 'name': name, 'dob': dob} for hospital_id, name, dob in roster]
+        )
+
+        # Patients listed here whose current ward is another ward with an
+        # older (or no) PDF, or who were discharged, are placed in this ward.
+        # A discharge earlier in the same run was the first half of a transfer.
+        conn.execute(text("""
+            CREATE TEMP TABLE arriving AS
+            SELECT p.hospital_id, p.current_ward AS from_ward,
+                   CASE WHEN COALESCE(p.is_active, 1) OR EXISTS (
+                            SELECT 1 FROM patient_movement pm
+                            WHERE pm.hospital_id = p.hospital_id AND pm.run_id = :run_id
+                              AND pm.movement = 'discharge')
+                        THEN 'transfer' ELSE 'readmit' END AS movement
+            FROM patient p
+            JOIN temp.imported_roster r ON r.hospital_id = p.hospital_id
+            LEFT JOIN ward_pdf_manifest m ON m.ward_number = p.current_ward AND p.current_ward != :ward
+            WHERE NOT COALESCE(p.is_active, 1)
+               OR (p.current_ward != :ward AND (m.file_mtime IS NULL OR m.file_mtime <= :mtime))
+        """), params)
+
+        # Active patients of this ward missing from its PDF have been discharged
+        conn.execute(text("""
+            CREATE TEMP TABLE leaving AS
+            SELECT p.hospital_id, p.current_ward AS from_ward
+            FROM patient p
+            WHERE p.current_ward = :ward AND COALESCE(p.is_active, 1)
+              AND p.hospital_id NOT IN (SELECT hospital_id FROM temp.imported_roster)
+        """), params)
+
+        # The transfer row below takes the place of the first half's discharge row
+        conn.execute(text("""
+            DELETE FROM patient_movement
+            WHERE run_id = :run_id AND movement = 'discharge'
+              AND hospital_id IN (SELECT hospital_id FROM temp.arriving WHERE movement = 'transfer')
+        """), params)
+
+        conn.execute(text("""
+            INSERT INTO patient_movement (hospital_id, movement, from_ward, to_ward, pdf_file, run_id, recorded_at)
+            SELECT hospital_id, movement, from_ward, :ward, :pdf_file, :run_id, :now FROM temp.arriving
+            UNION ALL
+            SELECT hospital_id, 'discharge', from_ward, NULL, :pdf_file, :run_id, :now FROM temp.leaving
+        """), params)
+
+        conn.execute(text("""
+            UPDATE patient SET current_ward = :ward, pdf_file = :pdf_file, is_active = 1, updated_at = :now
+            WHERE hospital_id IN (SELECT hospital_id FROM temp.arriving)
+        """), params)
+        conn.execute(text("""
+            UPDATE patient SET is_active = 0, updated_at = :now
+            WHERE hospital_id IN (SELECT hospital_id FROM temp.leaving)
+        """), params)
+
+        # Refresh demographics of the patients now in this ward
+        conn.execute(text("""
+            UPDATE patient
+            SET name = (SELECT r.name FROM temp.imported_roster r WHERE r.hospital_id = patient.hospital_id),
+                dob = (SELECT r.dob FROM temp.imported_roster r WHERE r.hospital_id = patient.hospital_id),
+                updated_at = :now
+            WHERE current_ward = :ward AND hospital_id IN (
+                SELECT r.hospital_id FROM temp.imported_roster r
+                JOIN patient p ON p.hospital_id = r.hospital_id
+                WHERE r.name IS NOT NULL AND (p.name IS NOT r.name OR p.dob IS NOT r.dob)
+            )
+        """), params)
+
+        for movement, count in conn.execute(text(
+                "SELECT movement, COUNT(*) FROM temp.arriving GROUP BY movement")):
+            counts[movement] = count
+        counts['discharge'] = conn.execute(text("SELECT COUNT(*) FROM temp.leaving")).scalar()
+    finally:
+        for table in ('imported_roster', 'arriving', 'leaving'):
+            conn.execute(text(f"DROP TABLE IF EXISTS temp.{table}"))
+
+    if any(counts.values()):
+        logger.info(f"Reconciled ward {ward_number}: {counts['transfer']} transferred in, "
+                    f"{counts['readmit']} readmitted, {counts['discharge']} discharged")
+    return counts
+
+def carry_over_history(shadow_path, live_path, run_id=None):
+    """Bring the movement log and discharged patients of live_path into a rebuilt shadow database
+
+    The live movement log is copied ahead of the shadow's own. Live patients
+    missing from the shadow are kept as discharged, and the moves between
+    the two databases are logged: a discharge for each of those that was
+    still active, a transfer for each active patient now in another ward and
+    a readmission for each discharged patient listed again. Returns the
+    number of transfers, readmissions and discharges logged.
+    """
+    conn = sqlite3.connect(shadow_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS live", (live_path,))
+        live_tables = {row[0] for row in conn.execute("SELECT name FROM live.sqlite_master WHERE type = 'table'")}
+        if 'patient' not in live_tables:
+            return {'transfer': 0, 'readmit': 0, 'discharge': 0}
+        live_columns = {row[1] for row in conn.execute("PRAGMA live.table_info(patient)")}
+        patient_columns = [column.name for column in Patient.__table__.columns
+                           if column.name != 'id' and column.name in live_columns]
+        movement_columns = ', '.join(column.name for column in PatientMovement.__table__.columns if column.name != 'id')
+        params = {'run_id': run_id, 'now': datetime.utcnow()}
+
+        with conn:
+            conn.execute("CREATE TEMP TABLE new_movements AS SELECT * FROM patient_movement")
+            conn.execute("DELETE FROM patient_movement")
+            if 'patient_movement' in live_tables:
+                conn.execute(f"INSERT INTO patient_movement ({movement_columns}) "
+                             f"SELECT {movement_columns} FROM live.patient_movement ORDER BY id")
+            conn.execute(f"INSERT INTO patient_movement ({movement_columns}) "
+                         f"SELECT {movement_columns} FROM temp.new_movements ORDER BY id")
+            conn.execute("DROP TABLE temp.new_movements")
+
+            # Moves between the live database and the rebuilt one
+            conn.execute("""
+                CREATE TEMP TABLE moves AS
+                SELECT p.hospital_id, lp.current_ward AS from_ward, p.current_ward AS to_ward, p.pdf_file,
+                       CASE WHEN COALESCE(lp.is_active, 1) THEN 'transfer' ELSE 'readmit' END AS movement
+                FROM patient p
+                JOIN live.patient lp ON lp.hospital_id = p.hospital_id
+                WHERE COALESCE(p.is_active, 1)
+                  AND (NOT COALESCE(lp.is_active, 1) OR lp.current_ward != p.current_ward)
+                UNION ALL
+                SELECT lp.hospital_id, lp.current_ward, NULL, NULL, 'discharge'
+                FROM live.patient lp
+                WHERE COALESCE(lp.is_active, 1)
+                  AND NOT EXISTS (SELECT 1 FROM patient p WHERE p.hospital_id = lp.hospital_id)
+            """)
+            conn.execute("""
+                INSERT INTO patient_movement (hospital_id, movement, from_ward, to_ward, pdf_file, run_id, recorded_at)
+                SELECT hospital_id, movement, from_ward, to_ward, pdf_file, :run_id, :now FROM temp.moves
+            """, params)
+
+            # Patients no ward PDF lists any more stay on record as discharged
+            selected = ', '.join({'is_active': '0',
+                                  'updated_at': 'CASE WHEN COALESCE(lp.is_active, 1) THEN :now ELSE lp.updated_at END'}
+                                 .get(column, f'lp.{column}') for column in patient_columns)
+            conn.execute(f"""
+                INSERT INTO patient ({', '.join(patient_columns)})
+                SELECT {selected} FROM live.patient lp
+                WHERE NOT EXISTS (SELECT 1 FROM patient p WHERE p.hospital_id = lp.hospital_id)
+            """, params)
+
+            counts = {'transfer': 0, 'readmit': 0, 'discharge': 0}
+            counts.update(conn.execute("SELECT movement, COUNT(*) FROM temp.moves GROUP BY movement"))
+            conn.execute("DROP TABLE temp.moves")
+        return counts
+    finally:
+        conn.close()
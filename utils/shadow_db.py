@@ -0,0 +1,122 @@
+"""Build a SQLite database next to the live one and swap it in atomically.
+
+The live file (e.g. pdf_parsed.db) becomes a symlink to a generation file
+such as pdf_parsed.20261018-050400.db. A refresh builds the next generation
+under a ``.building`` name, verifies it, and then replaces the symlink with
+os.replace(), which is atomic. SQLite resolves the symlink when it opens a
+connection, and the app opens a new connection per checkout (NullPool), so
+every process picks up the new generation on its next transaction without
+a restart. Transactions already running keep reading the old file, which
+stays on disk as the previous generation. Each generation gets its own
+-wal and -shm files, named after the resolved file, so WAL mode is safe.
+"""
+import glob
+import logging
+import os
+import sqlite3
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Generations kept on disk: the live one and the previous one for rollback
+KEEP_GENERATIONS = 2
+
+BUILDING_SUFFIX = '.building'
+
+def generation_path(live_path, stamp=None):
+    """Return the path of a new generation of live_path (pdf_parsed.<stamp>.db)"""
+    root, ext = os.path.splitext(live_path)
+    stamp = stamp or datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    return f"{root}.{stamp}{ext}"
+
+def list_generations(live_path):
+    """Return the generation files of live_path, oldest first"""
+    root, ext = os.path.splitext(live_path)
+    return sorted(glob.glob(f"{glob.escape(root)}.*{ext}"))
+
+def checkpoint(path, required=True):
+    """Fold any WAL into the main file and leave it in rollback journal mode
+
+    The app's connections put the file back in WAL mode when they open it
+    (utils/sqlite_tuning.py). Leaving WAL mode needs the file to itself; if
+    other connections have it open and not ``required``, the WAL is still
+    folded in as far as they allow.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        try:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        except sqlite3.OperationalError as e:
+            if required:
+                raise
+            logger.warning(f"{os.path.basename(path)} left in WAL mode: {str(e)}")
+    finally:
+        conn.close()
+
+def verify_database(path, required_tables=()):
+    """Return a list of problems with the SQLite file at path (empty if it is sound)"""
+    problems = []
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        return [f"cannot open {path}: {str(e)}"]
+    try:
+        result = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        if result != ['ok']:
+            problems.append(f"integrity check failed: {'; '.join(result[:5])}")
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in required_tables:
+            if table not in tables:
+                problems.append(f"missing table {table}")
+    except sqlite3.Error as e:
+        problems.append(f"cannot read {path}: {str(e)}")
+    finally:
+        conn.close()
+    return problems
+
+def swap_in(live_path, shadow_path):
+    """Atomically make live_path point at the verified shadow database
+
+    shadow_path is renamed to a generation file first. If live_path is still
+    a regular file it is kept as the previous generation (by hard link), so
+    readers holding it open are unaffected and it can be swapped back.
+    Returns the path of the new live generation.
+    """
+    new_generation = shadow_path[:-len(BUILDING_SUFFIX)] if shadow_path.endswith(BUILDING_SUFFIX) else shadow_path
+    checkpoint(shadow_path)
+    os.replace(shadow_path, new_generation)
+
+    if os.path.exists(live_path) and not os.path.islink(live_path):
+        checkpoint(live_path, required=False)  # The app may be reading it
+        previous = generation_path(live_path, datetime.fromtimestamp(
+            os.path.getmtime(live_path)).strftime('%Y%m%d-%H%M%S-%f'))
+        os.link(live_path, previous)
+        logger.info(f"Kept the current {os.path.basename(live_path)} as {os.path.basename(previous)}")
+
+    link = f"{live_path}.swap"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(new_generation), link)
+    os.replace(link, live_path)
+    logger.info(f"{os.path.basename(live_path)} now points at {os.path.basename(new_generation)}")
+
+    prune_generations(live_path)
+    return new_generation
+
+def prune_generations(live_path, keep=KEEP_GENERATIONS):
+    """Delete all but the newest ``keep`` generations, never the live one"""
+    live_target = os.path.realpath(live_path)
+    for path in list_generations(live_path)[:-keep]:
+        if os.path.realpath(path) == live_target:
+            continue
+        for stale in (path, f"{path}-wal", f"{path}-shm", f"{path}-journal"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        logger.info(f"Removed old generation {os.path.basename(path)}")
+
+def discard_shadow(shadow_path):
+    """Delete a shadow database that failed verification"""
+    for path in (shadow_path, f"{shadow_path}-wal", f"{shadow_path}-shm", f"{shadow_path}-journal"):
+        if os.path.exists(path):
+            os.remove(path)
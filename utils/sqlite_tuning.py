@@ -0,0 +1,133 @@
+"""SQLite PRAGMAs and ATTACHed databases applied to every new connection, per bind.
+
+The app opens a new connection per checkout (NullPool, see utils/shadow_db.py),
+so the PRAGMAs run on every connect:
+
+    busy_timeout  wait for a lock instead of failing with "database is locked"
+    journal_mode  WAL: readers no longer block on a writer's commit (persistent)
+    synchronous   NORMAL: with WAL, fsync at checkpoints only; still crash-safe
+    temp_store    MEMORY: sorts and temp indexes stay off disk
+    cache_size    page cache per connection, in KiB when negative
+    mmap_size     read pages through the OS page cache instead of copying them;
+                  off by default: mapping and unmapping the file on every
+                  connect cost more than it saved per request
+
+DEFAULT_PRAGMAS apply to every bind, overridden per bind by
+app.config['SQLITE_PRAGMAS'] ({bind: {pragma: value}}, None is users.db).
+Set app.config['SQLITE_TUNING'] to False to leave SQLite's defaults.
+
+Connections to the main database (users.db) also ATTACH the databases of
+the binds in app.config['SQLITE_ATTACH'] under the bind's name, so care
+notes can be joined with pdf_parsed.patient and pdf_parsed.ward (see the
+attached_* tables in models.py) in one statement. The files are looked up
+on every connect, so a pdf_parsed.db swapped in by a refresh is attached
+from the next connection on.
+"""
+import logging
+import threading
+import weakref
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# busy_timeout comes first so the journal mode switch waits for other connections
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -8192,
+    'mmap_size': 0,
+}
+
+BIND_PRAGMAS = {
+    None: {'cache_size': -32768},  # users.db: users and care notes
+    'pdf_parsed': {},  # Wards, patients and import bookkeeping
+    'audit': {'cache_size': -2048},  # Append-mostly; rarely read back
+}
+
+# Binds the main database attaches by default
+ATTACHED_BINDS = ('pdf_parsed', 'audit')
+
+def bind_pragmas(config, bind=None):
+    """The PRAGMAs for one bind under an app config, in the order they must run"""
+    if not config.get('SQLITE_TUNING', True):
+        return {}
+    overrides = config.get('SQLITE_PRAGMAS', BIND_PRAGMAS).get(bind, {})
+    return {**DEFAULT_PRAGMAS, **overrides}
+
+def apply_pragmas(dbapi_connection, pragmas):
+    """Run the PRAGMAs on a new DBAPI connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            try:
+                cursor.execute(f"PRAGMA {name}={value}")
+            except Exception as e:
+                # Another connection held the database too long to switch journal mode;
+                # this connection works without it and the next one tries again
+                logger.warning(f"Could not set PRAGMA {name}={value}: {str(e)}")
+    finally:
+        cursor.close()
+
+def attach_databases(dbapi_connection, paths):
+    """ATTACH each {schema name: file path} to a new DBAPI connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for schema, path in paths.items():
+            cursor.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    finally:
+        cursor.close()
+
+def tune_engine(engine, pragmas, attached_paths=None):
+    """Apply pragmas to every connection engine opens from now on
+
+    attached_paths, if given, is called on each connect for the
+    {schema name: file path} of the databases to ATTACH.
+    """
+    def on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+        if attached_paths:
+            attach_databases(dbapi_connection, attached_paths())
+
+    if pragmas or attached_paths:
+        event.listen(engine, 'connect', on_connect)
+
+class TunedSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy that sets up each SQLite engine it creates as described above
+
+    Flask-SQLAlchemy creates a new engine when a bind's URI changes (e.g. the
+    scratch databases of the benchmarks), so engines are tuned on first use.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tuned_engines = weakref.WeakSet()
+        self._tuning_lock = threading.Lock()
+
+    def get_engine(self, app=None, bind=None):
+        engine = super().get_engine(app, bind)
+        if engine not in self._tuned_engines:
+            with self._tuning_lock:
+                if engine not in self._tuned_engines:
+                    if is_sqlite_file(engine):
+                        app = self.get_app(app)
+                        attached = app.config.get('SQLITE_ATTACH', ATTACHED_BINDS) if bind is None else ()
+                        tune_engine(engine, bind_pragmas(app.config, bind),
+                                    (lambda: self.attached_paths(app, attached)) if attached else None)
+                    self._tuned_engines.add(engine)
+        return engine
+
+    def attached_paths(self, app, binds):
+        """{bind: file path} of the binds' current SQLite files"""
+        paths = {}
+        for bind in binds:
+            engine = self.get_engine(app, bind)
+            if is_sqlite_file(engine):
+                paths[bind] = engine.url.database
+        return paths
+
+def is_sqlite_file(engine):
+    return engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:')
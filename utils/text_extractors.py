@@ -0,0 +1,137 @@
+"""Page text extractors for ward PDFs.
+
+An extractor turns one page of an open PdfReader into the text the ward
+PDF parser reads. Each has a ``version`` that keys the page text cache, so
+switching extractors never serves text extracted by the other one.
+
+    pypdf2     PyPDF2's general-purpose extract_text()
+    reportlab  reads the text operators of our reportlab-generated pages
+               straight from the content stream, and hands any page that
+               does not follow that layout to PyPDF2
+
+The reportlab extractor only accepts pages it can reproduce exactly: every
+string is shown with ``(...) Tj T*`` in a standard Type1 font and is plain
+ASCII. PyPDF2 renders such a page as the strings joined by newlines (with
+a final newline), which is what it returns. Anything else (TJ arrays, hex
+strings, embedded fonts, non-ASCII text, other stream filters) falls back.
+Config.PDF_TEXT_EXTRACTOR selects the extractor.
+"""
+import base64
+import re
+import zlib
+
+import PyPDF2
+
+from config import Config
+
+# (string) Tj T* -- the only way reportlab's Canvas shows our text
+SHOWN_STRING = re.compile(rb'\(((?:\\.|[^\\()])*)\)\s*Tj\s*T\*', re.S)
+
+# Text operators and string forms the stream reader does not handle
+UNSUPPORTED_TEXT = re.compile(rb"TJ|\)\s*['\"]|>\s*Tj|\\[0-7]|[\x80-\xff]")
+
+STRING_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+                  b'\n': b'', b'\r': b''}  # A backslash before a line break continues the string
+ESCAPED_CHAR = re.compile(rb'\\(.)', re.S)
+
+class PyPDF2Extractor:
+    """PyPDF2's extract_text(), which handles any PDF"""
+
+    name = 'pypdf2'
+    version = f"PyPDF2-{PyPDF2.__version__}/1"
+
+    def page_text(self, reader, page_idx):
+        return reader.pages[page_idx].extract_text()
+
+class ReportlabExtractor:
+    """Decodes the text of reportlab Canvas pages from their content stream"""
+
+    name = 'reportlab'
+    version = f"reportlab-stream/1+{PyPDF2Extractor.version}"
+
+    def __init__(self):
+        self.fallback = PyPDF2Extractor()
+        self.fallback_pages = 0
+        self._plain_fonts = {}  # object number of a font dictionary -> all fonts are plain
+
+    def page_text(self, reader, page_idx):
+        page = reader.pages[page_idx]
+        text = self.stream_text(page)
+        if text is None:
+            self.fallback_pages += 1
+            return self.fallback.page_text(reader, page_idx)
+        return text
+
+    def stream_text(self, page):
+        """The page text read from its content stream, or None if the page is not in our layout"""
+        if not self._has_plain_fonts(page):
+            return None
+        content = page.get('/Contents')
+        if content is None:
+            return None
+        data = decode_stream(content.get_object())
+        if data is None or UNSUPPORTED_TEXT.search(data):
+            return None
+        strings = SHOWN_STRING.findall(data)
+        if len(strings) != data.count(b'Tj'):
+            return None  # A Tj the pattern did not match, e.g. one without T*
+        if not strings:
+            return ""
+        return "\n".join(unescape_string(string) for string in strings) + "\n"
+
+    def _has_plain_fonts(self, page):
+        resources = page.get('/Resources')
+        fonts = resources.get_object().get('/Font') if resources is not None else None
+        if fonts is None:
+            return True
+        # reportlab shares one font dictionary between pages, so check it once
+        key = fonts.idnum if isinstance(fonts, PyPDF2.generic.IndirectObject) else None
+        if key is None or key not in self._plain_fonts:
+            plain = all(is_plain_font(font.get_object()) for font in fonts.get_object().values())
+            if key is None:
+                return plain
+            self._plain_fonts[key] = plain
+        return self._plain_fonts[key]
+
+def is_plain_font(font):
+    """True for a standard Type1 font without an embedded program or custom mapping"""
+    return font.get('/Subtype') == '/Type1' and '/FontDescriptor' not in font and '/ToUnicode' not in font
+
+def decode_stream(stream):
+    """Decode a content stream written by reportlab, or None for filters it does not use"""
+    if isinstance(stream, PyPDF2.generic.ArrayObject):
+        return None
+    filters = stream.get('/Filter', [])
+    if not isinstance(filters, list):
+        filters = [filters]
+    data = stream._data
+    for name in filters:
+        if name == '/ASCII85Decode':
+            data = data.strip()
+            if data.startswith(b'<~'):
+                data = data[2:]
+            if data.endswith(b'~>'):
+                data = data[:-2]
+            data = base64.a85decode(data)
+        elif name == '/FlateDecode':
+            if '/DecodeParms' in stream:
+                return None
+            data = zlib.decompress(data)
+        else:
+            return None
+    return data
+
+def unescape_string(string):
+    """Text of a PDF literal string without octal escapes"""
+    if b'\\' in string:
+        string = ESCAPED_CHAR.sub(lambda m: STRING_ESCAPES.get(m.group(1), m.group(1)), string)
+    return string.decode('ascii')
+
+EXTRACTORS = {extractor.name: extractor for extractor in (PyPDF2Extractor, ReportlabExtractor)}
+
+def get_extractor(name=None):
+    """Return a new extractor by name (default Config.PDF_TEXT_EXTRACTOR)"""
+    name = name or Config.PDF_TEXT_EXTRACTOR
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown PDF text extractor {name!r}, expected one of {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name]()
@@ -0,0 +1,261 @@
+"""Import ward PDFs into the databases.
+
+The pipeline shared by initialize_database.py and the hot-folder ingestion
+daemon: skip files whose fingerprint is unchanged, create or update the
+Ward rows, parse the changed files (optionally in a process pool) and bulk
+write their patients and care notes. Callers provide the app context.
+"""
+import logging
+import time
+from datetime import datetime
+
+from models import db, Patient, Ward
+from utils.bulk_import import (
+    CHECKPOINT_PATIENTS, CHECKPOINT_SECONDS, WriteThrottle, care_note_rows, patient_row, write_batch
+)
+from utils.import_journal import begin_import_run, checkpoint_ward, finish_ward
+from utils.import_priority import prioritize_pdfs
+from utils.import_telemetry import timed
+from utils.parallel_import import DEFAULT_PDF_TIMEOUT, iter_parsed_ward_pdfs, resolve_jobs
+from utils.pdf_manifest import load_patient_page_index, record_imported_pdf, split_changed_pdfs
+from utils.reconcile import reconcile_ward
+from utils.ward_pdf_parser import iter_pdf_patients, ward_number_for
+
+logger = logging.getLogger(__name__)
+
+def save_patient_data(patient_records, pdf_path, ward_number, on_commit=None, stats=None, throttle=None):
+    """Save parsed patients and their notes for one ward directly to the CareNote table
+
+    patient_records is an iterable of (patient_id, info) pairs and is consumed
+    incrementally, so a streamed parse is written one patient at a time.
+    Patients whose section hash is unchanged since the last import are skipped.
+    The patients are committed every CHECKPOINT_PATIENTS patients (sooner once
+    CHECKPOINT_SECONDS have passed since the last commit), and
+    ``on_commit(patients_done, last_patient_id)`` is called after each commit,
+    so an interrupted import can resume after the last patient committed.
+    Counts and write time are added to ``stats`` if given. A WriteThrottle as
+    ``throttle`` keeps each transaction within its budget.
+    """
+    try:
+        # Batch database operations
+        patient_rows = []
+        note_rows = []
+        inserted_notes = 0
+        processed_patients = 0
+        committed_patients = 0
+        unchanged_patients = 0
+        parsed_notes = 0
+        last_commit = time.monotonic()
+
+        last_patient_id = None
+        for patient_id, info in patient_records:
+            processed_patients += 1
+            last_patient_id = patient_id
+
+            if info.get('unchanged'):
+                unchanged_patients += 1
+            else:
+                note_count = len(info.get('care_notes', []))
+                parsed_notes += note_count
+                if note_count == 0:  # Flag if we have patients with no notes
+                    logger.warning(f"Patient {patient_id} has no care notes!")
+
+                with timed(stats, 'db'):
+                    # Queue the patient and its notes; duplicates are dropped by the unique indexes
+                    patient_rows.append(patient_row(patient_id, info, ward_number, pdf_path))
+                    note_rows.extend(care_note_rows(patient_id, info, ward_number))
+
+            # Commit on a patient boundary, so a crash resumes after this patient
+            if (processed_patients - committed_patients >= CHECKPOINT_PATIENTS
+                    or time.monotonic() - last_commit >= CHECKPOINT_SECONDS):
+                with timed(stats, 'db'):
+                    inserted_notes += write_batch(patient_rows, note_rows, throttle)
+                    patient_rows, note_rows = [], []
+                    committed_patients = processed_patients
+                    if on_commit:
+                        on_commit(processed_patients, patient_id)
+                last_commit = time.monotonic()
+
+        with timed(stats, 'db'):
+            # Final batch for any remaining records
+            if patient_rows or note_rows:
+                inserted_notes += write_batch(patient_rows, note_rows, throttle)
+            if on_commit and last_patient_id and committed_patients < processed_patients:
+                on_commit(processed_patients, last_patient_id)
+        
+        if stats is not None:
+            stats['patients'] += processed_patients
+            stats['unchanged_patients'] += unchanged_patients
+            stats['notes'] += parsed_notes
+            stats['notes_inserted'] += inserted_notes
+        logger.info(f"Completed processing {pdf_path}: {processed_patients} patients, "
+                    f"{unchanged_patients} unchanged, {inserted_notes} new care notes")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error processing {pdf_path}: {str(e)}")
+        db.session.rollback()
+        return False
+
+def extract_patient_data(pdf_path, ward_number):
+    """Extract patient and notes data from a single PDF file and save directly to CareNote table"""
+    return save_patient_data(iter_pdf_patients(pdf_path), pdf_path, ward_number)
+
+def known_section_hashes(ward_numbers):
+    """Map ward number -> {hospital_id: section_hash} for patients already imported"""
+    hashes = {}
+    rows = db.session.query(Patient.current_ward, Patient.hospital_id, Patient.section_hash).filter(
+        Patient.current_ward.in_(ward_numbers),
+        Patient.section_hash.isnot(None)
+    )
+    for ward_number, hospital_id, section_hash in rows:
+        hashes.setdefault(ward_number, {})[hospital_id] = section_hash
+    return hashes
+
+def ward_display_name(ward_num):
+    """Display name of a ward created from its PDF (1 -> Ward 1, Long_1 -> Long 1)"""
+    return f"Ward {ward_num}" if ward_num.isdigit() else ward_num.replace('_', ' ')
+
+def upsert_ward_records(pdf_files):
+    """Create or update the Ward row of each ward PDF (commits)"""
+    for pdf_file in pdf_files:
+        ward_num = ward_number_for(pdf_file)
+        
+        ward = Ward.query.filter_by(ward_number=ward_num).first()
+        if not ward:
+            ward = Ward(
+                ward_number=ward_num,
+                display_name=ward_display_name(ward_num),
+                pdf_file=pdf_file,
+                last_updated=datetime.utcnow()
+            )
+            db.session.add(ward)
+        else:
+            ward.pdf_file = pdf_file
+            ward.last_updated = datetime.utcnow()
+    db.session.commit()
+
+def resume_page_range(pdf_file, last_patient_id):
+    """Return (page_range, skipped_patient_ids) to resume pdf_file after last_patient_id
+
+    page_range is None if the file has to be parsed whole.
+    """
+    try:
+        page_index = load_patient_page_index(pdf_file)
+    except Exception as e:
+        logger.warning(f"Could not read the page index of {pdf_file}: {str(e)}")
+        return None, []
+    if last_patient_id not in page_index:
+        return None, []
+    first_page = page_index[last_patient_id][1] + 1
+    last_page = max(last for _, last in page_index.values())
+    skipped = [hospital_id for hospital_id, (_, last) in page_index.items() if last < first_page]
+    return (first_page, last_page), skipped
+
+def collect_roster(patient_records, roster):
+    """Pass patient records through, appending (hospital_id, name, dob) of each to roster"""
+    for patient_id, info in patient_records:
+        roster.append((patient_id, info.get('name'), info.get('info', {}).get('DOB')))
+        yield patient_id, info
+
+def import_ward_pdfs(pdf_files, jobs=1, timeout=DEFAULT_PDF_TIMEOUT, force=False, resume=False, telemetry=None,
+                     write_budget_ms=None):
+    """Import the ward PDFs that changed since their last import
+
+    jobs > 1 parses the files in a process pool while this process writes
+    the results; each file gets at most ``timeout`` seconds to parse.
+    Unchanged files (by fingerprint) and unchanged patients within changed
+    files (by section hash) are skipped unless ``force``. Changed files are
+    imported in order of demand for their wards. Progress is
+    checkpointed in the import journal after every committed batch; with
+    ``resume`` the last unfinished run carries on from its checkpoints.
+    Each imported file's roster is reconciled (transfers, readmissions and
+    discharges, see utils/reconcile.py). Per-ward timings and counts go to
+    ``telemetry`` (an ImportTelemetry) if given. With ``write_budget_ms``
+    the writes are throttled so no transaction holds the SQLite write lock
+    much longer than that, for imports while the app is live. Returns the lists
+    (imported, unchanged, failed) of files.
+    """
+    # Only re-import files that changed since the last successful import
+    changed_files, unchanged_files = split_changed_pdfs(pdf_files, force=force)
+    if unchanged_files:
+        logger.info(f"Skipping {len(unchanged_files)} unchanged ward PDF(s): {', '.join(sorted(unchanged_files))}")
+    fingerprints = dict(changed_files)
+    # Busy wards first, so they come online before the long tail
+    pdf_files = prioritize_pdfs(list(fingerprints))
+    
+    run_id, resume_points = begin_import_run(
+        pdf_files, {f: fingerprint['content_hash'] for f, fingerprint in fingerprints.items()}, resume)
+    
+    # Create or update ward records up front so the parsers can run ahead
+    upsert_ward_records(pdf_files)
+    
+    # Let the parsers skip note extraction for patients whose pages are unchanged
+    hashes = {} if force else known_section_hashes([ward_number_for(f) for f in pdf_files])
+    parser_args = {f: {'known_hashes': hashes.get(ward_number_for(f), {})} for f in pdf_files}
+    if telemetry is not None:
+        telemetry.unchanged_files = list(unchanged_files)
+        telemetry.extra['run_id'] = run_id
+        for pdf_file in pdf_files:
+            parser_args[pdf_file]['stats'] = telemetry.ward_stats(pdf_file)
+    
+    # Resumed files start at the page after their last committed patient
+    patients_before = {}
+    rosters = {pdf_file: [] for pdf_file in pdf_files}
+    for pdf_file, (patients_done, last_patient_id) in resume_points.items():
+        page_range, skipped = resume_page_range(pdf_file, last_patient_id)
+        if page_range:
+            parser_args[pdf_file]['page_range'] = page_range
+            patients_before[pdf_file] = patients_done
+            rosters[pdf_file].extend((hospital_id, None, None) for hospital_id in skipped)
+            logger.info(f"Resuming {pdf_file} after patient {last_patient_id} "
+                        f"({patients_done} patients already committed)")
+    
+    throttle = WriteThrottle(write_budget_ms) if write_budget_ms else None
+    jobs = resolve_jobs(jobs)
+    logger.info(f"Parsing {len(pdf_files)} ward PDF(s) with {jobs} worker(s)...")
+    imported_files, failed_files = [], []
+    for pdf_file, patient_records, error in iter_parsed_ward_pdfs(
+            pdf_files, iter_pdf_patients, jobs, timeout, parser_args):
+        ward_num = ward_number_for(pdf_file)
+        done_before = patients_before.get(pdf_file, 0)
+
+        def on_commit(patients_done, last_patient_id):
+            checkpoint_ward(run_id, pdf_file, done_before + patients_done, last_patient_id)
+
+        stats = parser_args[pdf_file].get('stats')
+        roster = rosters[pdf_file]
+        if error is None and save_patient_data(collect_roster(patient_records, roster), pdf_file,
+                                               ward_num, on_commit, stats, throttle):
+            # Bring transfers and discharges in line with the file in the same commit as its manifest entry
+            with timed(stats, 'db'):
+                movements = reconcile_ward(pdf_file, ward_num, roster, fingerprints[pdf_file]['file_mtime'], run_id)
+            if stats is not None:
+                stats['transferred'] += movements['transfer']
+                stats['readmitted'] += movements['readmit']
+                stats['discharged'] += movements['discharge']
+            record_imported_pdf(pdf_file, ward_num, fingerprints[pdf_file])
+            finish_ward(run_id, pdf_file)
+            db.session.commit()
+            imported_files.append(pdf_file)
+            if telemetry is not None:
+                telemetry.status[pdf_file] = 'imported'
+            logger.info(f"Successfully processed {pdf_file}")
+        else:
+            logger.error(f"Failed to process {pdf_file}" + (f": {error}" if error else ""))
+            finish_ward(run_id, pdf_file, error or "import failed, see the log")
+            db.session.commit()
+            failed_files.append(pdf_file)
+            if telemetry is not None:
+                telemetry.status[pdf_file] = 'failed'
+    
+    if throttle:
+        logger.info(f"Throttled writes: {throttle.transactions} transactions, "
+                    f"{throttle.over_budget} over the {write_budget_ms} ms budget")
+    if telemetry is not None:
+        if throttle:
+            telemetry.extra['throttle'] = throttle.report()
+        telemetry.finish()
+    if failed_files:
+        logger.warning(f"{len(failed_files)} ward PDF(s) failed: {', '.join(sorted(failed_files))}")
+    return imported_files, unchanged_files, failed_files
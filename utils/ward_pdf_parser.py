@@ -0,0 +1,356 @@
+"""Shared parser for ward PDFs.
+
+Every importer reads ward PDFs through this module: initialize_database,
+reset_and_initialize, deployment_initialize and the migration scripts.
+Patterns are compiled once at import. Each page is scanned a single time:
+the header fields of a patient record are read by a line tokenizer that
+stops at the "Continuous Care Notes" marker, and the care notes are read
+from the text after it.
+
+Free of app/database imports so the parsers can run in pool workers.
+"""
+import hashlib
+import logging
+import os
+import re
+
+from utils.import_telemetry import timed
+from utils.page_text_cache import CachedPageTexts
+from utils.pdf_outline import read_patient_page_index
+
+logger = logging.getLogger(__name__)
+
+# Ward PDFs are named ward_<ward number>_records.pdf
+WARD_PDF_PREFIX = "ward_"
+WARD_PDF_SUFFIX = "_records.pdf"
+
+RECORD_HEADER = "Patient Record - Ward"
+CARE_NOTES_HEADER = "Continuous Care Notes"
+
+PATIENT_ID_FIELD = "Patient ID:"
+NAME_FIELD = "Name:"
+DOB_FIELD = "DOB:"
+HEADER_FIELDS = (PATIENT_ID_FIELD, NAME_FIELD, DOB_FIELD)
+
+DIGITS_PATTERN = re.compile(r"\d+")
+
+# Care notes start at a "YYYY-MM-DD HH:MM" timestamp
+TIMESTAMP_LENGTH = len("2026-01-01 00:00")
+TIMESTAMP_COLON_OFFSET = TIMESTAMP_LENGTH - 3
+TIMESTAMP_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}")
+CREDENTIAL_PATTERN = re.compile(r", [A-Z]+(?=\s)")  # The ", RN" after a staff name
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def is_ward_pdf(filename):
+    """True if filename follows the ward_<ward number>_records.pdf convention"""
+    name = os.path.basename(filename)
+    return (name.startswith(WARD_PDF_PREFIX) and name.endswith(WARD_PDF_SUFFIX)
+            and len(name) > len(WARD_PDF_PREFIX) + len(WARD_PDF_SUFFIX))
+
+def ward_number_for(pdf_file):
+    """Return the ward number in a ward PDF's name (ward_ICU_records.pdf -> ICU)"""
+    return os.path.basename(pdf_file)[len(WARD_PDF_PREFIX):-len(WARD_PDF_SUFFIX)]
+
+def ward_pdf_path(ward_number, directory='.'):
+    """Return the path list_ward_pdfs would give the PDF of a ward, or None for an invalid ward number"""
+    name = f"{WARD_PDF_PREFIX}{ward_number}{WARD_PDF_SUFFIX}"
+    if not ward_number or os.path.basename(name) != name:
+        return None
+    if os.path.normpath(directory) == '.':
+        return name
+    return os.path.join(directory, name)
+
+def list_ward_pdfs(directory='.'):
+    """Return the ward PDFs in directory, sorted
+
+    Files in the current directory are returned as bare file names, as the
+    importers have always stored them; anything else is joined to directory.
+    """
+    names = sorted(name for name in os.listdir(directory) if is_ward_pdf(name))
+    if os.path.normpath(directory) == '.':
+        return names
+    return [os.path.join(directory, name) for name in names]
+
+def hash_patient_section(pages):
+    """Return a SHA-256 over the extracted text of one patient's pages"""
+    digest = hashlib.sha256()
+    for text in pages:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\f')  # Page separator so moved page breaks change the hash
+    return digest.hexdigest()
+
+def field_value(label, text):
+    """Return the value of a header field from the text following its label
+
+    Matches the old ``Label:\\s*([^\\n]+)`` patterns: the value is the rest of
+    the line, and a patient ID must start with digits. Returns None if
+    there is no usable value.
+    """
+    text = text.strip()
+    if label == PATIENT_ID_FIELD:
+        digits = DIGITS_PATTERN.match(text)
+        return digits.group(0) if digits else None
+    return text or None
+
+def scan_page(text, fields):
+    """Tokenize one page line by line, filling in header fields missing from ``fields``
+
+    A label with nothing after it on its line takes the next non-blank line
+    as its value. Returns the offset just past the first care notes marker
+    on the page, or None. Lines after the marker are only read while a
+    field is still missing.
+    """
+    notes_offset = None
+    pending = []
+    offset = 0
+    for line in text.split('\n'):
+        line_start = offset
+        offset += len(line) + 1
+
+        if pending and line.strip():
+            for label in pending:
+                value = field_value(label, line)
+                if value:
+                    fields[label] = value
+            pending = []
+
+        for label in HEADER_FIELDS:
+            if label in fields or label in pending:
+                continue
+            idx = line.find(label)
+            if idx < 0:
+                continue
+            rest = line[idx + len(label):]
+            if rest.strip():
+                value = field_value(label, rest)
+                if value:
+                    fields[label] = value
+            else:
+                pending.append(label)
+
+        if notes_offset is None:
+            idx = line.find(CARE_NOTES_HEADER)
+            if idx >= 0:
+                notes_offset = line_start + idx + len(CARE_NOTES_HEADER)
+
+        if notes_offset is not None and not pending and len(fields) == len(HEADER_FIELDS):
+            break
+    return notes_offset
+
+def find_timestamps(text):
+    """Return the offset of every timestamp in text, including overlapping ones
+
+    Each timestamp has its colon at a fixed offset, so only the (few)
+    colons on the page are checked against the pattern.
+    """
+    anchors = []
+    colon = text.find(':', TIMESTAMP_COLON_OFFSET)
+    while colon >= 0:
+        if TIMESTAMP_PATTERN.match(text, colon - TIMESTAMP_COLON_OFFSET):
+            anchors.append(colon - TIMESTAMP_COLON_OFFSET)
+        colon = text.find(':', colon + 1)
+    return anchors
+
+def split_note_segment(segment):
+    """Split the text between two timestamps into (staff, note), or return None
+
+    Follows the old ``\\s+([^,]+(?:, [A-Z]+)?)\\s+(.+?)`` care note pattern,
+    so the staff member is "Name, RN" (or, without a credential, everything
+    up to the last whitespace) and the note is the rest of the segment. Only
+    constant-time checks and single scans are used, so the cost is linear in
+    the segment length whatever its contents.
+    """
+    length = len(segment)
+    start = length - len(segment.lstrip())  # Staff starts after the leading whitespace
+    if start == 0 or start == length:
+        return None
+
+    comma = segment.find(',', start)
+    if comma == start:
+        # Only a staff field made of the last leading space can end at this comma
+        if start < 2:
+            return None
+        start -= 1
+    if comma < 0:
+        comma = length
+
+    # Prefer "Name, RN" followed by whitespace and the note
+    credential = CREDENTIAL_PATTERN.match(segment, comma) if comma < length else None
+    if credential:
+        note_start = WHITESPACE_PATTERN.match(segment, credential.end()).end()
+        if note_start < length:
+            return segment[start:credential.end()], segment[note_start:]
+        if note_start - credential.end() >= 2:
+            return segment[start:credential.end()], ''  # Only whitespace follows
+    if segment[start].isspace():
+        return None  # Backtracked into the leading space; staff would be blank
+
+    # Otherwise the staff runs up to the last whitespace before the comma
+    head = segment[start:comma]
+    if head[-1].isspace():
+        stripped = head.rstrip()
+        run_start = start + len(stripped)
+        if comma < length:
+            return segment[start:comma - 1], segment[comma:]
+        if comma - run_start >= 2:
+            return segment[start:comma - 2], ''  # Only whitespace follows
+        head = stripped  # A single trailing space cannot start a note; look further back
+    parts = head.rsplit(None, 1)
+    if len(parts) < 2:
+        return None
+    note_start = start + len(head) - len(parts[1])
+    return segment[start:note_start - 1], segment[note_start:]
+
+def parse_care_notes(text):
+    """Return the care notes on one page of the care notes section as dicts
+
+    Every timestamp is found in one pass and the text between consecutive
+    timestamps is sliced out and split into staff and note, so pages with
+    very long notes cost time linear in their length.
+    """
+    notes = []
+    anchors = find_timestamps(text)
+    anchors.append(len(text))
+    for anchor, next_anchor in zip(anchors, anchors[1:]):
+        fields = split_note_segment(text[anchor + TIMESTAMP_LENGTH:next_anchor])
+        if not fields:
+            continue
+        staff = fields[0].strip()
+        note = fields[1].strip()
+        if staff and note:
+            notes.append({
+                "date": text[anchor:anchor + TIMESTAMP_LENGTH],
+                "staff": staff,
+                "note": note
+            })
+    return notes
+
+def parse_patient_section(pages, patient_id=None, known_hashes=None):
+    """Parse the pages of one patient record into a (patient_id, patient_record) pair
+
+    Returns None if the section has no patient ID or is not the requested
+    patient. If the section hash matches ``known_hashes`` the notes are not
+    extracted and the record is flagged as unchanged.
+    """
+    fields = {}
+    notes_offsets = []
+    for text in pages:
+        if len(fields) < len(HEADER_FIELDS):
+            notes_offsets.append(scan_page(text, fields))
+        else:
+            idx = text.find(CARE_NOTES_HEADER)
+            notes_offsets.append(idx + len(CARE_NOTES_HEADER) if idx >= 0 else None)
+
+    current_patient_id = fields.get(PATIENT_ID_FIELD)
+    if not current_patient_id or (patient_id and current_patient_id != patient_id):
+        return None
+
+    section_hash = hash_patient_section(pages)
+    current_patient = {
+        "info": {},
+        "name": fields.get(NAME_FIELD, "Unknown"),
+        "vitals": "",
+        "care_notes": [],
+        "section_hash": section_hash,
+        "unchanged": bool(known_hashes) and known_hashes.get(current_patient_id) == section_hash
+    }
+    if DOB_FIELD in fields:
+        current_patient["info"]["DOB"] = fields[DOB_FIELD]
+
+    # The notes of an unchanged section are already in the database
+    if current_patient["unchanged"]:
+        return current_patient_id, current_patient
+
+    in_care_notes = False
+    for text, notes_offset in zip(pages, notes_offsets):
+        if notes_offset is not None:
+            in_care_notes = True
+            text = text[notes_offset:].strip()
+        elif not in_care_notes:
+            continue
+        current_patient["care_notes"].extend(parse_care_notes(text))
+
+    return current_patient_id, current_patient
+
+def iter_pdf_patients(pdf_path, patient_id=None, known_hashes=None, page_range=None, stats=None):
+    """Yield (patient_id, patient_record) pairs from a ward PDF, one patient at a time
+
+    A record is yielded as soon as the next "Patient Record - Ward" header is
+    seen, so memory is bounded by the largest patient rather than the whole ward.
+    ``known_hashes`` maps patient IDs to the section hash stored at their last
+    import; matching patients are yielded with "unchanged" set and no notes.
+    Only the pages in ``page_range`` are read when it is given, as for a
+    shard of a large ward. For a single ``patient_id`` the range defaults to
+    the one found in the PDF outline, falling back to a full scan if the
+    patient is not there. Page text comes from the shared page text cache
+    where possible. Errors reading the file are logged and re-raised, so an
+    unreadable PDF is reported as failed rather than as an empty ward.
+    Pages read and time per stage are added to ``stats`` (see
+    utils.import_telemetry) when it is given.
+    """
+    pages = None
+    try:
+        pages = CachedPageTexts(pdf_path)
+        page_count = len(pages)
+        candidates = [range(page_count)]
+        if patient_id:
+            if page_range is None:
+                try:
+                    reader = pages.reader
+                    with timed(stats, 'open'):
+                        page_range = read_patient_page_index(reader).get(patient_id)
+                except Exception as e:
+                    logger.warning(f"Could not read outline of {pdf_path}: {str(e)}")
+        if page_range:
+            # A shard of the file is parsed on its own; for a single patient a
+            # stale index falls through to the full scan
+            shard = range(page_range[0], min(page_range[1] + 1, page_count))
+            candidates = [shard] + (candidates if patient_id else [])
+
+        for page_indexes in candidates:
+            section = []
+            for page_idx in page_indexes:
+                text = pages[page_idx]
+                if stats is not None:
+                    stats['pages'] += 1
+                # Check if this is a new patient record
+                if RECORD_HEADER in text:
+                    # Hand back the previous patient before starting the next one
+                    if section:
+                        with timed(stats, 'parse'):
+                            result = parse_patient_section(section, patient_id, known_hashes)
+                        if result:
+                            yield result
+                            if patient_id:
+                                return  # The requested patient is complete
+                    section = [text]
+                elif section:
+                    section.append(text)
+
+            # Don't forget to yield the last patient
+            if section:
+                with timed(stats, 'parse'):
+                    result = parse_patient_section(section, patient_id, known_hashes)
+                if result:
+                    yield result
+                    if patient_id:
+                        return
+
+    except Exception as e:
+        logger.error(f"PDF parsing error: {str(e)}")
+        raise
+    finally:
+        if pages is not None:
+            pages.close()  # Write newly extracted pages to the text cache
+            if stats is not None:
+                stats['seconds']['open'] += pages.open_seconds
+                stats['seconds']['extract_text'] += pages.extract_seconds
+                stats['cache_hits'] += pages.hit_count
+                stats['cache_misses'] += pages.miss_count
+
+def parse_pdf_content(pdf_path, patient_id=None, page_range=None):
+    """Extract patient info and notes from PDF file (empty if it cannot be read)"""
+    try:
+        return dict(iter_pdf_patients(pdf_path, patient_id, page_range=page_range))
+    except Exception:
+        return {}